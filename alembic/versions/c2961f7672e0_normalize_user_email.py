@@ -0,0 +1,37 @@
+"""Normalize user email and index lower(email)
+
+Revision ID: c2961f7672e0
+Revises: f2547705448a
+Create Date: 2026-10-18 10:30:12.418205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2961f7672e0'
+down_revision: Union[str, None] = 'f2547705448a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    conflicts = op.get_bind().execute(sa.text(
+        'SELECT lower(email) FROM "user" GROUP BY lower(email) HAVING count(*) > 1'
+    )).scalars().all()
+    if conflicts:
+        raise RuntimeError(
+            f"Cannot normalize emails, these addresses differ only by case: {', '.join(conflicts)}"
+        )
+
+    op.execute('UPDATE "user" SET email = lower(email) WHERE email <> lower(email)')
+    op.drop_index('ix_user_email', table_name='user')
+    op.create_index('ix_user_email_lower', 'user', [sa.text('lower(email)')], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_email_lower', table_name='user')
+    op.create_index('ix_user_email', 'user', ['email'], unique=True)
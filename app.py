@@ -1,18 +1,58 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
 from config.config import settings
+from database.db_connection import dispose_async_engine, dispose_engine, init_async_engine
+from monitoring.metrics import metrics
+from monitoring.profiler import ProfilerMiddleware, profiler
+from monitoring.timing import ServerTimingMiddleware, instrument_sqlalchemy
 from src.api.v1.socket.user_chat import websocket_router
+from src.api.v1.views.jwks import jwks_router
+from src.api.v1.views.metrics import metrics_router
+from src.api.v1.utils.hash_pool import password_hash_pool
+from src.api.v1.utils.rate_limit import RateLimitHeadersMiddleware, rate_limit_backend
+from src.api.v1.utils.socket_manager import connection_manager
+from src.api.v1.utils.token_revocation import token_revocation_store
 from src.route.router import v1_router
 
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    init_async_engine()
+    await token_revocation_store.start()
+    await rate_limit_backend.start()
+    await connection_manager.start()
+    yield
+    await connection_manager.stop()
+    await rate_limit_backend.stop()
+    await token_revocation_store.stop()
+    await dispose_async_engine()
+    dispose_engine()
+    password_hash_pool.shutdown()
+    metrics.mark_process_dead()
+
+
 app = FastAPI(
     docs_url=settings.DOCS_ENDPOINT,
     redoc_url=settings.REDOCS_ENDPOINT,
+    lifespan=lifespan,
 )
 
+instrument_sqlalchemy()
+
+app.add_middleware(RateLimitHeadersMiddleware)
+app.add_middleware(ServerTimingMiddleware, enabled=settings.SERVER_TIMING_ENABLED)
+if profiler.active:
+    app.add_middleware(ProfilerMiddleware, profiler=profiler)
+
 app.include_router(v1_router)
 app.include_router(websocket_router)
+app.include_router(jwks_router)
+if settings.METRICS_ENABLED:
+    app.include_router(metrics_router)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
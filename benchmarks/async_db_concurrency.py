@@ -0,0 +1,81 @@
+"""
+Concurrency under mixed query latency: sync session on the event loop vs AsyncSession.
+
+Every "request" runs either a fast query (SELECT 1) or, with probability
+--slow-ratio, a slow one (pg_sleep). With the sync driver the slow queries block
+the loop, so fast requests queue behind them; with the async driver they overlap.
+
+    python -m benchmarks.async_db_concurrency --requests 500 --concurrency 50
+"""
+import argparse
+import asyncio
+import random
+import statistics
+from time import perf_counter
+
+from sqlalchemy import text
+
+from database import db_connection
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))] * 1000
+
+
+async def _sync_request(slow: bool, slow_seconds: float):
+    with db_connection.SessionLocal() as db:
+        db.execute(text("SELECT pg_sleep(:s)" if slow else "SELECT 1"), {"s": slow_seconds} if slow else {})
+
+
+async def _async_request(slow: bool, slow_seconds: float):
+    async with db_connection.AsyncSessionLocal() as db:
+        await db.execute(text("SELECT pg_sleep(:s)" if slow else "SELECT 1"), {"s": slow_seconds} if slow else {})
+
+
+async def run(mode: str, requests: int, concurrency: int, slow_ratio: float, slow_seconds: float) -> dict:
+    handler = _async_request if mode == "async" else _sync_request
+    semaphore = asyncio.Semaphore(concurrency)
+    fast_latencies: list[float] = []
+    rng = random.Random(42)
+    plan = [rng.random() < slow_ratio for _ in range(requests)]
+
+    async def one(slow: bool):
+        async with semaphore:
+            start = perf_counter()
+            await handler(slow, slow_seconds)
+            if not slow:
+                fast_latencies.append(perf_counter() - start)
+
+    start = perf_counter()
+    await asyncio.gather(*(one(slow) for slow in plan))
+    elapsed = perf_counter() - start
+    return {
+        "mode": mode,
+        "requests": requests,
+        "throughput_rps": round(requests / elapsed, 1),
+        "fast_p50_ms": round(statistics.median(fast_latencies) * 1000, 2),
+        "fast_p99_ms": round(_percentile(fast_latencies, 0.99), 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--slow-ratio", type=float, default=0.1)
+    parser.add_argument("--slow-seconds", type=float, default=0.2)
+    args = parser.parse_args()
+
+    db_connection.init_engine()
+    db_connection.init_async_engine()
+    try:
+        for mode in ("sync", "async"):
+            print(await run(mode, args.requests, args.concurrency, args.slow_ratio, args.slow_seconds))
+    finally:
+        await db_connection.dispose_async_engine()
+        db_connection.dispose_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
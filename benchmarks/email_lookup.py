@@ -0,0 +1,72 @@
+"""
+Email lookup latency at scale: leading-wildcard ILIKE vs indexed lower(email) equality.
+
+Builds a scratch copy of the user table (same ix_user_email_lower index) in the
+configured Postgres database, fills it with --rows users and times both lookup
+shapes. The scratch table is dropped afterwards.
+
+    python -m benchmarks.email_lookup --rows 1000000 --lookups 200
+"""
+import argparse
+import random
+import statistics
+from time import perf_counter
+
+from sqlalchemy import text
+
+from database import db_connection
+
+TABLE = "bench_user_email_lookup"
+
+QUERIES = {
+    "ilike_wildcard": f"SELECT id FROM {TABLE} WHERE email ILIKE '%' || :email || '%' LIMIT 1",
+    "lower_equality": f"SELECT id FROM {TABLE} WHERE lower(email) = :email LIMIT 1",
+}
+
+
+def setup(connection, rows: int):
+    connection.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+    connection.execute(text(f"CREATE TABLE {TABLE} (id serial PRIMARY KEY, email varchar(255))"))
+    connection.execute(text(
+        f"INSERT INTO {TABLE} (email) SELECT 'user' || g || '@example.com' FROM generate_series(1, :rows) g"
+    ), {"rows": rows})
+    connection.execute(text(f"CREATE UNIQUE INDEX {TABLE}_lower ON {TABLE} (lower(email))"))
+    connection.execute(text(f"ANALYZE {TABLE}"))
+
+
+def measure(connection, query: str, emails: list[str]) -> dict:
+    latencies = []
+    for email in emails:
+        start = perf_counter()
+        connection.execute(text(query), {"email": email}).first()
+        latencies.append(perf_counter() - start)
+    latencies.sort()
+    return {
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    emails = [f"user{rng.randint(1, args.rows)}@example.com" for _ in range(args.lookups)]
+    engine = db_connection.init_engine()
+    try:
+        with engine.begin() as connection:
+            setup(connection, args.rows)
+        with engine.connect() as connection:
+            for name, query in QUERIES.items():
+                print({"query": name, "rows": args.rows, **measure(connection, query, emails)})
+    finally:
+        with engine.begin() as connection:
+            connection.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+        db_connection.dispose_engine()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Throughput of activation mail rendering.
+
+Renders --mails activation mails with distinct contexts four ways:
+- per-call: a new Jinja environment per mail, as fastapi-mail did for
+  every send.
+- jinja: one cached compiled template.
+- prerendered: MailTemplates, which serves verify_email.html from its
+  pre-rendered static parts.
+- messages: render_messages, which also builds the EmailMessage objects.
+Each way reports renders per second.
+
+    python -m benchmarks.mail_render --mails 20000
+"""
+import argparse
+from time import perf_counter
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from src.api.v1.utils.mail_outbox import render_messages
+from src.api.v1.utils.mail_templates import MailTemplates
+
+TEMPLATE = "verify_email.html"
+
+
+def per_call(directory: str, contexts: list[dict]):
+    for context in contexts:
+        environment = Environment(loader=FileSystemLoader(directory), autoescape=select_autoescape())
+        environment.get_template(TEMPLATE).render(context)
+
+
+def jinja(directory: str, contexts: list[dict]):
+    template = Environment(loader=FileSystemLoader(directory), autoescape=select_autoescape()).get_template(TEMPLATE)
+    for context in contexts:
+        template.render(context)
+
+
+def prerendered(directory: str, contexts: list[dict]):
+    MailTemplates(directory).render_many(TEMPLATE, contexts)
+
+
+def messages(directory: str, contexts: list[dict]):
+    render_messages(TEMPLATE, "User Account Activation", [(context["email"], context) for context in contexts])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mails", type=int, default=20_000)
+    parser.add_argument("--templates", default="templates")
+    args = parser.parse_args()
+
+    contexts = [
+        {"email": f"user{i}@gmail.com", "verify_email_link": f"http://127.0.0.1:8000/api/v1/auth/verify-email/{i:032x}"}
+        for i in range(args.mails)
+    ]
+    for name, run in (("per-call", per_call), ("jinja", jinja), ("prerendered", prerendered), ("messages", messages)):
+        # A new environment per mail is slow enough that a tenth of the mails is plenty.
+        sample = contexts[:max(1, len(contexts) // 10)] if run is per_call else contexts
+        start = perf_counter()
+        run(args.templates, sample)
+        elapsed = perf_counter() - start
+        print(f"{name:>12}: {int(len(sample) / elapsed):>9} renders/s")
+
+
+if __name__ == "__main__":
+    main()
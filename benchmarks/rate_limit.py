@@ -0,0 +1,58 @@
+"""
+Rate-limit decisions per second for the in-process sliding-window backend.
+
+Measures the raw backend call and the full RateLimiter dependency (per-IP and
+per-account keys) over a pool of distinct clients.
+
+    python -m benchmarks.rate_limit --decisions 200000 --keys 10000
+"""
+import argparse
+import asyncio
+from time import perf_counter
+
+from starlette.requests import Request
+
+from src.api.v1.utils import rate_limit
+from src.api.v1.utils.rate_limit import InMemoryRateLimitBackend, RateLimiter
+
+
+def bench_backend(decisions: int, keys: int) -> float:
+    backend = InMemoryRateLimitBackend()
+    names = [f"login:ip:10.0.{i // 256}.{i % 256}" for i in range(keys)]
+    start = perf_counter()
+    for i in range(decisions):
+        backend.hit_nowait(names[i % keys], 1_000_000, 60)
+    return decisions / (perf_counter() - start)
+
+
+async def bench_dependency(decisions: int, keys: int) -> float:
+    rate_limit.rate_limit_backend = InMemoryRateLimitBackend()
+    limiter = RateLimiter("login", per_ip=1_000_000, per_account=1_000_000)
+    requests = []
+    for i in range(keys):
+        body = f'{{"email": "user{i}@example.com", "password": "x"}}'.encode()
+        request = Request({"type": "http", "client": (f"10.0.{i // 256}.{i % 256}", 1234), "headers": []})
+        request._body = body
+        requests.append(request)
+
+    start = perf_counter()
+    for i in range(decisions):
+        await limiter(requests[i % keys])
+    return decisions / (perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--decisions", type=int, default=200_000)
+    parser.add_argument("--keys", type=int, default=10_000)
+    args = parser.parse_args()
+
+    print({"benchmark": "backend", "decisions_per_second": round(bench_backend(args.decisions, args.keys))})
+    print({
+        "benchmark": "dependency_ip_and_account",
+        "decisions_per_second": round(asyncio.run(bench_dependency(args.decisions, args.keys))),
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+In-process fan-out load test for ConnectionManager.
+
+Connects --clients fake sockets (a few of them --slow clients whose sends
+take --slow-ms), broadcasts --messages messages and reports how long each
+broadcast call takes and when the last *fast* client received each message.
+--encoding and --coalesce-ms exercise msgpack frames and burst coalescing.
+
+    python -m benchmarks.ws_fanout --clients 10000 --slow 10 --messages 50
+"""
+import argparse
+import asyncio
+import json
+import statistics
+from time import perf_counter
+
+from src.api.v1.utils.chat_envelope import MSGPACK, available_encodings, make_envelope
+from src.api.v1.utils.socket_manager import ConnectionManager, OverflowPolicy
+
+
+class BenchWebSocket:
+
+    def __init__(self, delay: float, deliveries: dict):
+        self.delay = delay
+        self.deliveries = deliveries
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, frame):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        else:
+            self.deliveries[frame] = perf_counter()
+
+    send_bytes = send_text
+
+    async def close(self, code=1000, reason=""):
+        pass
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * pct))] * 1000, 3)
+
+
+def _decode(frame, encoding: str) -> list[dict]:
+    if encoding == MSGPACK:
+        import msgpack
+        envelopes = msgpack.unpackb(frame)
+    else:
+        envelopes = json.loads(frame)
+    return envelopes if isinstance(envelopes, list) else [envelopes]
+
+
+async def run(clients: int, slow: int, messages: int, slow_ms: float, interval_ms: float, policy: str,
+              encoding: str, coalesce_ms: float) -> dict:
+    manager = ConnectionManager(
+        max_queue=64, overflow_policy=OverflowPolicy(policy), coalesce_window=coalesce_ms / 1000
+    )
+    deliveries: dict[str | bytes, float] = {}     # Last fast-client receive time per frame
+    for i in range(clients):
+        await manager.connect(BenchWebSocket(slow_ms / 1000 if i < slow else 0, deliveries), None, encoding)
+
+    sent_at, broadcast_times = {}, []
+    for i in range(messages):
+        sent_at[i] = start = perf_counter()
+        await manager.broadcast_message(make_envelope("message", room="bench", seq=i, text=f"message {i}"))
+        broadcast_times.append(perf_counter() - start)
+        await asyncio.sleep(interval_ms / 1000)
+    await asyncio.sleep(0.5)
+
+    fan_out = [
+        received_at - sent_at[envelope["seq"]]
+        for frame, received_at in deliveries.items()
+        for envelope in _decode(frame, encoding)
+    ]
+    status = manager.get_status()
+    frames = sum(connection.frames for connection in manager.active_connections.values())
+    for websocket in list(manager.active_connections):
+        manager.remove(websocket)
+    return {
+        "clients": clients,
+        "slow_clients": slow,
+        "policy": policy,
+        "encoding": encoding,
+        "coalesce_ms": coalesce_ms,
+        "frames_sent": frames,
+        "broadcast_call_p50_ms": round(statistics.median(broadcast_times) * 1000, 3),
+        "fan_out_p50_ms": _percentile(fan_out, 0.5),
+        "fan_out_p99_ms": _percentile(fan_out, 0.99),
+        "dropped": status["dropped"],
+        "slow_consumer_disconnects": status["slow_consumer_disconnects"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=10_000)
+    parser.add_argument("--slow", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--slow-ms", type=float, default=200)
+    parser.add_argument("--interval-ms", type=float, default=20)
+    parser.add_argument("--policy", choices=[policy.value for policy in OverflowPolicy], default="drop_oldest")
+    parser.add_argument("--encoding", choices=sorted(available_encodings()), default="json")
+    parser.add_argument("--coalesce-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    print(asyncio.run(run(
+        args.clients, args.slow, args.messages, args.slow_ms, args.interval_ms, args.policy,
+        args.encoding, args.coalesce_ms,
+    )))
+
+
+if __name__ == "__main__":
+    main()
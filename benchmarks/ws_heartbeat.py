@@ -0,0 +1,55 @@
+"""
+Cost of the websocket heartbeat timer wheel.
+
+Schedules --timers timers spread over --spread seconds, then advances the
+wheel tick by tick, re-arming every fired timer as the heartbeat does, and
+reports scheduling throughput and the per-tick cost.
+
+    python -m benchmarks.ws_heartbeat --timers 100000
+"""
+import argparse
+import random
+from time import perf_counter
+
+from src.api.v1.utils.timer_wheel import TimerWheel
+
+
+def run(timers: int, spread: float, tick: float, ticks: int) -> dict:
+    wheel = TimerWheel(tick=tick)
+    start = perf_counter()
+    for key in range(timers):
+        wheel.schedule(key, random.uniform(tick, spread))
+    schedule_time = perf_counter() - start
+
+    tick_times, fired = [], 0
+    for i in range(1, ticks + 1):
+        start = perf_counter()
+        expired = wheel.advance(i * tick)
+        for key in expired:
+            wheel.schedule(key, spread)
+        tick_times.append(perf_counter() - start)
+        fired += len(expired)
+
+    tick_times.sort()
+    return {
+        "timers": timers,
+        "schedule_per_second": int(timers / schedule_time),
+        "fired": fired,
+        "tick_p50_ms": round(tick_times[len(tick_times) // 2] * 1000, 3),
+        "tick_max_ms": round(tick_times[-1] * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--timers", type=int, default=100_000)
+    parser.add_argument("--spread", type=float, default=25, help="Seconds, like WS_PING_INTERVAL")
+    parser.add_argument("--tick", type=float, default=1.0)
+    parser.add_argument("--ticks", type=int, default=100)
+    args = parser.parse_args()
+
+    print(run(args.timers, args.spread, args.tick, args.ticks))
+
+
+if __name__ == "__main__":
+    main()
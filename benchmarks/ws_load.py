@@ -0,0 +1,223 @@
+"""
+Load generator for /ws/user_chat against a running server.
+
+Logs in once over HTTP, opens --connections sockets authenticated through
+the `access_token` sub-protocol, then has --senders of them post to the
+default room at --rate messages/s for --duration seconds. Every socket is a
+receiver, so each message is expected --connections times.
+
+Reports connect time, fan-out latency (p50/p99/p999), dropped deliveries
+and, with --server-pid or --spawn, server memory per connection. One JSON
+object per run is appended to --output, to compare runs across releases.
+Needs the `websockets` client package; raise `ulimit -n` for large runs.
+
+    python -m benchmarks.ws_load --spawn --connections 1000 --rate 50 --duration 30 \\
+        --email admin@gmail.com --password Admin@123
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime, timezone
+from time import perf_counter, sleep
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+from websockets.asyncio.client import connect
+
+PONG = json.dumps({"action": "pong"}, separators=(",", ":"))
+
+
+def _percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def at(pct: float) -> float:
+        return round(values[min(len(values) - 1, int(len(values) * pct))] * 1000, 3)
+
+    return {"p50": at(0.5), "p99": at(0.99), "p999": at(0.999), "max": round(values[-1] * 1000, 3)}
+
+
+def _rss_kb(pid: int | None) -> int | None:
+    if pid is None:
+        return None
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return None
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _login(base_url: str, email: str, password: str) -> str:
+    request = Request(
+        f"{base_url}/api/v1/auth/login",
+        data=json.dumps({"email": email, "password": password}).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urlopen(request) as response:
+        return json.loads(response.read())["access_token"]
+
+
+def _spawn_server(port: int) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"]
+    )
+    for _ in range(100):
+        try:
+            urlopen(f"http://127.0.0.1:{port}/.well-known/jwks.json").close()
+            return server
+        except URLError:
+            if server.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup.")
+            sleep(0.1)
+    server.terminate()
+    raise RuntimeError("uvicorn did not start within 10 seconds.")
+
+
+class LoadClient:
+
+    def __init__(self, stats: "LoadStats"):
+        self.stats = stats
+        self.websocket = None
+        self._reader: asyncio.Task | None = None
+
+    async def open(self, url: str, token: str):
+        start = perf_counter()
+        self.websocket = await connect(url, subprotocols=["access_token", token], max_queue=None)
+        self.stats.connect_times.append(perf_counter() - start)
+        self._reader = asyncio.create_task(self._read_forever())
+
+    async def _read_forever(self):
+        try:
+            async for frame in self.websocket:
+                received_at = perf_counter()
+                envelopes = json.loads(frame)
+                for envelope in envelopes if isinstance(envelopes, list) else [envelopes]:
+                    if envelope["type"] == "ping":
+                        await self.websocket.send(PONG)
+                    elif envelope["type"] == "message" and envelope["text"].startswith("load:"):
+                        sent_at = self.stats.sent_at[int(envelope["text"][5:])]
+                        self.stats.latencies.append(received_at - sent_at)
+        except Exception as e:
+            self.stats.errors.append(f"{type(e).__name__}: {e}")
+
+    async def close(self):
+        if self._reader is not None:
+            self._reader.cancel()
+        if self.websocket is not None:
+            await self.websocket.close()
+
+
+class LoadStats:
+
+    def __init__(self):
+        self.connect_times: list[float] = []
+        self.connect_failures = 0
+        self.sent_at: dict[int, float] = {}
+        self.latencies: list[float] = []
+        self.errors: list[str] = []
+
+
+async def run(args, server_pid: int | None) -> dict:
+    base_url = args.url.rstrip("/")
+    token = await asyncio.to_thread(_login, base_url, args.email, args.password)
+    ws_url = base_url.replace("http", "ws", 1) + "/ws/user_chat"
+
+    stats = LoadStats()
+    rss_before = _rss_kb(server_pid)
+    semaphore = asyncio.Semaphore(args.connect_concurrency)
+
+    async def open_client() -> LoadClient | None:
+        client = LoadClient(stats)
+        async with semaphore:
+            try:
+                await client.open(ws_url, token)
+                return client
+            except Exception as e:
+                stats.connect_failures += 1
+                stats.errors.append(f"{type(e).__name__}: {e}")
+                return None
+
+    clients = [client for client in await asyncio.gather(*(open_client() for _ in range(args.connections))) if client]
+    await asyncio.sleep(0.5)
+    rss_after = _rss_kb(server_pid)
+
+    senders = clients[:args.senders]
+    interval = 1 / args.rate
+    started = perf_counter()
+    seq = 0
+    while senders and perf_counter() - started < args.duration:
+        stats.sent_at[seq] = perf_counter()
+        await senders[seq % len(senders)].websocket.send(f"load:{seq}")
+        seq += 1
+        await asyncio.sleep(max(0.0, started + seq * interval - perf_counter()))
+    await asyncio.sleep(args.drain)
+    await asyncio.gather(*(client.close() for client in clients), return_exceptions=True)
+
+    expected = len(stats.sent_at) * len(clients)
+    memory_per_connection = None
+    if rss_before is not None and rss_after is not None and clients:
+        memory_per_connection = round((rss_after - rss_before) / len(clients), 2)
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "params": {key: value for key, value in vars(args).items() if key != "password"},
+        "connections": len(clients),
+        "connect_failures": stats.connect_failures,
+        "connect_ms": _percentiles(stats.connect_times),
+        "messages_sent": len(stats.sent_at),
+        "expected_deliveries": expected,
+        "received": len(stats.latencies),
+        "dropped": expected - len(stats.latencies),
+        "fan_out_ms": _percentiles(stats.latencies),
+        "server_rss_kb": {"before": rss_before, "after": rss_after},
+        "memory_per_connection_kb": memory_per_connection,
+        "errors": stats.errors[:10],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--email", required=True, help="An active user, used for every connection")
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--senders", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=50, help="Messages per second, across all senders")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds")
+    parser.add_argument("--drain", type=float, default=2, help="Seconds to wait for deliveries after sending")
+    parser.add_argument("--connect-concurrency", type=int, default=100)
+    parser.add_argument("--server-pid", type=int, help="Server process to sample RSS from")
+    parser.add_argument("--spawn", action="store_true", help="Start `uvicorn app:app` on the --url port")
+    parser.add_argument("--output", default="benchmarks/results/ws_load.jsonl")
+    args = parser.parse_args()
+
+    server = None
+    if args.spawn:
+        server = _spawn_server(int(args.url.rsplit(":", 1)[1].split("/")[0]))
+        args.server_pid = server.pid
+    try:
+        result = asyncio.run(run(args, args.server_pid))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "a") as output:
+        output.write(json.dumps(result) + "\n")
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -11,13 +11,81 @@ class ConfigSetting(BaseSettings):
     DB_HOSTNAME: str
     DB_PORT: int
     DB_NAME: str
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30       # In Seconds
+    DB_POOL_RECYCLE: int = 1800     # In Seconds
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT: int = 30000   # In Milliseconds
     DOCS_ENDPOINT: str
     REDOCS_ENDPOINT: str
     DEBUG: bool
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"                # "json" or "text"
+    LOG_QUEUE_SIZE: int = 10000             # Records buffered for the writer thread, then dropped
+    LOG_SAMPLE_LIMIT: int = 10              # Warnings and errors per call site and window
+    LOG_SAMPLE_WINDOW: float = 60           # In Seconds
     SECRET_KEY: str
-    ALGORITHM: str = "HS256"
+    ALGORITHM: str = "HS256"                # HS256, or RS256/EdDSA with keys from JWT_KEYS_DIR
+    JWT_KEYS_DIR: str = "keys"
+    JWT_ACTIVE_KID: str | None = None
+    JWT_KEYS_RELOAD_INTERVAL: int = 60      # In Seconds
+    JWT_KEYS_UNKNOWN_KID_INTERVAL: float = 5    # In Seconds, min time between re-checks for an unknown kid
+    JWKS_CACHE_MAX_AGE: int = 300           # In Seconds
     ACCESS_TOKEN_EXPIRE_LIMIT: int = 30     # In Minutes
     REFRESH_TOKEN_EXPIRE_LIMIT: int = 2     # In Days
+    TOKEN_CACHE_SIZE: int = 10000
+    TOKEN_CACHE_TTL: int = 300              # In Seconds
+    TOKEN_REVOCATION_BACKEND: str = "memory"    # "memory" or "redis"
+    TOKEN_REVOCATION_REDIS_URL: str = "redis://localhost:6379/2"
+    TOKEN_REVOCATION_SYNC_INTERVAL: float = 1.0     # In Seconds
+    TOKEN_REVOCATION_PRUNE_INTERVAL: float = 60     # In Seconds, between removals of expired ids from Redis
+    TOKEN_REVOCATION_BLOOM_CAPACITY: int = 100000
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"      # "memory" or "redis"
+    RATE_LIMIT_REDIS_URL: str = "redis://localhost:6379/3"
+    RATE_LIMIT_WINDOW: int = 60             # In Seconds
+    RATE_LIMIT_LOGIN_PER_IP: int = 30
+    RATE_LIMIT_LOGIN_PER_ACCOUNT: int = 10
+    RATE_LIMIT_REGISTRATION_PER_IP: int = 10
+    RATE_LIMIT_REFRESH_PER_IP: int = 30
+    SERVER_TIMING_ENABLED: bool = True      # Server-Timing header and per-phase histograms
+    METRICS_ENABLED: bool = True            # Prometheus /metrics, needs prometheus_client
+    SLOW_QUERY_THRESHOLD: float = 0.2       # In Seconds
+    QUERY_BUDGET_MAX_QUERIES: int = 20      # Per request
+    QUERY_BUDGET_MAX_TIME: float = 1.0      # In Seconds, per request
+    QUERY_BUDGET_MAX_DUPLICATES: int = 0    # Repeats of a statement with the same parameters, per request
+    QUERY_BUDGET_ENFORCE: bool = False      # Raise instead of logging; the test suite turns this on
+    SYSTEM_STATUS_TOKEN: str = ""          # Sent as X-Operator-Token to read /api/v1/system/*; hidden while empty
+    PROFILER_ENABLED: bool = False
+    PROFILER_TOKEN: str = ""                # Sent as X-Profile-Token; the profiler stays off while empty
+    PROFILER_INTERVAL: float = 0.005        # In Seconds, between stack samples
+    PROFILER_MAX_SECONDS: int = 60          # Longest whole-process session
+    WS_SEND_QUEUE_SIZE: int = 256           # Outbound messages buffered per connection
+    WS_OVERFLOW_POLICY: str = "drop_oldest"     # "drop_oldest" or "disconnect"
+    WS_PING_INTERVAL: int = 25              # In Seconds
+    WS_PONG_TIMEOUT: int = 10               # In Seconds
+    WS_IDLE_TIMEOUT: int = 3600             # In Seconds, 0 disables idle eviction
+    WS_HEARTBEAT_TICK: float = 1.0          # In Seconds, timer wheel resolution
+    WS_COALESCE_WINDOW: float = 0           # In Seconds, 0 sends every message as its own frame
+    WS_COALESCE_MAX: int = 64               # Messages per coalesced frame
+    WS_HISTORY_SIZE: int = 100              # Recent messages kept per room for resume, 0 disables
+    WS_HISTORY_SPILL_DIR: str = ""          # Append room history to <dir>/<node>/<room>.jsonl when set
+    WS_HISTORY_REPLAY_LIMIT: int = 1000     # Max messages replayed from the spill file
+    WS_DEFAULT_ROOM: str = "general"        # Room every chat connection joins, plain text goes there
+    WS_BACKPLANE: str = "memory"            # "memory" (single worker) or "redis"
+    WS_BACKPLANE_REDIS_URL: str = "redis://localhost:6379/4"
+    WS_BACKPLANE_CHANNEL: str = "chat"
+    WS_BACKPLANE_BATCH_SIZE: int = 100
+    WS_BACKPLANE_BATCH_INTERVAL: float = 0.005  # In Seconds
+    PASSWORD_HASH_SCHEMES: list[str] = ["bcrypt"]    # First scheme hashes, the rest are migrated on login
+    BCRYPT_ROUNDS: int = 12
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST: int = 65536     # In KiB
+    ARGON2_PARALLELISM: int = 4
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_LIMIT: int = 64
+    PASSWORD_HASH_RETRY_AFTER: int = 1      # In Seconds
     BROKER_URL: str
     BROKER_BACKEND: str
     MAIL_USERNAME: str
@@ -26,6 +94,20 @@ class ConfigSetting(BaseSettings):
     MAIL_PORT: int
     MAIL_SERVER: str
     MAIL_FROM_NAME: str
+    MAIL_STARTTLS: bool = True
+    MAIL_SSL_TLS: bool = False
+    MAIL_USE_CREDENTIALS: bool = True       # Off for a local SMTP stand-in without AUTH
+    MAIL_SMTP_TIMEOUT: float = 30           # In Seconds
+    MAIL_TEMPLATE_DIR: str = "templates"
+    MAIL_TEMPLATE_INLINE_CSS: bool = True   # Move <style> rules into style attributes when compiling
+    MAIL_SMTP_POOL_SIZE: int = 4            # Open SMTP connections per outbox worker
+    MAIL_OUTBOX_BATCH_SIZE: int = 50
+    MAIL_OUTBOX_POLL_INTERVAL: float = 1.0  # In Seconds
+    MAIL_OUTBOX_MAX_ATTEMPTS: int = 8
+    MAIL_OUTBOX_RETRY_BASE: float = 30      # In Seconds, doubled after every failed attempt
+    MAIL_OUTBOX_RETRY_MAX: float = 3600     # In Seconds
+    MAIL_OUTBOX_CLAIM_TIMEOUT: float = 600  # In Seconds, before mails of a worker that died are sent again
+    MAIL_WORKER_METRICS_PORT: int = 9102    # Prometheus metrics of the outbox worker, 0 disables
     BACKEND_DOMAIN: str
 
 
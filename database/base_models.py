@@ -1,3 +1,4 @@
 # Import All DB Models here
 
-from src.api.v1.models.user_models.user import *
\ No newline at end of file
+from src.api.v1.models.user_models.user import *
+from src.api.v1.models.mail_models.outbox import *
@@ -1,17 +1,92 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 from config.config import settings
-from database.unit_of_work import SQLAlchemyUnitOfWork
+from database.pool import TimedAsyncAdaptedQueuePool, TimedQueuePool
+from database.unit_of_work import SQLAlchemyAsyncUnitOfWork, SQLAlchemyUnitOfWork
 
 SQLALCHEMY_DATABASE_URI = f"postgresql://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOSTNAME}:{settings.DB_PORT}/{settings.DB_NAME}"
+SQLALCHEMY_ASYNC_DATABASE_URI = f"postgresql+asyncpg://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOSTNAME}:{settings.DB_PORT}/{settings.DB_NAME}"
 
 Base = declarative_base()
 
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
+engine: Engine | None = None
+async_engine: AsyncEngine | None = None
+
+
+def _pool_options() -> dict:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def init_engine() -> Engine:
+    """Create the process-wide sync engine, used by scripts and `get_db`."""
+    global engine
+    if engine is None:
+        engine = create_engine(
+            SQLALCHEMY_DATABASE_URI,
+            poolclass=TimedQueuePool,
+            connect_args={"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT}"},
+            **_pool_options(),
+        )
+        SessionLocal.configure(bind=engine)
+    return engine
+
+
+def init_async_engine() -> AsyncEngine:
+    """Create the process-wide async engine; called once from the app lifespan."""
+    global async_engine
+    if async_engine is None:
+        async_engine = create_async_engine(
+            SQLALCHEMY_ASYNC_DATABASE_URI,
+            poolclass=TimedAsyncAdaptedQueuePool,
+            connect_args={"server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT)}},
+            **_pool_options(),
+        )
+        AsyncSessionLocal.configure(bind=async_engine)
+    return async_engine
+
+
+def dispose_engine():
+    global engine
+    if engine is not None:
+        engine.dispose()
+        engine = None
+
+
+async def dispose_async_engine():
+    global async_engine
+    if async_engine is not None:
+        await async_engine.dispose()
+        async_engine = None
+
 
 async def get_db():
-    engine = create_engine(SQLALCHEMY_DATABASE_URI)
-    session = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    init_engine()
+    with SQLAlchemyUnitOfWork(SessionLocal) as db:
+        yield db
+
 
-    with SQLAlchemyUnitOfWork(session) as db:
+async def get_async_db():
+    init_async_engine()
+    async with SQLAlchemyAsyncUnitOfWork(AsyncSessionLocal) as db:
         yield db
+
+
+def get_async_session_factory() -> async_sessionmaker:
+    """
+    For long-lived endpoints such as websockets, which must not hold a pooled
+    connection for their whole lifetime: open a short session per unit of work.
+    """
+    init_async_engine()
+    return AsyncSessionLocal
@@ -0,0 +1,69 @@
+from time import perf_counter
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from monitoring.metrics import metrics
+from monitoring.stats import TimingStats
+
+
+class PoolStats:
+
+    def __init__(self):
+        self.checkout = TimingStats()
+        self.timeouts = 0
+
+
+class TimedPoolMixin:
+    """Records how long each checkout waits for a pooled connection."""
+
+    metrics_label = "sync"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+        # `recreate()` (on dispose) passes the old pool's listeners along in `_dispatch`.
+        if metrics.enabled and not kwargs.get("_dispatch"):
+            event.listen(self, "checkout", self._on_checkout)
+            event.listen(self, "checkin", self._on_checkin)
+
+    def connect(self):
+        start = perf_counter()
+        timed_out = False
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.stats.timeouts += 1
+            timed_out = True
+            raise
+        finally:
+            elapsed = perf_counter() - start
+            self.stats.checkout.observe(elapsed)
+            metrics.observe_pool_checkout(self.metrics_label, elapsed, timed_out)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        metrics.pool_checked_out(self.metrics_label, 1)
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        metrics.pool_checked_out(self.metrics_label, -1)
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    metrics_label = "async"
+
+
+def get_pool_status(pool) -> dict:
+    status = {
+        "pool_size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+    if stats := getattr(pool, "stats", None):
+        status["checkout_wait"] = stats.checkout.as_dict()
+        status["checkout_timeouts"] = stats.timeouts
+    return status
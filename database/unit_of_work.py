@@ -1,4 +1,4 @@
-from contextlib import contextmanager
+from contextlib import asynccontextmanager, contextmanager
 
 
 @contextmanager
@@ -8,3 +8,12 @@ def SQLAlchemyUnitOfWork(session):      # noqa
         yield db
     finally:
         db.close()
+
+
+@asynccontextmanager
+async def SQLAlchemyAsyncUnitOfWork(session):      # noqa
+    db = session()
+    try:
+        yield db
+    finally:
+        await db.close()
@@ -1,28 +1,138 @@
-import logging.config
-
-LOGGING = {
-    "version": 1,
-    "disable_existing_loggers": False,
-    "formatters": {
-        "key_value": {
-            "format": "[%(asctime)s] %(levelname)s [%(name)s.%(funcName)s:%(lineno)d] %(message)s"
-        },
-    },
-    "handlers": {
-        "console": {
-            "level": "DEBUG",
-            "class": "logging.StreamHandler",
-            "formatter": "key_value"
+import atexit
+import json
+import logging
+import queue
+import sys
+import traceback
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from time import monotonic
+
+from config.config import settings
+
+KEY_VALUE_FORMAT = "[%(asctime)s] %(levelname)s [%(name)s.%(funcName)s:%(lineno)d] %(message)s"
+
+# Attributes every LogRecord has; anything else was passed in `extra` and goes into the JSON object.
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with `extra` fields and the traceback, if any, as keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "func": record.funcName,
+            "line": record.lineno,
+            "message": record.getMessage(),
         }
-    },
-    "loggers": {
-        "": {
-            "handlers": ["console"],
-            "level": "DEBUG",
-            "propagate": False
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry["exc"] = "".join(traceback.format_exception(*record.exc_info))
+        return json.dumps(entry, default=str)
+
+
+class RepeatSampler(logging.Filter):
+    """
+    Lets through at most `limit` warnings or errors per call site every
+    `window` seconds. The first record let through after a quiet spell
+    carries how many were dropped in between as `suppressed`.
+    """
+
+    def __init__(self, limit: int, window: float):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self.suppressed = 0
+        self._sites: dict[tuple, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING:
+            return True
+
+        now = monotonic()
+        key = (record.pathname, record.lineno)
+        site = self._sites.get(key)
+        if site is None or now - site[0] >= self.window:
+            dropped = site[2] if site else 0
+            site = self._sites[key] = [now, 0, 0]
+            if dropped:
+                record.suppressed = dropped
+        if site[1] >= self.limit:
+            site[2] += 1
+            self.suppressed += 1
+            return False
+        site[1] += 1
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread through a bounded queue. When the
+    queue is full the record is counted and dropped instead of blocking the
+    caller. Tracebacks are formatted by the listener, not the caller.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LoggingPipeline:
+
+    def __init__(self, level: str, fmt: str, queue_size: int, sample_limit: int, sample_window: float):
+        console = logging.StreamHandler(sys.stderr)
+        console.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(KEY_VALUE_FORMAT))
+
+        self.queue: queue.Queue = queue.Queue(queue_size)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.sampler = RepeatSampler(sample_limit, sample_window)
+        self.handler.addFilter(self.sampler)
+        self.listener = QueueListener(self.queue, console)
+
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        root.addHandler(self.handler)
+        root.setLevel(level)
+
+    def start(self):
+        self.listener.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Flushes what is queued; safe to call more than once."""
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def get_status(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "dropped": self.handler.dropped,
+            "suppressed": self.sampler.suppressed,
         }
-    }
-}
 
-logging.config.dictConfig(LOGGING)
+
+logging_pipeline = LoggingPipeline(
+    level=settings.LOG_LEVEL,
+    fmt=settings.LOG_FORMAT,
+    queue_size=settings.LOG_QUEUE_SIZE,
+    sample_limit=settings.LOG_SAMPLE_LIMIT,
+    sample_window=settings.LOG_SAMPLE_WINDOW,
+)
+logging_pipeline.start()
 logger = logging.getLogger(__name__)
@@ -0,0 +1,182 @@
+import os
+
+from config.config import settings
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ImportError:
+    prometheus_client = None
+
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Metrics:
+    """
+    Sink for the process-wide metrics. This base class drops everything; it is
+    used when metrics are disabled or prometheus_client is not installed, so
+    call sites never have to check.
+    """
+
+    enabled = False
+
+    def observe_request(self, method: str, route: str, status: int, phases: dict[str, float], queries: int):
+        pass
+
+    def observe_pool_checkout(self, pool: str, seconds: float, timed_out: bool):
+        pass
+
+    def pool_checked_out(self, pool: str, delta: int):
+        pass
+
+    def websocket_connected(self, delta: int):
+        pass
+
+    def observe_fan_out(self, seconds: float, recipients: int):
+        pass
+
+    def observe_mail(self, template: str, seconds: float, failed: bool):
+        pass
+
+    def render(self) -> tuple[bytes, str]:
+        return b"", "text/plain; charset=utf-8"
+
+    def serve(self, port: int) -> bool:
+        return False
+
+    def mark_process_dead(self):
+        pass
+
+
+class PrometheusMetrics(Metrics):
+    """
+    Metrics backed by prometheus_client. Labelled children are cached in
+    plain dicts, so the hot path is a dict lookup and one uncontended lock
+    per observation rather than a `labels()` call under the parent's lock.
+
+    Under several uvicorn workers, start them with PROMETHEUS_MULTIPROC_DIR
+    pointing at an empty directory: each worker then writes its values to
+    mmap'ed files there and `render` aggregates all of them, whichever
+    worker serves the scrape. Gauges are summed over live workers. The mail
+    outbox worker is a process of its own: start it with the same directory,
+    or it serves its metrics itself (see `serve`).
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.multiprocess = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+        self.registry = prometheus_client.CollectorRegistry()
+        histogram, counter, gauge = (
+            prometheus_client.Histogram, prometheus_client.Counter, prometheus_client.Gauge
+        )
+        registry = self.registry
+
+        self.request_duration = histogram(
+            "http_request_duration_seconds", "Request latency by route template.",
+            ["method", "route", "status"], registry=registry,
+        )
+        self.request_phase = histogram(
+            "http_request_phase_seconds", "Time spent per phase of a request, by route template.",
+            ["method", "route", "phase"], registry=registry,
+        )
+        self.request_queries = histogram(
+            "http_request_queries", "SQL statements executed per request, by route template.",
+            ["method", "route"], buckets=QUERY_BUCKETS, registry=registry,
+        )
+        self.pool_checkout = histogram(
+            "db_pool_checkout_seconds", "Time spent waiting for a pooled connection.",
+            ["pool"], registry=registry,
+        )
+        self.pool_timeouts = counter(
+            "db_pool_checkout_timeouts", "Checkouts that gave up waiting for a connection.",
+            ["pool"], registry=registry,
+        )
+        self.pool_checked_out_gauge = gauge(
+            "db_pool_checked_out", "Connections currently checked out of the pool.",
+            ["pool"], multiprocess_mode="livesum", registry=registry,
+        )
+        self.websocket_connections = gauge(
+            "ws_connections", "Open chat websocket connections.",
+            multiprocess_mode="livesum", registry=registry,
+        )
+        self.fan_out = histogram(
+            "ws_fan_out_seconds", "Time to encode and enqueue one chat message for its local recipients.",
+            registry=registry,
+        )
+        self.fan_out_deliveries = counter(
+            "ws_fan_out_deliveries", "Chat messages enqueued to local recipients.", registry=registry,
+        )
+        self.mail_duration = histogram(
+            "mail_send_seconds", "Time to render and send one mail.", ["template"], registry=registry,
+        )
+        self.mail_failures = counter(
+            "mail_send_failures", "Mails that failed to send.", ["template"], registry=registry,
+        )
+        self._children: dict[tuple, object] = {}
+
+    def _child(self, metric, *labels):
+        key = (metric._name, *labels)
+        if (child := self._children.get(key)) is None:
+            child = self._children[key] = metric.labels(*labels)
+        return child
+
+    def observe_request(self, method: str, route: str, status: int, phases: dict[str, float], queries: int):
+        self._child(self.request_duration, method, route, f"{status // 100}xx").observe(phases["total"])
+        for name, seconds in phases.items():
+            if name != "total":
+                self._child(self.request_phase, method, route, name).observe(seconds)
+        self._child(self.request_queries, method, route).observe(queries)
+
+    def observe_pool_checkout(self, pool: str, seconds: float, timed_out: bool):
+        self._child(self.pool_checkout, pool).observe(seconds)
+        if timed_out:
+            self._child(self.pool_timeouts, pool).inc()
+
+    def pool_checked_out(self, pool: str, delta: int):
+        self._child(self.pool_checked_out_gauge, pool).inc(delta)
+
+    def websocket_connected(self, delta: int):
+        self.websocket_connections.inc(delta)
+
+    def observe_fan_out(self, seconds: float, recipients: int):
+        self.fan_out.observe(seconds)
+        self.fan_out_deliveries.inc(recipients)
+
+    def observe_mail(self, template: str, seconds: float, failed: bool):
+        self._child(self.mail_duration, template).observe(seconds)
+        if failed:
+            self._child(self.mail_failures, template).inc()
+
+    def render(self) -> tuple[bytes, str]:
+        registry = self.registry
+        if self.multiprocess:
+            registry = prometheus_client.CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
+
+    def serve(self, port: int) -> bool:
+        """
+        Serves this process's metrics on `port`, for processes without an
+        HTTP app such as the mail outbox worker. In multiprocess mode the
+        values already reach every `/metrics` through the shared directory,
+        so nothing is started, to keep them from being scraped twice.
+        """
+        if self.multiprocess:
+            return False
+        prometheus_client.start_http_server(port, registry=self.registry)
+        return True
+
+    def mark_process_dead(self):
+        """Drops this worker's live gauges from the aggregate; call on shutdown."""
+        if self.multiprocess:
+            multiprocess.mark_process_dead(os.getpid())
+
+
+def create_metrics(enabled: bool = settings.METRICS_ENABLED) -> Metrics:
+    if enabled and prometheus_client is not None:
+        return PrometheusMetrics()
+    return Metrics()
+
+
+metrics = create_metrics()
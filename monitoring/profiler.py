@@ -0,0 +1,208 @@
+import hmac
+import sys
+import threading
+import uuid
+from collections import Counter, OrderedDict
+from time import perf_counter
+
+from starlette.datastructures import MutableHeaders
+
+from config.config import settings
+
+PROFILE_HEADER = "x-profile-token"
+
+
+class StackSampler:
+    """
+    Statistical profiler: a daemon thread snapshots the stack of every other
+    thread each `interval` seconds and counts identical stacks. Stacks are
+    rooted at `thread:<name>`, so the password hash workers and the event
+    loop can be told apart. Nothing runs until `start` and nothing is left
+    running after `stop`.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter[tuple[str, ...]] = Counter()
+        self.samples = 0
+        self.duration = 0.0
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._started_at = 0.0
+
+    def start(self):
+        self._started_at = perf_counter()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        self.duration = perf_counter() - self._started_at
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(f"thread:{names.get(thread_id, thread_id)}")
+                self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+
+def to_collapsed(stacks: Counter) -> str:
+    """Brendan Gregg's folded format, one `root;...;leaf count` line per stack, for flamegraph.pl."""
+    return "".join(f"{';'.join(stack)} {count}\n" for stack, count in stacks.most_common())
+
+
+def to_speedscope(stacks: Counter, name: str, interval: float) -> dict:
+    """A sampled profile in speedscope's file format, weighted in seconds."""
+    frame_index: dict[str, int] = {}
+    frames, samples, weights = [], [], []
+    for stack, count in stacks.most_common():
+        sample = []
+        for frame in stack:
+            if (index := frame_index.get(frame)) is None:
+                index = frame_index[frame] = len(frames)
+                function, _, location = frame.partition(" (")
+                file, _, line = location.rstrip(")").rpartition(":")
+                frames.append({"name": function, "file": file, "line": int(line)} if file else {"name": function})
+            sample.append(index)
+        samples.append(sample)
+        weights.append(count * interval)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+    }
+
+
+class Profiler:
+    """
+    Runs at most one sampling session at a time, either around a single
+    request or for a fixed number of seconds, and keeps the last `keep`
+    results to download. Disabled unless both `enabled` and `token` are set.
+    """
+
+    def __init__(self, enabled: bool, token: str, interval: float, max_seconds: float, keep: int = 20):
+        self.enabled = enabled
+        self.token = token
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.keep = keep
+        self.profiles: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return self.enabled and bool(self.token)
+
+    def authorized(self, token: str | None) -> bool:
+        return self.active and token is not None and hmac.compare_digest(token.encode(), self.token.encode())
+
+    def start(self) -> StackSampler | None:
+        """A running sampler, or None if another session holds it."""
+        if not self._lock.acquire(blocking=False):
+            return None
+        sampler = StackSampler(self.interval)
+        sampler.start()
+        return sampler
+
+    def finish(self, sampler: StackSampler, name: str) -> str:
+        """Stops the sampler, stores its result and returns the id to fetch it by."""
+        try:
+            sampler.stop()
+        finally:
+            self._lock.release()
+        profile_id = uuid.uuid4().hex
+        self.profiles[profile_id] = {
+            "name": name,
+            "samples": sampler.samples,
+            "duration": sampler.duration,
+            "stacks": sampler.stacks,
+        }
+        while len(self.profiles) > self.keep:
+            self.profiles.popitem(last=False)
+        return profile_id
+
+    def render(self, profile_id: str, fmt: str) -> str | dict | None:
+        if (profile := self.profiles.get(profile_id)) is None:
+            return None
+        if fmt == "collapsed":
+            return to_collapsed(profile["stacks"])
+        return to_speedscope(profile["stacks"], profile["name"], self.interval)
+
+    def get_status(self) -> dict:
+        return {
+            "enabled": self.active,
+            "running": self._lock.locked(),
+            "interval_ms": self.interval * 1000,
+            "profiles": [
+                {"id": profile_id, "name": profile["name"], "samples": profile["samples"],
+                 "duration_ms": round(profile["duration"] * 1000, 3)}
+                for profile_id, profile in self.profiles.items()
+            ],
+        }
+
+
+class ProfilerMiddleware:
+    """
+    Profiles a request that carries the profiler token in `X-Profile-Token`
+    and returns the id of the result in `X-Profile-Id`. Only installed when
+    the profiler is enabled. Samples cover every thread for the duration of
+    the request, so concurrent requests on the same loop show up as well.
+    Requests under `skip_prefix`, the profiler's own routes, are left alone.
+    """
+
+    def __init__(self, app, profiler: Profiler, skip_prefix: str = "/api/v1/system/profile"):
+        self.app = app
+        self.profiler = profiler
+        self.skip_prefix = skip_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.skip_prefix):
+            return await self.app(scope, receive, send)
+        token = next((value.decode() for key, value in scope["headers"] if key == PROFILE_HEADER.encode()), None)
+        if token is None or not self.profiler.authorized(token) or (sampler := self.profiler.start()) is None:
+            return await self.app(scope, receive, send)
+
+        finished = False
+
+        async def send_with_profile(message):
+            nonlocal finished
+            if message["type"] == "http.response.start":
+                finished = True
+                route = scope.get("route")
+                name = f"{scope['method']} {route.path if route else scope['path']}"
+                MutableHeaders(scope=message).append("X-Profile-Id", self.profiler.finish(sampler, name))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            if not finished:
+                self.profiler.finish(sampler, f"{scope['method']} {scope['path']} (failed)")
+
+
+profiler = Profiler(
+    enabled=settings.PROFILER_ENABLED,
+    token=settings.PROFILER_TOKEN,
+    interval=settings.PROFILER_INTERVAL,
+    max_seconds=settings.PROFILER_MAX_SECONDS,
+)
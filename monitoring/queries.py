@@ -0,0 +1,105 @@
+from collections import deque
+
+from config.config import settings
+from logger.logger import logger
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def parameter_shape(parameters, executemany: bool = False):
+    """Types of the bound parameters, never their values, so the log holds no user data."""
+    if executemany:
+        return {"rows": len(parameters), "row": parameter_shape(parameters[0]) if parameters else None}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+class QueryMonitor:
+    """
+    Logs statements slower than `slow_threshold` with their parameter shape
+    and route, and checks each request against a budget: at most
+    `max_queries` statements, `max_time` seconds of database time and
+    `max_duplicates` repeats of the same statement with the same parameters.
+    A request over budget is logged, or raises `QueryBudgetExceeded` when
+    `enforce` is set, as it is in the test suite.
+    """
+
+    def __init__(
+        self,
+        slow_threshold: float,
+        max_queries: int,
+        max_time: float,
+        max_duplicates: int,
+        enforce: bool = False,
+        keep: int = 50,
+    ):
+        self.slow_threshold = slow_threshold
+        self.max_queries = max_queries
+        self.max_time = max_time
+        self.max_duplicates = max_duplicates
+        self.enforce = enforce
+        self.slow_queries: deque[dict] = deque(maxlen=keep)
+        self.violations: deque[dict] = deque(maxlen=keep)
+        self.slow_count = 0
+        self.violation_count = 0
+
+    def observe(self, statement: str, parameters, executemany: bool, seconds: float, route: str):
+        if seconds < self.slow_threshold:
+            return
+        self.slow_count += 1
+        entry = {
+            "route": route,
+            "duration_ms": round(seconds * 1000, 3),
+            "statement": statement,
+            "parameters": parameter_shape(parameters, executemany),
+        }
+        self.slow_queries.append(entry)
+        logger.warning(f"Slow query: {entry}")
+
+    def check(self, route: str, queries: int, db_time: float, statements: dict[tuple, int]):
+        problems = []
+        if queries > self.max_queries:
+            problems.append(f"{queries} queries (budget {self.max_queries})")
+        if db_time > self.max_time:
+            problems.append(f"{db_time * 1000:.1f} ms in the database (budget {self.max_time * 1000:.0f} ms)")
+        for (statement, _), count in statements.items():
+            if count - 1 > self.max_duplicates:
+                problems.append(f"{count} identical executions of {' '.join(statement.split())!r}")
+        if not problems:
+            return
+
+        self.violation_count += 1
+        self.violations.append({"route": route, "problems": problems})
+        message = f"Query budget exceeded by {route}: {'; '.join(problems)}"
+        if self.enforce:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+    def get_status(self) -> dict:
+        return {
+            "slow_threshold_ms": self.slow_threshold * 1000,
+            "budget": {
+                "max_queries": self.max_queries,
+                "max_time_ms": self.max_time * 1000,
+                "max_duplicates": self.max_duplicates,
+                "enforce": self.enforce,
+            },
+            "slow_queries": self.slow_count,
+            "violations": self.violation_count,
+            "recent_slow_queries": list(self.slow_queries),
+            "recent_violations": list(self.violations),
+        }
+
+
+query_monitor = QueryMonitor(
+    slow_threshold=settings.SLOW_QUERY_THRESHOLD,
+    max_queries=settings.QUERY_BUDGET_MAX_QUERIES,
+    max_time=settings.QUERY_BUDGET_MAX_TIME,
+    max_duplicates=settings.QUERY_BUDGET_MAX_DUPLICATES,
+    enforce=settings.QUERY_BUDGET_ENFORCE,
+)
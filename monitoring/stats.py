@@ -0,0 +1,59 @@
+from bisect import bisect_left
+
+
+class TimingStats:
+    """Running count / total / max of durations recorded in seconds."""
+
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "avg_ms": round(self.total * 1000 / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class Histogram:
+    """Counts of durations over fixed upper bounds in seconds, plus the running TimingStats."""
+
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    __slots__ = ("stats", "counts")
+
+    def __init__(self):
+        self.stats = TimingStats()
+        self.counts = [0] * (len(self.BUCKETS) + 1)     # Last one is +Inf
+
+    def observe(self, seconds: float):
+        self.stats.observe(seconds)
+        self.counts[bisect_left(self.BUCKETS, seconds)] += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation; the max for the +Inf bucket."""
+        rank = q * self.stats.count
+        seen = 0
+        for bound, count in zip(self.BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.stats.max)
+        return self.stats.max
+
+    def as_dict(self) -> dict:
+        return {
+            **self.stats.as_dict(),
+            "p50_ms": round(self.quantile(0.5) * 1000, 3),
+            "p99_ms": round(self.quantile(0.99) * 1000, 3),
+        }
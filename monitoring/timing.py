@@ -0,0 +1,198 @@
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+from monitoring.metrics import metrics
+from monitoring.queries import query_monitor
+from monitoring.stats import Histogram
+
+
+class RequestTimer:
+    """What the current request has spent so far, per phase, plus the statements it ran."""
+
+    __slots__ = ("scope", "phases", "queries", "statements", "endpoint_done")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.phases: dict[str, float] = {}
+        self.queries = 0
+        # (statement, parameters) -> executions, to catch repeated lookups.
+        self.statements: dict[tuple, int] = {}
+        self.endpoint_done: float | None = None
+
+    @property
+    def route(self) -> str:
+        """`METHOD /route/template`, known once routing has matched."""
+        route = self.scope.get("route")
+        return f"{self.scope['method']} {route.path if route else 'unmatched'}"
+
+
+_current_request: ContextVar[RequestTimer | None] = ContextVar("current_request", default=None)
+
+
+def current_request() -> RequestTimer | None:
+    return _current_request.get()
+
+
+@contextmanager
+def phase(name: str):
+    """Adds the time spent in the block to the current request's `name` phase."""
+    timer = _current_request.get()
+    if timer is None:
+        yield
+        return
+
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timer.phases[name] = timer.phases.get(name, 0.0) + perf_counter() - start
+
+
+def record_phase(name: str, seconds: float):
+    if (timer := _current_request.get()) is not None:
+        timer.phases[name] = timer.phases.get(name, 0.0) + seconds
+
+
+def _mark_endpoint_done():
+    if (timer := _current_request.get()) is not None:
+        timer.endpoint_done = perf_counter()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = perf_counter() - conn.info["query_start"].pop()
+    timer = _current_request.get()
+    if timer is not None:
+        timer.phases["db"] = timer.phases.get("db", 0.0) + elapsed
+        timer.queries += 1
+        key = (statement, repr(parameters))
+        timer.statements[key] = timer.statements.get(key, 0) + 1
+    if elapsed >= query_monitor.slow_threshold:
+        query_monitor.observe(statement, parameters, executemany, elapsed, timer.route if timer else None)
+
+
+def _handle_error(context):
+    # A failed statement never reaches `after_cursor_execute`; drop its start time
+    # so the next statement on this connection is not timed from it.
+    if context.connection is not None and context.execution_context is not None:
+        if starts := context.connection.info.get("query_start"):
+            starts.pop()
+
+
+def instrument_sqlalchemy():
+    """
+    Times every statement of every engine, sync or async, as the `db` phase,
+    and reports slow ones to `query_monitor`.
+    """
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+
+
+class TimedRoute(APIRoute):
+    """
+    Marks when the endpoint returned, so the rest of the request - response
+    model validation, rendering and dependency teardown - is recorded as the
+    `serialize` phase.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The request handler reads `dependant.call` per request; the signature was already analysed.
+        endpoint = self.dependant.call
+        if asyncio.iscoroutinefunction(endpoint):
+            async def timed_endpoint(**values):
+                try:
+                    return await endpoint(**values)
+                finally:
+                    _mark_endpoint_done()
+        else:
+            def timed_endpoint(**values):
+                try:
+                    return endpoint(**values)
+                finally:
+                    _mark_endpoint_done()
+        self.dependant.call = timed_endpoint
+
+
+class RequestTimings:
+    """Per route and phase histograms of everything `ServerTimingMiddleware` measured."""
+
+    def __init__(self):
+        self.routes: dict[str, dict[str, Histogram]] = {}
+
+    def observe(self, route: str, phases: dict):
+        histograms = self.routes.setdefault(route, {})
+        for name, seconds in phases.items():
+            if (histogram := histograms.get(name)) is None:
+                histogram = histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def clear(self):
+        self.routes.clear()
+
+    def get_status(self) -> dict:
+        return {
+            route: {name: histogram.as_dict() for name, histogram in histograms.items()}
+            for route, histograms in self.routes.items()
+        }
+
+
+request_timings = RequestTimings()
+
+
+class ServerTimingMiddleware:
+    """
+    Collects the phases recorded while handling a request, adds them as a
+    `Server-Timing` header (`auth;dur=1.2, db;dur=0.8, ..., total;dur=9.1`,
+    in milliseconds) and feeds `request_timings`, unless disabled. Phases may
+    overlap: `auth` includes the query that loads the user, which is also
+    counted in `db`. Request metrics are exported either way.
+    """
+
+    def __init__(self, app, enabled: bool = True):
+        self.app = app
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timer = RequestTimer(scope)
+        start = perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                now = perf_counter()
+                phases = timer.phases
+                if timer.endpoint_done is not None:
+                    phases["serialize"] = now - timer.endpoint_done
+                phases["total"] = now - start
+
+                route = scope.get("route")
+                route_path = route.path if route else "unmatched"
+                if self.enabled:
+                    MutableHeaders(scope=message).append(
+                        "Server-Timing", ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in phases.items())
+                    )
+                    request_timings.observe(timer.route, phases)
+                metrics.observe_request(scope["method"], route_path, message["status"], phases, timer.queries)
+                query_monitor.check(timer.route, timer.queries, phases.get("db", 0.0), timer.statements)
+            await send(message)
+
+        token = _current_request.set(timer)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_request.reset(token)
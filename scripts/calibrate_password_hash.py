@@ -0,0 +1,79 @@
+"""
+Pick password-hash parameters that hit a target verification time on this machine.
+
+Raises the bcrypt rounds, or the argon2 time cost at a fixed memory cost,
+until one verification takes longer than --target-ms, and prints the
+strongest setting that stays within the target as .env lines.
+
+    python -m scripts.calibrate_password_hash --scheme bcrypt --target-ms 250
+    python -m scripts.calibrate_password_hash --scheme argon2 --target-ms 100 --memory-cost 65536
+"""
+import argparse
+import json
+from time import perf_counter
+
+from config.config import settings
+from src.api.v1.utils.auth import build_password_context
+
+SAMPLE_PASSWORD = "Calibrate@123"
+
+
+def measure_verify(context, samples: int) -> float:
+    hashed = context.hash(SAMPLE_PASSWORD)
+    timings = []
+    for _ in range(samples):
+        start = perf_counter()
+        context.verify(SAMPLE_PASSWORD, hashed)
+        timings.append(perf_counter() - start)
+    return min(timings) * 1000
+
+
+def calibrate_bcrypt(target_ms: float, samples: int) -> dict:
+    best = {"BCRYPT_ROUNDS": 4}
+    for rounds in range(4, 32):
+        elapsed = measure_verify(build_password_context(["bcrypt"], bcrypt_rounds=rounds), samples)
+        print(f"bcrypt rounds={rounds}: {elapsed:.1f} ms")
+        if elapsed > target_ms:
+            break
+        best = {"BCRYPT_ROUNDS": rounds}
+    return best
+
+
+def calibrate_argon2(target_ms: float, samples: int, memory_cost: int, parallelism: int) -> dict:
+    best = {"ARGON2_TIME_COST": 1, "ARGON2_MEMORY_COST": memory_cost, "ARGON2_PARALLELISM": parallelism}
+    for time_cost in range(1, 64):
+        context = build_password_context(
+            ["argon2"], argon2_time_cost=time_cost, argon2_memory_cost=memory_cost, argon2_parallelism=parallelism
+        )
+        elapsed = measure_verify(context, samples)
+        print(f"argon2id t={time_cost} m={memory_cost} p={parallelism}: {elapsed:.1f} ms")
+        if elapsed > target_ms:
+            break
+        best["ARGON2_TIME_COST"] = time_cost
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scheme", choices=["bcrypt", "argon2"], default="bcrypt")
+    parser.add_argument("--target-ms", type=float, default=250)
+    parser.add_argument("--samples", type=int, default=3)
+    parser.add_argument("--memory-cost", type=int, default=65536, help="argon2 memory cost in KiB")
+    parser.add_argument("--parallelism", type=int, default=4, help="argon2 lanes")
+    args = parser.parse_args()
+
+    if args.scheme == "bcrypt":
+        result = calibrate_bcrypt(args.target_ms, args.samples)
+    else:
+        result = calibrate_argon2(args.target_ms, args.samples, args.memory_cost, args.parallelism)
+
+    # The current schemes stay after the new one, so existing hashes still verify and migrate on login.
+    schemes = [args.scheme] + [scheme for scheme in settings.PASSWORD_HASH_SCHEMES if scheme != args.scheme]
+    print("\n# Suggested settings")
+    print(f"PASSWORD_HASH_SCHEMES={json.dumps(schemes)}")
+    for key, value in result.items():
+        print(f"{key}={value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Generate a JWT signing key into JWT_KEYS_DIR for RS256 or EdDSA.
+
+The new key becomes the active signing key (last by name) unless
+JWT_ACTIVE_KID pins another one. Keep the previous key file until every token
+it signed has expired, or convert it to `<kid>.pub.pem` to keep it verify-only.
+
+    python -m scripts.generate_jwt_key --algorithm RS256
+"""
+import argparse
+import os
+from datetime import datetime
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+
+from config.config import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--algorithm", choices=["RS256", "EdDSA"], default=settings.ALGORITHM)
+    parser.add_argument("--kid", default=datetime.now().strftime("%Y%m%d%H%M%S"))
+    parser.add_argument("--keys-dir", default=settings.JWT_KEYS_DIR)
+    args = parser.parse_args()
+
+    if args.algorithm == "EdDSA":
+        private_key = ed25519.Ed25519PrivateKey.generate()
+    else:
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    os.makedirs(args.keys_dir, exist_ok=True)
+    path = os.path.join(args.keys_dir, f"{args.kid}.pem")
+    with open(path, "wb") as key_file:
+        key_file.write(private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        ))
+    os.chmod(path, 0o600)
+    print(f"Wrote {args.algorithm} key '{args.kid}' to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Send the mails queued in `mail_outbox`, outside the web workers.
+
+Runs until SIGINT/SIGTERM, draining due mails in batches over a pool of
+authenticated SMTP connections. Start as many as needed; they claim rows
+with SKIP LOCKED. For local development, point it at an SMTP stand-in such
+as `python -m aiosmtpd -n -l 127.0.0.1:1025` with MAIL_SERVER=127.0.0.1,
+MAIL_PORT=1025, MAIL_STARTTLS=false and MAIL_USE_CREDENTIALS=false.
+
+Mail send latency and failures are Prometheus metrics of this process.
+Started with the web workers' PROMETHEUS_MULTIPROC_DIR they show up in the
+app's /metrics; otherwise the worker serves them on --metrics-port.
+
+    python -m scripts.mail_worker
+    python -m scripts.mail_worker --once
+"""
+import argparse
+import asyncio
+import signal
+
+from config.config import settings
+from database.db_connection import AsyncSessionLocal, dispose_async_engine, init_async_engine
+from logger.logger import logger
+from monitoring.metrics import metrics
+from src.api.v1.utils.mail_outbox import MailOutboxWorker, SMTPConnectionPool
+from src.api.v1.utils.mail_templates import mail_templates
+
+
+async def run(args):
+    init_async_engine()
+    mail_templates.load_all()
+    if args.metrics_port and metrics.serve(args.metrics_port):
+        logger.info(f"Mail worker metrics on port {args.metrics_port}.")
+    worker = MailOutboxWorker(
+        AsyncSessionLocal, SMTPConnectionPool(args.pool_size), batch_size=args.batch_size
+    )
+    try:
+        if args.once:
+            while await worker.run_once() == worker.batch_size:
+                pass
+            await worker.pool.close()
+        else:
+            stop = asyncio.Event()
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(sig, stop.set)
+            await worker.run(stop)
+    finally:
+        await dispose_async_engine()
+        metrics.mark_process_dead()
+    print(worker.get_status())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pool-size", type=int, default=settings.MAIL_SMTP_POOL_SIZE)
+    parser.add_argument("--batch-size", type=int, default=settings.MAIL_OUTBOX_BATCH_SIZE)
+    parser.add_argument("--metrics-port", type=int, default=settings.MAIL_WORKER_METRICS_PORT,
+                        help="Serve Prometheus metrics on this port unless PROMETHEUS_MULTIPROC_DIR is set, 0 disables")
+    parser.add_argument("--once", action="store_true", help="Send what is due now, then exit")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,4 +2,12 @@ INCORRECT_EMAIL_OR_PASSWORD = "Incorrect Email or Password"
 USER_EMAIL_ALREADY_EXISTS = "User with email already exist."
 USER_NOT_FOUND = "User Not found"
 EMAIL_NOT_VERIFIED = "Email is not verified."
-EMAIL_VERIFICATION_SUCCESS = "Email Verified Successfully."
\ No newline at end of file
+EMAIL_VERIFICATION_SUCCESS = "Email Verified Successfully."
+SERVICE_BUSY = "Server is busy, please retry later."
+TOKEN_REVOKED = "Token has been revoked."
+LOGOUT_SUCCESS = "Logged out successfully."
+TOO_MANY_REQUESTS = "Too many requests, please retry later."
+INVALID_CHAT_COMMAND = "Invalid chat command."
+NOT_IN_ROOM = "Join the room before sending messages to it."
+PROFILER_BUSY = "A profiling session is already running."
+PROFILE_NOT_FOUND = "Profile not found."
@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from sqlalchemy import JSON, Column, DateTime, Index, Integer, String, Text, func
+
+from database.db_connection import Base
+from src.api.v1.models.user_models.user import TimeStampModelMixin
+
+
+class OutboxMail(Base, TimeStampModelMixin):
+    """A mail waiting for the outbox worker; rows stay after sending as a delivery log."""
+
+    __tablename__ = "mail_outbox"
+
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+
+    id = Column(Integer, primary_key=True)
+    recipient = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=False)
+    template_name = Column(String(255), nullable=False)
+    template_body = Column(JSON, nullable=False, default=dict)
+    status = Column(String(16), nullable=False, default=PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, server_default=func.now(), default=datetime.now)
+    sent_at = Column(DateTime)
+    last_error = Column(Text)
+
+    __table_args__ = (
+        # The worker polls for due pending mails; the partial index stays as small as the backlog.
+        Index(
+            "ix_mail_outbox_pending", "next_attempt_at",
+            postgresql_where=(status == PENDING), sqlite_where=(status == PENDING),
+        ),
+    )
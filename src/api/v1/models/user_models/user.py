@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, func
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Index, func
 
 from database.db_connection import Base
 
@@ -15,6 +15,11 @@ class User(Base, TimeStampModelMixin):
 
     id = Column(Integer, primary_key=True, unique=True)
     full_name = Column(String(255))
-    email = Column(String(255), index=True, unique=True)
+    # Stored lower-cased; lookups compare `lower(email)` so they hit ix_user_email_lower.
+    email = Column(String(255))
     password = Column(String)
     is_active = Column(Boolean, default=False)
+
+    __table_args__ = (
+        Index("ix_user_email_lower", func.lower(email), unique=True),
+    )
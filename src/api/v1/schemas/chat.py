@@ -0,0 +1,21 @@
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+
+class ChatCommand(BaseModel):
+    action: Literal["join", "leave", "message", "direct", "pong"]   # "pong" answers a "ping" envelope
+    room: Optional[str] = Field(None, min_length=1, max_length=64, pattern=r"^[\w.-]+$")
+    to: Optional[int] = None
+    text: Optional[str] = Field(None, min_length=1, max_length=4096)
+    since: Optional[int] = Field(None, ge=-1)   # Last offset seen in the room, replayed on join
+
+    @model_validator(mode="after")
+    def check_target(self):
+        if self.action in ("join", "leave", "message") and self.room is None:
+            raise ValueError(f"'{self.action}' requires a room.")
+        if self.action == "direct" and self.to is None:
+            raise ValueError("'direct' requires a recipient user id in 'to'.")
+        if self.action in ("message", "direct") and self.text is None:
+            raise ValueError(f"'{self.action}' requires a text.")
+        return self
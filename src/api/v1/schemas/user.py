@@ -9,6 +9,11 @@ class UserBase(BaseModel):
     email: EmailStr
     password: str
 
+    @field_validator("email")
+    @classmethod
+    def normalize_email(cls, email: str):
+        return email.lower()
+
 
 class UserResponse(BaseModel):
     id: int
@@ -33,3 +38,7 @@ class UserCreate(UserBase):
                 'Password must be at least 8 characters long, contain at least one uppercase letter, one lowercase letter, one digit, and one special character.'
             )
         return password
+
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
@@ -1,16 +1,22 @@
 from datetime import datetime
 
-from fastapi import APIRouter, Depends
-from fastapi.websockets import WebSocket
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.websockets import WebSocket, WebSocketDisconnect
 from jwt import InvalidTokenError
 from pydantic import ValidationError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import async_sessionmaker
 
-from database.db_connection import get_db
+from config.config import settings
+from database.db_connection import get_async_session_factory
 from logger.logger import logger
+from src.api.v1.constants.messages import INVALID_CHAT_COMMAND, NOT_IN_ROOM
+from src.api.v1.schemas.chat import ChatCommand
 from src.api.v1.utils.auth import decode_token
+from src.api.v1.utils.chat_envelope import JSON, available_encodings, make_envelope
 from src.api.v1.utils.dependencies import ActiveUserCheck
+from src.api.v1.utils.jwt_bearer import access_token_validator
 from src.api.v1.utils.socket_manager import connection_manager
+from src.api.v1.utils.token_cache import UserPrincipal, verified_token_cache
 from src.api.v1.utils.user_service import UserService
 
 websocket_router = APIRouter(tags=["Websocket"], prefix="/ws")
@@ -19,8 +25,15 @@ active_user_check = Depends(ActiveUserCheck)
 
 
 @websocket_router.websocket("/user_chat")
-async def user_chat_websocket(websocket: WebSocket, db: Session = Depends(get_db)):
-    await connection_manager.connect(websocket, "access_token")
+async def user_chat_websocket(
+    websocket: WebSocket, session_factory: async_sessionmaker = Depends(get_async_session_factory)
+):
+    encoding = websocket.query_params.get("encoding", JSON)
+    if encoding not in available_encodings():
+        await connection_manager.connect(websocket, "access_token")
+        await connection_manager.disconnect(websocket, code=1003, reason="Unsupported encoding.")
+        return
+    await connection_manager.connect(websocket, "access_token", encoding=encoding)
 
     sub_protocols = websocket.scope.get("subprotocols")
     if not sub_protocols or len(sub_protocols) != 2:
@@ -44,13 +57,93 @@ async def user_chat_websocket(websocket: WebSocket, db: Session = Depends(get_db
         await connection_manager.disconnect(websocket, code=3000, reason="Invalid Access token.")
         return
 
-    if user := UserService().get_user_by_email(email, db):
+    if user := await get_chat_user(sub_protocols[1], token_data, session_factory):
         logger.info(f"User '{user.email}' is connected to chat.")
-        while True:
-            data = await websocket.receive_text()
-            # sending message to broadcast connections
-            await connection_manager.broadcast_message(message=f"Message From {user.full_name} : {data}")
+        connection_manager.bind_user(websocket, user.id, expires_at=token_data["exp"])
+        connection_manager.join(websocket, settings.WS_DEFAULT_ROOM, since=get_resume_offset(websocket))
+        try:
+            while True:
+                data = await websocket.receive_text()
+                await handle_chat_message(websocket, user, data)
+        except WebSocketDisconnect:
+            logger.info(f"User '{user.email}' is disconnected from chat.")
+        finally:
+            connection_manager.remove(websocket)
 
     else:
         await connection_manager.disconnect(websocket, code=3000, reason="Invalid Access token.")
         return
+
+
+def get_resume_offset(websocket: WebSocket) -> int | None:
+    """`?since=<offset>` resumes the default room after the last offset the client saw."""
+    try:
+        return max(-1, int(websocket.query_params["since"]))
+    except (KeyError, ValueError):
+        return None
+
+
+async def get_chat_user(token: str, token_data: dict, session_factory: async_sessionmaker) -> UserPrincipal | None:
+    """Resolve the user with a session that is closed again before the chat loop starts."""
+    principal = verified_token_cache.get(token)
+    try:
+        # The same checks as `JWTBearer.authenticate`: only unrevoked access tokens may chat.
+        access_token_validator.validate_token_type(principal.claims if principal else token_data)
+        access_token_validator.validate_not_revoked(principal.claims if principal else token_data)
+    except HTTPException:
+        return None
+    if principal:
+        return principal.user
+
+    async with session_factory() as db:
+        user = await UserService().get_user_by_email(token_data["email"], db)
+        if user is None:
+            return None
+        return verified_token_cache.set(token, token_data, UserPrincipal.from_user(user)).user
+
+
+async def handle_chat_message(websocket: WebSocket, user: UserPrincipal, data: str):
+    """
+    Plain text goes to the default room; JSON frames are `ChatCommand`s to
+    join or leave a room, post to a joined room or message a user directly.
+    Replies are envelopes in the encoding negotiated with `?encoding=`.
+    A `pong` answers a heartbeat and does not count as activity.
+    """
+    sender = {"id": user.id, "name": user.full_name}
+    if not data.lstrip().startswith("{"):
+        connection_manager.touch(websocket)
+        await connection_manager.send_to_room(
+            settings.WS_DEFAULT_ROOM,
+            message=make_envelope("message", room=settings.WS_DEFAULT_ROOM, sender=sender, text=data),
+        )
+        return
+
+    try:
+        command = ChatCommand.model_validate_json(data)
+    except ValidationError as e:
+        connection_manager.touch(websocket)
+        await connection_manager.send_message(
+            make_envelope("error", detail=f"{INVALID_CHAT_COMMAND} {e.errors()[0]['msg']}"), websocket
+        )
+        return
+
+    connection_manager.touch(websocket, active=command.action != "pong")
+    if command.action == "pong":
+        return
+    elif command.action == "join":
+        connection_manager.join(websocket, command.room, since=command.since)
+    elif command.action == "leave":
+        connection_manager.leave(websocket, command.room)
+    elif command.action == "message":
+        if not connection_manager.is_member(websocket, command.room):
+            await connection_manager.send_message(make_envelope("error", detail=NOT_IN_ROOM), websocket)
+            return
+        await connection_manager.send_to_room(
+            command.room, message=make_envelope("message", room=command.room, sender=sender, text=command.text)
+        )
+    else:
+        message = make_envelope("direct", to=command.to, sender=sender, text=command.text)
+        await connection_manager.send_to_user(command.to, message)
+        if command.to != user.id:
+            # Echo to the sender's own connections, including other devices.
+            await connection_manager.send_to_user(user.id, message)
@@ -3,63 +3,92 @@ import os
 
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine, StaticPool
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import NullPool, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
 # Make the app.py accessible in tree structure.
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../..")))
 
 from app import app
+from config.config import settings
+from monitoring.queries import query_monitor
 from src.api.v1.schemas.user import UserCreate
+from src.api.v1.utils.rate_limit import rate_limit_backend
+from src.api.v1.utils.token_cache import verified_token_cache
 from src.api.v1.utils.user_service import UserService
-from database.db_connection import Base, get_db
+from database.db_connection import Base, get_async_db, get_async_session_factory
 
-SQLITE_DATABASE_URL = "sqlite:///./test_db.db"
+SQLITE_DATABASE_URL = "sqlite+aiosqlite:///./test_db.db"
 
-engine = create_engine(SQLITE_DATABASE_URL, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+engine = create_async_engine(SQLITE_DATABASE_URL, connect_args={"check_same_thread": False}, poolclass=NullPool)
 
-TestSession = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+TestSession = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
 
-Base.metadata.create_all(bind=engine)
+# Fail any request that goes over its query budget, so N+1s and repeated lookups break the build.
+query_monitor.enforce = True
 
 
-@pytest.fixture(scope="function")
-def db_session():
-    connection = engine.connect()
-    transaction = connection.begin()
+async def create_tables():
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
 
-    Base.metadata.create_all(bind=engine)
 
-    session = TestSession(bind=connection)
-    yield session
+async def drop_tables():
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
 
-    session.close()
 
-    Base.metadata.drop_all(bind=engine)
-
-    transaction.rollback()
-    connection.close()
+@pytest.fixture(scope="function")
+def db_session():
+    return TestSession()
 
 
 @pytest.fixture(scope="function")
 def test_client(db_session):
-    def override_get_db():
+    async def override_get_async_db():
         try:
             yield db_session
         finally:
-            db_session.close()
+            await db_session.close()
 
-    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_async_session_factory] = lambda: TestSession
 
+    # The async session is bound to the client's event loop, so all database
+    # work in tests goes through `test_client.portal`.
     with TestClient(app) as test_client:
+        test_client.portal.call(create_tables)
         yield test_client
+        test_client.portal.call(db_session.close)
+        test_client.portal.call(drop_tables)
+    verified_token_cache.clear()
+    rate_limit_backend.clear()
 
 
 @pytest.fixture(scope="function")
-def create_user(db_session):
-    return UserService().create_user(
+def create_user(test_client, db_session):
+    return test_client.portal.call(
+        UserService().create_user,
         UserCreate(
             full_name="Admin", email="admin@gmail.com", password="Admin@123"
         ),
         db_session,
     )
+
+
+@pytest.fixture(scope="function")
+def operator_headers(monkeypatch):
+    monkeypatch.setattr(settings, "SYSTEM_STATUS_TOKEN", "operator-secret")
+    return {"X-Operator-Token": "operator-secret"}
+
+
+@pytest.fixture(scope="function")
+def executed_statements():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
@@ -1,13 +1,36 @@
-from unittest import mock
+import asyncio
+from time import time
 
+import fakeredis
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
 from fastapi import status
+from passlib.hash import md5_crypt
+from sqlalchemy import select
 
+from config.config import settings
 from src.api.v1.constants.messages import (EMAIL_NOT_VERIFIED,
                                            INCORRECT_EMAIL_OR_PASSWORD,
+                                           LOGOUT_SUCCESS,
+                                           SERVICE_BUSY,
+                                           TOKEN_REVOKED,
+                                           TOO_MANY_REQUESTS,
                                            USER_EMAIL_ALREADY_EXISTS,
                                            USER_NOT_FOUND)
+from src.api.v1.models.mail_models.outbox import OutboxMail
 from src.api.v1.models.user_models.user import User
 from src.api.v1.schemas.user import UserCreate, UserResponse
+from src.api.v1.utils import auth as auth_utils
+from src.api.v1.utils.hash_pool import password_hash_pool
+from src.api.v1.utils.jwt_keys import JWTKeySet
+from src.api.v1.utils.rate_limit import (InMemoryRateLimitBackend,
+                                         RedisRateLimitBackend)
+from src.api.v1.utils.token_cache import UserPrincipal, VerifiedTokenCache
+from src.api.v1.utils.token_revocation import (BloomFilter,
+                                               InMemoryRevocationStore,
+                                               RedisRevocationStore)
 from src.api.v1.utils.user_service import UserService
 
 
@@ -79,10 +102,7 @@ class TestRegistrationAPI:
             ]
         }
 
-    @mock.patch("src.utils.tasks.FastMail.send_message")
-    def test_api_with_successfully_registration(
-        self, mock_fast_mail, test_client, db_session
-    ):
+    def test_api_with_successfully_registration(self, test_client, db_session):
         response = test_client.post(
             self.url,
             json={
@@ -91,9 +111,12 @@ class TestRegistrationAPI:
                 "password": "Adam@123",
             },
         )
-        mock_fast_mail.assert_called_once()
-        instance = (
-            db_session.query(User).filter(User.email.ilike(f"%adam@gmail.com%")).one()
+        mail = test_client.portal.call(db_session.scalar, select(OutboxMail))
+        assert mail.recipient == "adam@gmail.com"
+        assert mail.status == OutboxMail.PENDING
+        assert mail.template_body["verify_email_link"].startswith(settings.BACKEND_DOMAIN)
+        instance = test_client.portal.call(
+            db_session.scalar, select(User).filter(User.email.ilike(f"%adam@gmail.com%"))
         )
         assert response.status_code == status.HTTP_200_OK
         assert instance is not None
@@ -102,21 +125,46 @@ class TestRegistrationAPI:
             == response.json()
         )
 
-    @mock.patch("src.utils.tasks.FastMail.send_message")
-    def test_api_with_user_email_already_exists(
-        self, mock_fast_mail, test_client, db_session
-    ):
+    def test_user_is_not_created_without_its_activation_mail(self, test_client, db_session, monkeypatch):
+        async def fail_to_queue(*args, **kwargs):
+            raise RuntimeError("Process died before the mail was queued.")
+
+        monkeypatch.setattr("src.api.v1.views.auth.send_account_activation_mail", fail_to_queue)
+        with pytest.raises(RuntimeError):
+            test_client.post(
+                self.url, json={"email": "adam@gmail.com", "full_name": "Adam", "password": "Adam@123"}
+            )
+        assert test_client.portal.call(db_session.scalar, select(User)) is None
+        assert test_client.portal.call(db_session.scalar, select(OutboxMail)) is None
+
+    def test_api_with_user_email_already_exists(self, test_client, db_session):
         payload = {
             "email": "adam@gmail.com",
             "password": "Adam@123",
             "full_name": "Adam",
         }
         test_client.post(self.url, json=payload)
-        mock_fast_mail.assert_called_once()
 
         response = test_client.post(self.url, json=payload)
         assert response.status_code == status.HTTP_400_BAD_REQUEST
         assert response.json() == {"detail": USER_EMAIL_ALREADY_EXISTS}
+        mails = test_client.portal.call(db_session.scalars, select(OutboxMail))
+        assert len(mails.all()) == 1
+
+    def test_api_stores_lower_cased_email(self, test_client):
+        response = test_client.post(
+            self.url,
+            json={"email": "Adam@Gmail.com", "full_name": "Adam", "password": "Adam@123"},
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["email"] == "adam@gmail.com"
+
+        response = test_client.post(
+            self.url,
+            json={"email": "ADAM@gmail.com", "full_name": "Adam", "password": "Adam@123"},
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {"detail": USER_EMAIL_ALREADY_EXISTS}
 
 
 class TestLoginAPI:
@@ -125,13 +173,14 @@ class TestLoginAPI:
         self.url = "/api/v1/auth/login"
 
     @staticmethod
-    def set_active_user(user, db_session):
+    def set_active_user(user, db_session, test_client):
         user.is_active = True
-        db_session.commit()
+        test_client.portal.call(db_session.commit)
 
     @staticmethod
-    def create_user(db_session, is_active=False):
-        user = UserService().create_user(
+    def create_user(db_session, test_client, is_active=False):
+        user = test_client.portal.call(
+            UserService().create_user,
             UserCreate(
                 full_name="Admin", email="admin@gmail.com", password="Admin@123"
             ),
@@ -140,7 +189,7 @@ class TestLoginAPI:
         # If this flag set to True, then update user is active status to True.
         if is_active:
             user.is_active = True
-            db_session.commit()
+            test_client.portal.call(db_session.commit)
         return user
 
     def test_api_without_payload(self, test_client, db_session):
@@ -179,7 +228,7 @@ class TestLoginAPI:
         assert response.json() == {"detail": EMAIL_NOT_VERIFIED}
 
     def test_api_with_invalid_password(self, test_client, db_session, create_user):
-        self.set_active_user(create_user, db_session)
+        self.set_active_user(create_user, db_session, test_client)
 
         response = test_client.post(
             self.url, json={"email": "admin@gmail.com", "password": "Admin"}
@@ -188,7 +237,7 @@ class TestLoginAPI:
         assert response.json() == {"detail": INCORRECT_EMAIL_OR_PASSWORD}
 
     def test_api_with_correct_credentials(self, test_client, db_session, create_user):
-        self.set_active_user(create_user, db_session)
+        self.set_active_user(create_user, db_session, test_client)
 
         response = test_client.post(
             self.url, json={"email": "admin@gmail.com", "password": "Admin@123"}
@@ -200,4 +249,327 @@ class TestLoginAPI:
                 key in ["access_token", "refresh_token", "token_type", "user_data"]
                 for key in response.json().keys()
             ]
-        )
\ No newline at end of file
+        )
+
+    def test_api_with_mixed_case_email(self, test_client, db_session, create_user):
+        self.set_active_user(create_user, db_session, test_client)
+
+        response = test_client.post(
+            self.url, json={"email": "Admin@Gmail.com", "password": "Admin@123"}
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_api_does_not_match_email_substring(self, test_client, db_session, create_user):
+        self.set_active_user(create_user, db_session, test_client)
+
+        response = test_client.post(
+            self.url, json={"email": "min@gmail.com", "password": "Admin@123"}
+        )
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert response.json() == {"detail": USER_NOT_FOUND}
+
+    def test_api_when_password_hash_pool_is_saturated(
+        self, test_client, db_session, create_user, monkeypatch
+    ):
+        self.set_active_user(create_user, db_session, test_client)
+        monkeypatch.setattr(password_hash_pool, "max_pending", 0)
+
+        response = test_client.post(
+            self.url, json={"email": "admin@gmail.com", "password": "Admin@123"}
+        )
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.headers["Retry-After"] == str(password_hash_pool.retry_after)
+        assert response.json() == {"detail": SERVICE_BUSY}
+
+    def test_api_rehashes_outdated_password_hash(
+        self, test_client, db_session, create_user, monkeypatch
+    ):
+        monkeypatch.setattr(
+            auth_utils, "pwd_context", auth_utils.build_password_context(["bcrypt", "md5_crypt"])
+        )
+        create_user.password = md5_crypt.hash("Admin@123")
+        self.set_active_user(create_user, db_session, test_client)
+
+        response = test_client.post(
+            self.url, json={"email": "admin@gmail.com", "password": "Admin@123"}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        stored_hash = test_client.portal.call(
+            db_session.scalar, select(User.password).filter(User.email == "admin@gmail.com")
+        )
+        assert stored_hash.startswith("$2b$")
+        assert auth_utils.pwd_context.verify("Admin@123", stored_hash)
+
+
+class TestVerifiedTokenCache:
+
+    def setup_method(self):
+        self.user = UserPrincipal(
+            id=1, full_name="Admin", email="admin@gmail.com", is_active=True, created_at=None
+        )
+
+    def claims(self, jti, exp_in=60):
+        return {"email": self.user.email, "jti": jti, "exp": time() + exp_in}
+
+    def test_entry_never_outlives_token_expiry(self):
+        cache = VerifiedTokenCache(max_size=10, ttl=300)
+        cache.set("token", self.claims("a", exp_in=-1), self.user)
+        assert cache.get("token") is None
+        assert cache.get_status()["size"] == 0
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = VerifiedTokenCache(max_size=2, ttl=300)
+        cache.set("first", self.claims("a"), self.user)
+        cache.set("second", self.claims("b"), self.user)
+        cache.get("first")
+        cache.set("third", self.claims("c"), self.user)
+
+        assert cache.get("second") is None
+        assert cache.get("first") is not None
+        assert cache.get_status()["evictions"] == 1
+
+    def test_invalidation_hooks(self):
+        cache = VerifiedTokenCache(max_size=10, ttl=300)
+        cache.set("first", self.claims("a"), self.user)
+        cache.set("second", self.claims("b"), self.user)
+
+        cache.invalidate_jti("a")
+        assert cache.get("first") is None
+        assert cache.get("second") is not None
+
+        cache.invalidate_user(self.user.email)
+        assert cache.get("second") is None
+
+
+class TestLogoutAndRefreshAPI:
+
+    def setup_method(self):
+        self.login_url = "/api/v1/auth/login"
+        self.logout_url = "/api/v1/auth/logout"
+        self.refresh_url = "/api/v1/auth/refresh_token"
+        self.profile_url = "/api/v1/user/me"
+
+    def login(self, test_client, db_session, user):
+        user.is_active = True
+        test_client.portal.call(db_session.commit)
+        return test_client.post(
+            self.login_url, json={"email": "admin@gmail.com", "password": "Admin@123"}
+        ).json()
+
+    def test_logout_revokes_access_and_refresh_tokens(self, test_client, db_session, create_user):
+        tokens = self.login(test_client, db_session, create_user)
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        assert test_client.get(self.profile_url, headers=headers).status_code == status.HTTP_200_OK
+
+        response = test_client.post(
+            self.logout_url, headers=headers, json={"refresh_token": tokens["refresh_token"]}
+        )
+        assert response.json() == {"message": LOGOUT_SUCCESS}
+
+        response = test_client.get(self.profile_url, headers=headers)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert response.json() == {"detail": TOKEN_REVOKED}
+
+        response = test_client.get(
+            self.refresh_url, headers={"Authorization": f"Bearer {tokens['refresh_token']}"}
+        )
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_refresh_token_rotates_on_use(self, test_client, db_session, create_user):
+        tokens = self.login(test_client, db_session, create_user)
+        headers = {"Authorization": f"Bearer {tokens['refresh_token']}"}
+
+        response = test_client.get(self.refresh_url, headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        rotated = response.json()
+        assert rotated["refresh_token"] != tokens["refresh_token"]
+
+        # The old refresh token cannot be exchanged a second time.
+        response = test_client.get(self.refresh_url, headers=headers)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+        response = test_client.get(
+            self.refresh_url, headers={"Authorization": f"Bearer {rotated['refresh_token']}"}
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+
+class TestTokenRevocationStore:
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(capacity=1000)
+        keys = [f"jti-{i}" for i in range(1000)]
+        for key in keys:
+            bloom.add(key)
+        assert all(key in bloom for key in keys)
+        assert sum(f"other-{i}" in bloom for i in range(1000)) < 50
+
+    def test_revoked_token_is_pruned_at_expiry(self, monkeypatch):
+        store = InMemoryRevocationStore(bloom_capacity=100)
+        now = time()
+        assert asyncio.run(store.revoke("a", now + 10)) is True
+        assert asyncio.run(store.revoke("a", now + 10)) is False
+        assert store.is_revoked("a")
+        assert not store.is_revoked("b")
+
+        monkeypatch.setattr("src.api.v1.utils.token_revocation.time", lambda: now + 11)
+        assert not store.is_revoked("a")
+        assert store.get_status()["revoked"] == 0
+
+    def test_redis_store_shares_revocations_between_workers(self):
+
+        async def scenario():
+            server = fakeredis.FakeServer()
+            first = RedisRevocationStore(100, client=fakeredis.FakeAsyncRedis(server=server, decode_responses=True))
+            second = RedisRevocationStore(100, client=fakeredis.FakeAsyncRedis(server=server, decode_responses=True))
+            await first.load()
+            await second.load()
+
+            assert await first.revoke("a", time() + 60) is True
+            # Rotation is atomic across workers: the second worker cannot revoke it again.
+            assert await second.revoke("a", time() + 60) is False
+
+            await second.sync()
+            late = RedisRevocationStore(100, client=fakeredis.FakeAsyncRedis(server=server, decode_responses=True))
+            await late.load()
+            return second.is_revoked("a"), late.is_revoked("a")
+
+        assert asyncio.run(scenario()) == (True, True)
+
+    def test_redis_store_prunes_expired_tokens_while_running(self):
+
+        async def scenario():
+            client = fakeredis.FakeAsyncRedis(decode_responses=True)
+            store = RedisRevocationStore(100, client=client, sync_interval=0.01, prune_interval=0.01)
+            await store.start()
+            await store.revoke("live", time() + 60)
+            # Expired after the worker started, as a long-running deployment would see it.
+            await client.zadd(store.revoked_key, {"expired": time() - 1})
+            for _ in range(50):
+                await asyncio.sleep(0.02)
+                if await client.zcard(store.revoked_key) == 1:
+                    break
+            members = await client.zrange(store.revoked_key, 0, -1)
+            await store.stop()
+            return members
+
+        assert asyncio.run(scenario()) == ["live"]
+
+
+class TestJWTKeySet:
+
+    @staticmethod
+    def write_key(keys_dir, kid, private_key, public_only=False):
+        if public_only:
+            data = private_key.public_key().public_bytes(
+                serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+            )
+            (keys_dir / f"{kid}.pub.pem").write_bytes(data)
+        else:
+            data = private_key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            )
+            (keys_dir / f"{kid}.pem").write_bytes(data)
+
+    def test_sign_and_verify_with_rotation_overlap(self, tmp_path):
+        old_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.write_key(tmp_path, "2024", old_key)
+        key_set = JWTKeySet("RS256", str(tmp_path))
+
+        kid, key = key_set.signing_key()
+        old_token = jwt.encode({"email": "admin@gmail.com"}, key, algorithm="RS256", headers={"kid": kid})
+
+        # Rotate: new key signs, the retired one only verifies.
+        (tmp_path / "2024.pem").unlink()
+        self.write_key(tmp_path, "2024", old_key, public_only=True)
+        self.write_key(tmp_path, "2025", rsa.generate_private_key(public_exponent=65537, key_size=2048))
+        key_set.load()
+
+        assert key_set.signing_key()[0] == "2025"
+        header = jwt.get_unverified_header(old_token)
+        assert jwt.decode(old_token, key_set.verification_key(header["kid"]), algorithms=["RS256"])
+        assert key_set.verification_key("unknown") is None
+        assert sorted(key["kid"] for key in key_set.jwks()[0]["keys"]) == ["2024", "2025"]
+
+    def test_unknown_kid_reloads_are_rate_limited(self, tmp_path, monkeypatch):
+        self.write_key(tmp_path, "2024", rsa.generate_private_key(public_exponent=65537, key_size=2048))
+        key_set = JWTKeySet("RS256", str(tmp_path), unknown_kid_interval=60)
+        key_set.signing_key()
+        reloads = []
+        monkeypatch.setattr(key_set, "_maybe_reload", lambda force=False: reloads.append(force))
+
+        for _ in range(100):
+            assert key_set.verification_key("forged") is None
+        assert reloads.count(True) == 1
+
+        key_set._next_forced_check = 0
+        key_set.verification_key("forged")
+        assert reloads.count(True) == 2
+
+    def test_eddsa_keys(self, tmp_path):
+        self.write_key(tmp_path, "ed", ed25519.Ed25519PrivateKey.generate())
+        key_set = JWTKeySet("EdDSA", str(tmp_path))
+
+        kid, key = key_set.signing_key()
+        token = jwt.encode({"sub": "1"}, key, algorithm="EdDSA", headers={"kid": kid})
+        assert jwt.decode(token, key_set.verification_key(kid), algorithms=["EdDSA"]) == {"sub": "1"}
+        assert key_set.jwks()[0]["keys"][0]["crv"] == "Ed25519"
+
+    def test_jwks_endpoint_sets_cache_headers(self, test_client):
+        response = test_client.get("/.well-known/jwks.json")
+        assert response.status_code == status.HTTP_200_OK
+        assert "max-age=" in response.headers["Cache-Control"]
+
+        response = test_client.get(
+            "/.well-known/jwks.json", headers={"If-None-Match": response.headers["ETag"]}
+        )
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+class TestRateLimit:
+
+    def setup_method(self):
+        self.login_url = "/api/v1/auth/login"
+
+    def test_login_is_limited_per_account(self, test_client):
+        payload = {"email": "Target@gmail.com", "password": "fake-password"}
+        for remaining in reversed(range(settings.RATE_LIMIT_LOGIN_PER_ACCOUNT)):
+            response = test_client.post(self.login_url, json=payload)
+            assert response.status_code == status.HTTP_404_NOT_FOUND
+            assert response.headers["RateLimit-Limit"] == str(settings.RATE_LIMIT_LOGIN_PER_ACCOUNT)
+            assert response.headers["RateLimit-Remaining"] == str(remaining)
+
+        response = test_client.post(self.login_url, json=payload)
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert response.json() == {"detail": TOO_MANY_REQUESTS}
+        assert int(response.headers["Retry-After"]) > 0
+
+        # Other accounts from the same client are not affected.
+        response = test_client.post(self.login_url, json={**payload, "email": "other@gmail.com"})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_sliding_window_weights_previous_window(self, monkeypatch):
+        backend = InMemoryRateLimitBackend()
+        clock = [1000.0]
+        monkeypatch.setattr("src.api.v1.utils.rate_limit.time", lambda: clock[0])
+
+        assert all(backend.hit_nowait("key", 4, 10).allowed for _ in range(4))
+        assert not backend.hit_nowait("key", 4, 10).allowed
+
+        # Halfway into the next window half of the previous count still applies.
+        clock[0] = 1015.0
+        assert [backend.hit_nowait("key", 4, 10).allowed for _ in range(3)] == [True, True, False]
+
+    def test_redis_backend_shares_counters(self):
+
+        async def scenario():
+            server = fakeredis.FakeServer()
+            workers = [
+                RedisRateLimitBackend(client=fakeredis.FakeAsyncRedis(server=server, decode_responses=True))
+                for _ in range(2)
+            ]
+            return [(await workers[i % 2].hit("key", 3, 60)).allowed for i in range(4)]
+
+        assert asyncio.run(scenario()) == [True, True, True, False]
@@ -0,0 +1,241 @@
+import asyncio
+import email
+import email.policy
+from datetime import datetime, timedelta
+
+import aiosmtplib
+import pytest
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from sqlalchemy import select
+
+from monitoring.metrics import metrics
+from src.api.v1.models.mail_models.outbox import OutboxMail
+from src.api.v1.tests.conftest import TestSession
+from src.api.v1.utils.mail_outbox import MailOutboxWorker, SMTPConnectionPool, enqueue_mail, render_messages
+from src.api.v1.utils.mail_templates import MailTemplates, inline_css
+
+
+class SMTPStandIn:
+    """Just enough of an SMTP server to accept mail, counting sessions and messages."""
+
+    def __init__(self, reject: set[str] = frozenset()):
+        self.reject = reject
+        self.sessions = 0
+        self.messages: list[tuple[list[str], bytes]] = []
+        self.server: asyncio.Server | None = None
+        self._writers: set[asyncio.StreamWriter] = set()
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self._session, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        for writer in self._writers:
+            writer.close()
+        self.server.close()
+
+    async def _session(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.sessions += 1
+        self._writers.add(writer)
+        recipients = []
+        writer.write(b"220 stand-in ESMTP\r\n")
+        while line := await reader.readline():
+            command = line.decode().strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                writer.write(b"250 stand-in\r\n")
+            elif verb == "RCPT":
+                address = command.split(":", 1)[1].strip("<> ")
+                if address in self.reject:
+                    writer.write(b"550 Mailbox unavailable\r\n")
+                else:
+                    recipients.append(address)
+                    writer.write(b"250 OK\r\n")
+            elif verb == "DATA":
+                writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                await writer.drain()
+                body = b""
+                while (data := await reader.readline()) != b".\r\n":
+                    body += data
+                self.messages.append((recipients, body))
+                recipients = []
+                writer.write(b"250 Queued\r\n")
+            elif verb == "QUIT":
+                writer.write(b"221 Bye\r\n")
+                await writer.drain()
+                break
+            elif verb == "RSET":
+                recipients = []
+                writer.write(b"250 OK\r\n")
+            else:
+                # MAIL, NOOP
+                writer.write(b"250 OK\r\n")
+            await writer.drain()
+        self._writers.discard(writer)
+        writer.close()
+
+
+class TestMailOutboxWorker:
+
+    @pytest.fixture
+    def smtp(self, test_client):
+        stand_in = SMTPStandIn(reject={"bounce@gmail.com"})
+        port = test_client.portal.call(stand_in.start)
+
+        async def connect():
+            connection = aiosmtplib.SMTP(hostname="127.0.0.1", port=port, start_tls=False)
+            await connection.connect()
+            return connection
+
+        stand_in.connect = connect
+        yield stand_in
+        test_client.portal.call(stand_in.stop)
+
+    @staticmethod
+    def enqueue(test_client, db_session, *recipients):
+        for recipient in recipients:
+            enqueue_mail(
+                db_session, recipient=recipient, subject="User Account Activation",
+                template_name="verify_email.html",
+                template_body={"verify_email_link": "http://localhost/verify/token", "email": recipient},
+            )
+        test_client.portal.call(db_session.commit)
+
+    @staticmethod
+    def mails(test_client) -> dict[str, OutboxMail]:
+        async def load():
+            async with TestSession() as db:
+                return {mail.recipient: mail for mail in (await db.scalars(select(OutboxMail))).all()}
+        return test_client.portal.call(load)
+
+    def test_batch_is_sent_over_pooled_connections(self, test_client, db_session, smtp):
+        recipients = [f"user{i}@gmail.com" for i in range(6)]
+        self.enqueue(test_client, db_session, *recipients)
+        worker = MailOutboxWorker(TestSession, SMTPConnectionPool(2, smtp.connect), batch_size=4)
+
+        assert test_client.portal.call(worker.run_once) == 4
+        assert test_client.portal.call(worker.run_once) == 2
+        assert test_client.portal.call(worker.run_once) == 0
+        test_client.portal.call(worker.pool.close)
+
+        assert smtp.sessions == worker.pool.opened <= 2
+        assert sorted(to[0] for to, _ in smtp.messages) == sorted(recipients)
+        html = email.message_from_bytes(smtp.messages[0][1]).get_payload(decode=True)
+        assert b'href="http://localhost/verify/token"' in html
+        assert all(mail.status == OutboxMail.SENT for mail in self.mails(test_client).values())
+
+    def test_batch_is_claimed_and_committed_before_sending(self, test_client, db_session, smtp):
+        self.enqueue(test_client, db_session, "adam@gmail.com")
+        seen_while_sending = []
+
+        async def connect():
+            # A separate session sees the claim, so no transaction is held across SMTP I/O.
+            async with TestSession() as db:
+                seen_while_sending.extend((await db.scalars(select(OutboxMail))).all())
+            return await smtp.connect()
+
+        worker = MailOutboxWorker(TestSession, SMTPConnectionPool(1, connect), claim_timeout=600)
+        assert test_client.portal.call(worker.run_once) == 1
+        test_client.portal.call(worker.pool.close)
+
+        claimed, = seen_while_sending
+        assert (claimed.status, claimed.attempts) == (OutboxMail.PENDING, 1)
+        assert claimed.next_attempt_at > datetime.now() + timedelta(seconds=500)
+        mail = self.mails(test_client)["adam@gmail.com"]
+        assert (mail.status, mail.attempts) == (OutboxMail.SENT, 1)
+
+    def test_permanent_rejection_fails_without_retry(self, test_client, db_session, smtp):
+        self.enqueue(test_client, db_session, "bounce@gmail.com", "adam@gmail.com")
+        worker = MailOutboxWorker(TestSession, SMTPConnectionPool(1, smtp.connect))
+
+        test_client.portal.call(worker.run_once)
+        test_client.portal.call(worker.pool.close)
+
+        mails = self.mails(test_client)
+        assert mails["bounce@gmail.com"].status == OutboxMail.FAILED
+        assert "550" in mails["bounce@gmail.com"].last_error
+        assert mails["adam@gmail.com"].status == OutboxMail.SENT
+        # The rejection did not cost the connection.
+        assert smtp.sessions == 1
+
+    def test_unreachable_server_is_retried_with_backoff(self, test_client, db_session):
+        async def refuse():
+            raise aiosmtplib.SMTPConnectError("Connection refused")
+
+        self.enqueue(test_client, db_session, "adam@gmail.com")
+        worker = MailOutboxWorker(
+            TestSession, SMTPConnectionPool(1, refuse), max_attempts=2, retry_base=30, retry_max=60
+        )
+        failures_before = metrics.enabled and metrics.registry.get_sample_value(
+            "mail_send_failures_total", {"template": "verify_email.html"}
+        ) or 0
+
+        test_client.portal.call(worker.run_once)
+        mail = self.mails(test_client)["adam@gmail.com"]
+        assert (mail.status, mail.attempts) == (OutboxMail.PENDING, 1)
+        assert mail.next_attempt_at > datetime.now() + timedelta(seconds=25)
+        # Not due yet.
+        assert test_client.portal.call(worker.run_once) == 0
+
+        async def make_due():
+            async with TestSession() as db:
+                (await db.get(OutboxMail, mail.id)).next_attempt_at = datetime.now()
+                await db.commit()
+
+        test_client.portal.call(make_due)
+        test_client.portal.call(worker.run_once)
+        mail = self.mails(test_client)["adam@gmail.com"]
+        assert (mail.status, mail.attempts) == (OutboxMail.FAILED, 2)
+        assert worker.get_status() == {"sent": 0, "retried": 1, "failed": 1, "smtp_connections_opened": 0}
+        if metrics.enabled:
+            assert metrics.registry.get_sample_value(
+                "mail_send_failures_total", {"template": "verify_email.html"}
+            ) == failures_before + 2
+
+
+class TestMailTemplates:
+
+    context = {"email": "adam@gmail.com", "verify_email_link": "http://localhost/verify?token=a&next=<b>"}
+
+    def test_prerendered_template_matches_jinja(self):
+        templates = MailTemplates("templates")
+        assert templates.load_all() == ["verify_email.html"]
+        assert templates.get_status() == {"templates": {"verify_email.html": "prerendered"}}
+
+        jinja = Environment(loader=FileSystemLoader("templates"), autoescape=select_autoescape())
+        expected = jinja.get_template("verify_email.html").render(self.context)
+        assert templates.render("verify_email.html", self.context) == expected
+        assert "token=a&amp;next=&lt;b&gt;" in expected
+
+    def test_templates_with_logic_fall_back_to_jinja(self, tmp_path):
+        (tmp_path / "digest.html").write_text("{% for item in items %}<li>{{ item|upper }}</li>{% endfor %}")
+        templates = MailTemplates(str(tmp_path))
+
+        assert templates.render_many("digest.html", [{"items": ["a", "b"]}, {"items": []}]) == ["<li>A</li><li>B</li>", ""]
+        assert templates.get_status() == {"templates": {"digest.html": "jinja"}}
+
+    def test_style_rules_are_inlined_at_compile_time(self, tmp_path):
+        source = (
+            "<html><head><style>p { color: red; } .note { margin: 0 } #title { font-size: 20px }"
+            " div p { color: blue } @media (max-width: 600px) { p { color: green } }</style></head>"
+            '<body><h1 id="title">{{ name }}</h1><p class="note" style="color: black">Hi</p><p>Bye</p></body></html>'
+        )
+        html = inline_css(source)
+
+        assert '<h1 id="title" style="font-size: 20px">' in html
+        assert '<p class="note" style="color: red; margin: 0; color: black">' in html
+        assert '<p style="color: red">Bye</p>' in html
+        assert "<style>div p { color: blue } @media (max-width: 600px) { p { color: green } }</style>" in html
+
+        (tmp_path / "welcome.html").write_text(source)
+        rendered = MailTemplates(str(tmp_path)).render("welcome.html", {"name": "Adam"})
+        assert '<h1 id="title" style="font-size: 20px">Adam</h1>' in rendered
+
+    def test_bulk_render_builds_one_message_per_recipient(self):
+        recipients = [(f"user{i}@gmail.com", {**self.context, "email": f"user{i}@gmail.com"}) for i in range(3)]
+        messages = render_messages("verify_email.html", "Kontoaktivierung für Sie", recipients)
+
+        assert [message["To"] for message in messages] == [recipient for recipient, _ in recipients]
+        parsed = email.message_from_bytes(messages[2].as_bytes(), policy=email.policy.default)
+        assert parsed["Subject"] == "Kontoaktivierung für Sie"
+        assert "user2@gmail.com" in parsed.get_content()
@@ -0,0 +1,348 @@
+import asyncio
+import json
+import logging
+import queue
+import socket
+import sys
+import threading
+
+import pytest
+from collections import Counter
+from time import perf_counter
+from urllib.request import urlopen
+
+from fastapi import FastAPI, HTTPException, status
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from config.config import settings
+from database.pool import TimedQueuePool, get_pool_status
+from logger.logger import DroppingQueueHandler, JsonFormatter, RepeatSampler
+from monitoring.metrics import metrics
+from monitoring.profiler import Profiler, ProfilerMiddleware, profiler, to_collapsed, to_speedscope
+from monitoring.queries import QueryBudgetExceeded, QueryMonitor, query_monitor
+from monitoring.stats import Histogram
+from monitoring.timing import instrument_sqlalchemy, request_timings
+from src.api.v1.utils.hash_pool import PasswordHashPool
+
+
+class TestDBPoolStatusAPI:
+
+    def setup_method(self):
+        self.url = "/api/v1/system/db-pool"
+
+    def test_api_returns_pool_status(self, test_client, operator_headers):
+        response = test_client.get(self.url, headers=operator_headers)
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["pool_size"] == settings.DB_POOL_SIZE
+        assert data["checked_out"] == 0
+        assert data["checkout_timeouts"] == 0
+
+    def test_status_endpoints_are_hidden_without_operator_token(self, test_client, operator_headers):
+        assert test_client.get(self.url).status_code == status.HTTP_404_NOT_FOUND
+        response = test_client.get("/api/v1/system/queries", headers={"X-Operator-Token": "wrong"})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+class TestTimedQueuePool:
+
+    def test_checkout_is_recorded(self):
+        engine = create_engine("sqlite://", poolclass=TimedQueuePool, pool_size=2)
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            assert get_pool_status(engine.pool)["checked_out"] == 1
+
+        pool_status = get_pool_status(engine.pool)
+        assert pool_status["checked_out"] == 0
+        assert pool_status["checkout_wait"]["count"] == 1
+        engine.dispose()
+
+
+class TestPasswordHashPool:
+
+    def test_api_returns_pool_status(self, test_client, operator_headers):
+        response = test_client.get("/api/v1/system/password-hash-pool", headers=operator_headers)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["max_workers"] == settings.PASSWORD_HASH_WORKERS
+
+    def test_rejects_jobs_beyond_queue_limit(self):
+        pool = PasswordHashPool(max_workers=1, max_queue=0, retry_after=3)
+        release = threading.Event()
+
+        async def scenario():
+            blocked = asyncio.ensure_future(pool.run(release.wait))
+            await asyncio.sleep(0.01)
+            with pytest.raises(HTTPException) as err:
+                await pool.run(str.upper, "x")
+            release.set()
+            await blocked
+            return err.value
+
+        error = asyncio.run(scenario())
+        pool.shutdown()
+        assert error.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert error.headers == {"Retry-After": "3"}
+        assert pool.get_status()["rejected"] == 1
+        assert pool.get_status()["hash_time"]["count"] == 1
+
+
+    def test_cancelled_caller_keeps_its_slot_until_the_job_finishes(self):
+        pool = PasswordHashPool(max_workers=1, max_queue=0)
+        release = threading.Event()
+
+        async def scenario():
+            abandoned = asyncio.ensure_future(pool.run(release.wait))
+            await asyncio.sleep(0.01)
+            abandoned.cancel()
+            await asyncio.sleep(0.01)
+            # The hash is still running, so the pool is still full.
+            pending_while_running = pool.pending
+            with pytest.raises(HTTPException):
+                await pool.run(str.upper, "x")
+            release.set()
+            for _ in range(100):
+                if pool.pending == 0:
+                    break
+                await asyncio.sleep(0.01)
+            return pending_while_running, await pool.run(str.upper, "x")
+
+        pending_while_running, result = asyncio.run(scenario())
+        pool.shutdown()
+        assert pending_while_running == 1
+        assert result == "X"
+        assert pool.pending == 0
+
+
+class TestServerTiming:
+
+    def test_login_reports_phases(self, test_client, db_session, create_user, operator_headers):
+        create_user.is_active = True
+        test_client.portal.call(db_session.commit)
+        request_timings.clear()
+
+        response = test_client.post(
+            "/api/v1/auth/login", json={"email": "admin@gmail.com", "password": "Admin@123"}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        phases = dict(entry.split(";dur=") for entry in response.headers["Server-Timing"].split(", "))
+        assert {"db", "hash", "token", "serialize", "total"} <= set(phases)
+        assert float(phases["hash"]) <= float(phases["total"])
+
+        timings = test_client.get("/api/v1/system/timing", headers=operator_headers).json()
+        assert timings["POST /api/v1/auth/login"]["hash"]["count"] == 1
+
+    def test_auth_dependency_is_timed(self, test_client, db_session, create_user):
+        create_user.is_active = True
+        test_client.portal.call(db_session.commit)
+        access_token = test_client.post(
+            "/api/v1/auth/login", json={"email": "admin@gmail.com", "password": "Admin@123"}
+        ).json()["access_token"]
+
+        response = test_client.get("/api/v1/user/me", headers={"Authorization": f"Bearer {access_token}"})
+        assert "auth;dur=" in response.headers["Server-Timing"]
+
+    def test_histogram_quantiles(self):
+        histogram = Histogram()
+        for _ in range(98):
+            histogram.observe(0.002)
+        histogram.observe(0.2)
+        histogram.observe(30)
+
+        assert histogram.quantile(0.5) == 0.0025
+        assert histogram.quantile(0.99) == 0.25
+        assert histogram.quantile(1) == 30
+        assert histogram.as_dict()["count"] == 100
+
+
+class TestLoggingPipeline:
+
+    def make_record(self, msg: str, level: int = logging.ERROR, lineno: int = 10, **extra):
+        record = logging.LogRecord("app", level, "auth.py", lineno, msg, None, None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_json_formatter_includes_extra_fields_and_traceback(self):
+        try:
+            raise ValueError("bad token")
+        except ValueError:
+            record = logging.LogRecord("app", logging.ERROR, "auth.py", 10, "failed %s", ("x",), sys.exc_info())
+        record.user_id = 7
+
+        entry = json.loads(JsonFormatter().format(record))
+        assert entry["message"] == "failed x"
+        assert entry["level"] == "ERROR"
+        assert entry["user_id"] == 7
+        assert "ValueError: bad token" in entry["exc"]
+
+    def test_repeated_errors_are_sampled_per_call_site(self):
+        sampler = RepeatSampler(limit=2, window=60)
+        results = [sampler.filter(self.make_record(f"invalid token {i}")) for i in range(5)]
+        assert results == [True, True, False, False, False]
+        assert sampler.filter(self.make_record("other site", lineno=20))
+        assert sampler.filter(self.make_record("debug", level=logging.DEBUG))
+        assert sampler.suppressed == 3
+
+        sampler.window = 0
+        record = self.make_record("invalid token 5")
+        assert sampler.filter(record)
+        assert record.suppressed == 3
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = DroppingQueueHandler(queue.Queue(2))
+        for i in range(5):
+            handler.handle(self.make_record(f"message {i}"))
+        assert handler.queue.qsize() == 2
+        assert handler.dropped == 3
+
+    def test_api_returns_logging_status(self, test_client, operator_headers):
+        data = test_client.get("/api/v1/system/logging", headers=operator_headers).json()
+        assert {"queued", "queue_size", "dropped", "suppressed"} <= set(data)
+
+
+def busy_endpoint():
+    deadline = perf_counter() + 0.1
+    while perf_counter() < deadline:
+        pass
+    return {"done": True}
+
+
+class TestProfiler:
+
+    @pytest.fixture
+    def enabled_profiler(self):
+        enabled, token = profiler.enabled, profiler.token
+        profiler.enabled, profiler.token = True, "profile-secret"
+        yield {"X-Profile-Token": "profile-secret"}
+        profiler.enabled, profiler.token = enabled, token
+
+    def test_output_formats(self):
+        stacks = Counter({("thread:MainThread", "main (app.py:1)", "login (auth.py:10)"): 3,
+                          ("thread:MainThread", "main (app.py:1)"): 1})
+
+        assert to_collapsed(stacks).splitlines() == [
+            "thread:MainThread;main (app.py:1);login (auth.py:10) 3",
+            "thread:MainThread;main (app.py:1) 1",
+        ]
+        speedscope = to_speedscope(stacks, "POST /login", 0.01)
+        assert speedscope["shared"]["frames"][2] == {"name": "login", "file": "auth.py", "line": 10}
+        assert speedscope["profiles"][0]["samples"] == [[0, 1, 2], [0, 1]]
+        assert speedscope["profiles"][0]["weights"] == [0.03, 0.01]
+
+    def test_routes_are_hidden_without_token(self, test_client, enabled_profiler):
+        assert test_client.get("/api/v1/system/profile").status_code == status.HTTP_404_NOT_FOUND
+        response = test_client.get("/api/v1/system/profile", headers={"X-Profile-Token": "wrong"})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_session_profile_can_be_downloaded(self, test_client, enabled_profiler):
+        session = test_client.post("/api/v1/system/profile/session?seconds=0.05", headers=enabled_profiler)
+        assert session.status_code == status.HTTP_200_OK
+        assert session.json()["samples"] > 0
+        profile_id = session.json()["id"]
+
+        collapsed = test_client.get(f"/api/v1/system/profile/{profile_id}?format=collapsed", headers=enabled_profiler)
+        assert "thread:" in collapsed.text
+        speedscope = test_client.get(f"/api/v1/system/profile/{profile_id}", headers=enabled_profiler)
+        assert speedscope.json()["profiles"][0]["type"] == "sampled"
+        assert speedscope.headers["content-disposition"].endswith('.speedscope.json"')
+
+    def test_middleware_profiles_requests_with_token(self):
+        request_profiler = Profiler(enabled=True, token="secret", interval=0.001, max_seconds=1)
+        app = FastAPI()
+        app.get("/busy")(busy_endpoint)
+        app.add_middleware(ProfilerMiddleware, profiler=request_profiler)
+
+        with TestClient(app) as client:
+            assert "X-Profile-Id" not in client.get("/busy").headers
+            profile_id = client.get("/busy", headers={"X-Profile-Token": "secret"}).headers["X-Profile-Id"]
+
+        assert "busy_endpoint" in request_profiler.render(profile_id, "collapsed")
+        assert request_profiler.get_status()["running"] is False
+
+
+class TestQueryMonitor:
+
+    def test_slow_queries_record_parameter_shape_and_route(self):
+        monitor = QueryMonitor(slow_threshold=0.1, max_queries=10, max_time=1, max_duplicates=0)
+        monitor.observe("SELECT 1", {"email_1": "admin@gmail.com"}, False, 0.05, "GET /fast")
+        monitor.observe("SELECT * FROM users WHERE email = ?", ("admin@gmail.com",), False, 0.3, "GET /slow")
+
+        status = monitor.get_status()
+        assert status["slow_queries"] == 1
+        slow = status["recent_slow_queries"][0]
+        assert slow["route"] == "GET /slow"
+        assert slow["parameters"] == ["str"]
+        assert "admin@gmail.com" not in str(slow)
+
+    def test_repeated_lookup_exceeds_budget(self):
+        monitor = QueryMonitor(slow_threshold=1, max_queries=10, max_time=1, max_duplicates=0, enforce=True)
+        monitor.check("GET /ok", 2, 0.01, {("SELECT a", "()"): 1, ("SELECT b", "()"): 1})
+
+        with pytest.raises(QueryBudgetExceeded, match="3 identical executions"):
+            monitor.check("GET /user/me", 3, 0.01, {("SELECT user", "('admin@gmail.com',)"): 3})
+        assert monitor.get_status()["violations"] == 1
+
+    def test_failed_statement_does_not_skew_timing(self):
+        instrument_sqlalchemy()
+        engine = create_engine("sqlite://")
+        with engine.connect() as connection:
+            with pytest.raises(OperationalError):
+                connection.execute(text("SELECT * FROM missing"))
+            assert connection.info["query_start"] == []
+            connection.execute(text("SELECT 1"))
+            assert connection.info["query_start"] == []
+        engine.dispose()
+
+    def test_budget_is_enforced_per_request(self, test_client, db_session, create_user):
+        create_user.is_active = True
+        test_client.portal.call(db_session.commit)
+        max_queries, query_monitor.max_queries = query_monitor.max_queries, 0
+        try:
+            with pytest.raises(QueryBudgetExceeded, match="POST /api/v1/auth/login"):
+                test_client.post("/api/v1/auth/login", json={"email": "admin@gmail.com", "password": "Admin@123"})
+        finally:
+            query_monitor.max_queries = max_queries
+
+
+@pytest.mark.skipif(not metrics.enabled, reason="prometheus_client is not installed")
+class TestMetrics:
+
+    def sample(self, name: str, **labels) -> float:
+        return metrics.registry.get_sample_value(name, labels) or 0.0
+
+    def test_requests_are_exported_by_route_template(self, test_client, db_session, create_user):
+        create_user.is_active = True
+        test_client.portal.call(db_session.commit)
+        labels = {"method": "POST", "route": "/api/v1/auth/login"}
+        before = self.sample("http_request_duration_seconds_count", **labels, status="2xx")
+
+        test_client.post("/api/v1/auth/login", json={"email": "admin@gmail.com", "password": "Admin@123"})
+
+        response = test_client.get("/metrics")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "http_request_queries_bucket" in response.text
+        assert self.sample("http_request_duration_seconds_count", **labels, status="2xx") == before + 1
+        assert self.sample("http_request_phase_seconds_count", **labels, phase="hash") >= 1
+        assert self.sample("http_request_queries_sum", **labels) >= 1
+
+    def test_pool_checkouts_are_tracked(self):
+        engine = create_engine("sqlite://", poolclass=TimedQueuePool, pool_size=1, max_overflow=0)
+        before = self.sample("db_pool_checkout_seconds_count", pool="sync")
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            assert self.sample("db_pool_checked_out", pool="sync") >= 1
+        engine.dispose()
+        assert self.sample("db_pool_checkout_seconds_count", pool="sync") == before + 1
+        assert self.sample("db_pool_checked_out", pool="sync") == 0
+
+    def test_worker_process_serves_its_own_metrics(self):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        metrics.observe_mail("verify_email.html", 0.01, failed=True)
+
+        assert metrics.serve(port)
+        body = urlopen(f"http://127.0.0.1:{port}/metrics").read().decode()
+        assert 'mail_send_failures_total{template="verify_email.html"}' in body
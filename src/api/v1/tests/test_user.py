@@ -0,0 +1,93 @@
+from fastapi import status
+
+from app import app
+from database.db_connection import get_async_db
+
+from src.api.v1.schemas.user import UserResponse
+from src.api.v1.utils.token_cache import verified_token_cache
+from src.api.v1.utils.user_service import UserService
+
+
+class TestUserProfileAPI:
+
+    def setup_method(self):
+        self.login_url = "/api/v1/auth/login"
+        self.url = "/api/v1/user/me"
+
+    @staticmethod
+    def set_active_user(user, db_session, test_client):
+        user.is_active = True
+        test_client.portal.call(db_session.commit)
+
+    def login(self, test_client):
+        response = test_client.post(
+            self.login_url, json={"email": "admin@gmail.com", "password": "Admin@123"}
+        )
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    def test_api_without_token(self, test_client):
+        response = test_client.get(self.url)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_api_with_refresh_token(self, test_client, db_session, create_user):
+        self.set_active_user(create_user, db_session, test_client)
+        refresh_token = test_client.post(
+            self.login_url, json={"email": "admin@gmail.com", "password": "Admin@123"}
+        ).json()["refresh_token"]
+
+        response = test_client.get(self.url, headers={"Authorization": f"Bearer {refresh_token}"})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_api_serves_repeated_token_from_cache(self, test_client, db_session, create_user):
+        self.set_active_user(create_user, db_session, test_client)
+        headers = self.login(test_client)
+
+        first = test_client.get(self.url, headers=headers)
+        hits = verified_token_cache.hits
+        second = test_client.get(self.url, headers=headers)
+
+        assert first.status_code == second.status_code == status.HTTP_200_OK
+        assert first.json() == UserResponse.model_validate(create_user).model_dump(mode="json")
+        assert second.json() == first.json()
+        assert verified_token_cache.hits == hits + 1
+
+    def test_api_reflects_user_update(self, test_client, db_session, create_user):
+        self.set_active_user(create_user, db_session, test_client)
+        headers = self.login(test_client)
+        test_client.get(self.url, headers=headers)
+
+        user = test_client.portal.call(UserService().get_user_by_email, "admin@gmail.com", db_session)
+        test_client.portal.call(
+            UserService().update_user, user, {"full_name": "Administrator"}, db_session
+        )
+
+        response = test_client.get(self.url, headers=headers)
+        assert response.json()["full_name"] == "Administrator"
+
+    def test_api_resolves_user_once_per_request(
+        self, test_client, db_session, create_user, executed_statements
+    ):
+        self.set_active_user(create_user, db_session, test_client)
+        headers = self.login(test_client)
+        verified_token_cache.clear()
+
+        sessions = []
+        override_get_async_db = app.dependency_overrides[get_async_db]
+
+        async def counting_get_async_db():
+            sessions.append(1)
+            async for session in override_get_async_db():
+                yield session
+
+        app.dependency_overrides[get_async_db] = counting_get_async_db
+        executed_statements.clear()
+
+        response = test_client.get(self.url, headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        assert len(sessions) == 1
+        assert len(executed_statements) == 1
+
+        # Served from the verified-token cache: no query at all.
+        executed_statements.clear()
+        test_client.get(self.url, headers=headers)
+        assert executed_statements == []
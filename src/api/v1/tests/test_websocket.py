@@ -1,5 +1,25 @@
+import asyncio
+import contextlib
+import json
+from time import time
+from types import SimpleNamespace
+
+import fakeredis
 import pytest
 from fastapi.websockets import WebSocketDisconnect
+from sqlalchemy import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import app
+from database.db_connection import get_async_session_factory
+from src.api.v1.socket.user_chat import handle_chat_message
+from src.api.v1.tests.conftest import SQLITE_DATABASE_URL
+from src.api.v1.utils.chat_backplane import Backplane, InMemoryBackplane, RedisBackplane
+from src.api.v1.utils.room_history import HistoryStore, RoomHistory
+from src.api.v1.utils.socket_manager import ConnectionManager, OverflowPolicy, connection_manager
+from src.api.v1.utils.timer_wheel import TimerWheel
+from src.api.v1.utils.token_cache import verified_token_cache
+from src.api.v1.utils.token_revocation import token_revocation_store
 
 
 class TestUserChatWebSocket:
@@ -9,9 +29,9 @@ class TestUserChatWebSocket:
         self.user_chat_url = "/ws/user_chat"
 
     @staticmethod
-    def set_active_user(user, db_session):
+    def set_active_user(user, db_session, test_client):
         user.is_active = True
-        db_session.commit()
+        test_client.portal.call(db_session.commit)
 
     def test_connection_close_without_sub_protocol(self, test_client):
         with pytest.raises(WebSocketDisconnect):
@@ -31,7 +51,53 @@ class TestUserChatWebSocket:
     def test_connection_success_with_valid_token(
         self, test_client, db_session, create_user
     ):
-        self.set_active_user(create_user, db_session)
+        self.set_active_user(create_user, db_session, test_client)
+        response = test_client.post(
+            self.login_url, json={"email": "admin@gmail.com", "password": "Admin@123"}
+        )
+        access_token = response.json().get("access_token")
+
+        with test_client.websocket_connect(
+            self.user_chat_url, subprotocols=["access_token", access_token]
+        ) as websocket:
+            websocket.send_text("Hello")
+            message = websocket.receive_json()
+            assert message["type"] == "message"
+            assert message["room"] == "general"
+            assert message["text"] == "Hello"
+
+    def test_revoked_and_refresh_tokens_are_closed(self, test_client, db_session, create_user):
+        self.set_active_user(create_user, db_session, test_client)
+        tokens = test_client.post(
+            self.login_url, json={"email": "admin@gmail.com", "password": "Admin@123"}
+        ).json()
+        # Opening a socket puts the access token in the verified token cache.
+        with test_client.websocket_connect(
+            self.user_chat_url, subprotocols=["access_token", tokens["access_token"]]
+        ) as websocket:
+            websocket.send_text("Hello")
+            websocket.receive_json()
+        claims = verified_token_cache.get(tokens["access_token"]).claims
+        test_client.portal.call(token_revocation_store.revoke, claims["jti"], claims["exp"])
+
+        for token in (tokens["access_token"], tokens["refresh_token"]):
+            with pytest.raises(WebSocketDisconnect) as err:
+                with test_client.websocket_connect(
+                    self.user_chat_url, subprotocols=["access_token", token]
+                ) as websocket:
+                    websocket.receive_text()
+            assert err.value.code == 3000
+
+        verified_token_cache.clear()
+        with pytest.raises(WebSocketDisconnect) as err:
+            with test_client.websocket_connect(
+                self.user_chat_url, subprotocols=["access_token", tokens["access_token"]]
+            ) as websocket:
+                websocket.receive_text()
+        assert err.value.code == 3000
+
+    def test_pong_is_not_a_chat_command(self, test_client, db_session, create_user):
+        self.set_active_user(create_user, db_session, test_client)
         response = test_client.post(
             self.login_url, json={"email": "admin@gmail.com", "password": "Admin@123"}
         )
@@ -41,5 +107,500 @@ class TestUserChatWebSocket:
             self.user_chat_url, subprotocols=["access_token", access_token]
         ) as websocket:
             websocket.send_text("Hello")
-            received_text = websocket.receive_text()
-            assert "Hello" in received_text
+            websocket.receive_json()
+            websocket.send_text('{"action":"pong"}')
+            websocket.send_json({"action": "pong"})
+            websocket.send_text("Bye")
+            # No error reply for either pong; the next frame is the message.
+            assert websocket.receive_json()["text"] == "Bye"
+
+            (server_socket, connection), = connection_manager.active_connections.items()
+            last_active = connection.last_active
+            connection.ping_sent_at = connection.last_seen
+            test_client.portal.call(handle_chat_message, server_socket, SimpleNamespace(id=1, full_name="Admin"), '{"action":"pong"}')
+            assert connection.ping_sent_at is None
+            assert connection.last_active == last_active < connection.last_seen
+
+    def test_open_sockets_do_not_hold_pooled_connections(self, test_client, db_session, create_user):
+        self.set_active_user(create_user, db_session, test_client)
+        response = test_client.post(
+            self.login_url, json={"email": "admin@gmail.com", "password": "Admin@123"}
+        )
+        access_token = response.json().get("access_token")
+
+        # A single pooled connection, yet several sockets authenticate and stay open.
+        engine = create_async_engine(
+            SQLITE_DATABASE_URL, poolclass=AsyncAdaptedQueuePool, pool_size=1, max_overflow=0, pool_timeout=1
+        )
+        session_factory = app.dependency_overrides[get_async_session_factory]
+        app.dependency_overrides[get_async_session_factory] = lambda: async_sessionmaker(bind=engine)
+        verified_token_cache.clear()
+        try:
+            with contextlib.ExitStack() as stack:
+                for i in range(3):
+                    websocket = stack.enter_context(test_client.websocket_connect(
+                        self.user_chat_url, subprotocols=["access_token", access_token]
+                    ))
+                    verified_token_cache.clear()
+                    websocket.send_text(f"Hello {i}")
+                    assert websocket.receive_json()["text"] == f"Hello {i}"
+                    assert engine.pool.checkedout() == 0
+        finally:
+            app.dependency_overrides[get_async_session_factory] = session_factory
+            test_client.portal.call(engine.dispose)
+
+    def test_resume_from_offset(self, test_client, db_session, create_user):
+        self.set_active_user(create_user, db_session, test_client)
+        response = test_client.post(
+            self.login_url, json={"email": "admin@gmail.com", "password": "Admin@123"}
+        )
+        access_token = response.json().get("access_token")
+
+        with test_client.websocket_connect(
+            self.user_chat_url, subprotocols=["access_token", access_token]
+        ) as websocket:
+            websocket.send_text("first")
+            offset = websocket.receive_json()["offset"]
+            websocket.send_text("second")
+            websocket.receive_json()
+
+        with test_client.websocket_connect(
+            f"{self.user_chat_url}?since={offset}", subprotocols=["access_token", access_token]
+        ) as websocket:
+            missed = websocket.receive_json()
+            assert [(message["offset"], message["text"]) for message in missed] == [(offset + 1, "second")]
+
+    def test_room_commands(self, test_client, db_session, create_user):
+        self.set_active_user(create_user, db_session, test_client)
+        response = test_client.post(
+            self.login_url, json={"email": "admin@gmail.com", "password": "Admin@123"}
+        )
+        access_token = response.json().get("access_token")
+
+        with test_client.websocket_connect(
+            self.user_chat_url, subprotocols=["access_token", access_token]
+        ) as websocket:
+            websocket.send_json({"action": "message", "room": "python", "text": "Hi"})
+            assert websocket.receive_json()["detail"] == "Join the room before sending messages to it."
+
+            websocket.send_json({"action": "join", "room": "python"})
+            websocket.send_json({"action": "message", "room": "python", "text": "Hi"})
+            message = websocket.receive_json()
+            assert (message["room"], message["sender"]["name"], message["text"]) == ("python", "Admin", "Hi")
+
+            websocket.send_json({"action": "direct", "text": "Hi"})
+            message = websocket.receive_json()
+            assert message["type"] == "error"
+            assert message["detail"].startswith("Invalid chat command.")
+
+
+class FakeWebSocket:
+
+    def __init__(self, blocked: bool = False, broken: bool = False):
+        self.received = []
+        self.frames = []
+        self.closed_with = None
+        self.broken = broken
+        self.unblocked = asyncio.Event()
+        if not blocked:
+            self.unblocked.set()
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, message):
+        if self.broken:
+            raise RuntimeError("Connection reset.")
+        await self.unblocked.wait()
+        self.frames.append(message)
+        self.received.append(json.loads(message))
+
+    async def send_bytes(self, message):
+        import msgpack
+
+        await self.unblocked.wait()
+        self.frames.append(message)
+        self.received.append(msgpack.unpackb(message))
+
+    async def close(self, code=1000, reason=""):
+        self.closed_with = (code, reason)
+
+
+class TestConnectionManager:
+
+    @staticmethod
+    def run(scenario):
+        return asyncio.run(scenario())
+
+    def test_slow_client_does_not_delay_others(self):
+        async def scenario():
+            manager = ConnectionManager(max_queue=10)
+            fast, slow = FakeWebSocket(), FakeWebSocket(blocked=True)
+            await manager.connect(fast, None)
+            await manager.connect(slow, None)
+
+            for i in range(3):
+                await manager.broadcast_message(f"message {i}")
+            await asyncio.sleep(0.01)
+            assert fast.received == ["message 0", "message 1", "message 2"]
+            assert slow.received == []
+
+            slow.unblocked.set()
+            await asyncio.sleep(0.01)
+            assert slow.received == fast.received
+
+        self.run(scenario)
+
+    def test_drop_oldest_policy(self):
+        async def scenario():
+            manager = ConnectionManager(max_queue=2, overflow_policy=OverflowPolicy.DROP_OLDEST)
+            slow = FakeWebSocket(blocked=True)
+            await manager.connect(slow, None)
+            await asyncio.sleep(0)
+
+            for i in range(5):
+                await manager.broadcast_message(f"message {i}")
+            slow.unblocked.set()
+            await asyncio.sleep(0.01)
+            return slow.received, manager.get_status()
+
+        received, status = self.run(scenario)
+        assert received == ["message 3", "message 4"]
+        assert status["dropped"] == 3
+
+    def test_disconnect_slow_consumer_policy(self):
+        async def scenario():
+            manager = ConnectionManager(max_queue=1, overflow_policy=OverflowPolicy.DISCONNECT)
+            fast, slow = FakeWebSocket(), FakeWebSocket(blocked=True)
+            await manager.connect(fast, None)
+            await manager.connect(slow, None)
+            await asyncio.sleep(0)
+
+            for i in range(3):
+                await manager.broadcast_message(f"message {i}")
+                await asyncio.sleep(0.01)
+            return fast, slow, manager
+
+        fast, slow, manager = self.run(scenario)
+        assert len(fast.received) == 3
+        assert slow.closed_with == (1008, "Slow consumer.")
+        assert list(manager.active_connections) == [fast]
+        assert manager.get_status()["slow_consumer_disconnects"] == 1
+        # The close task was held until it finished, then let go.
+        assert manager._tasks == set()
+
+    def test_dead_socket_is_removed(self):
+        async def scenario():
+            manager = ConnectionManager()
+            alive, dead = FakeWebSocket(), FakeWebSocket(broken=True)
+            await manager.connect(dead, None)
+            await manager.connect(alive, None)
+
+            await manager.broadcast_message("first")
+            await asyncio.sleep(0.01)
+            await manager.broadcast_message("second")
+            await asyncio.sleep(0.01)
+            return alive, manager
+
+        alive, manager = self.run(scenario)
+        assert alive.received == ["first", "second"]
+        assert list(manager.active_connections) == [alive]
+
+    def test_room_and_direct_messages_reach_only_subscribers(self):
+        async def scenario():
+            manager = ConnectionManager()
+            alice, bob, carol = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+            for user_id, websocket in enumerate((alice, bob, carol), start=1):
+                await manager.connect(websocket, None)
+                manager.bind_user(websocket, user_id)
+            manager.join(alice, "python")
+            manager.join(bob, "python")
+            manager.join(carol, "rust")
+
+            await manager.send_to_room("python", "to python")
+            await manager.send_to_user(3, "to carol")
+            await asyncio.sleep(0.01)
+            return alice, bob, carol
+
+        alice, bob, carol = self.run(scenario)
+        assert alice.received == bob.received == ["to python"]
+        assert carol.received == ["to carol"]
+
+    def test_remove_is_idempotent_and_cleans_indexes(self):
+        async def scenario():
+            manager = ConnectionManager()
+            websocket = FakeWebSocket()
+            await manager.connect(websocket, None)
+            manager.bind_user(websocket, 1)
+            manager.join(websocket, "python")
+
+            manager.remove(websocket)
+            manager.remove(websocket)
+            await manager.disconnect(websocket)
+            return manager
+
+        manager = self.run(scenario)
+        assert manager.active_connections == {}
+        assert manager.rooms == {}
+        assert manager.users == {}
+
+
+class TestFraming:
+
+    def test_message_is_serialized_once_per_encoding(self):
+        async def scenario():
+            manager = ConnectionManager()
+            first, second, binary = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+            await manager.connect(first, None)
+            await manager.connect(second, None)
+            await manager.connect(binary, None, encoding="msgpack")
+            await manager.broadcast_message({"type": "message", "text": "Hi"})
+            await asyncio.sleep(0.01)
+            return first, second, binary
+
+        first, second, binary = asyncio.run(scenario())
+        assert first.frames[0] is second.frames[0]
+        assert isinstance(binary.frames[0], bytes)
+        assert first.received == binary.received == [{"type": "message", "text": "Hi"}]
+
+    def test_burst_is_coalesced_into_one_frame(self):
+        async def scenario():
+            manager = ConnectionManager(coalesce_window=0.02)
+            websocket = FakeWebSocket()
+            await manager.connect(websocket, None)
+            for i in range(3):
+                await manager.broadcast_message({"text": f"message {i}"})
+            await asyncio.sleep(0.05)
+            return websocket, manager
+
+        websocket, manager = asyncio.run(scenario())
+        assert websocket.received == [[{"text": "message 0"}, {"text": "message 1"}, {"text": "message 2"}]]
+        assert manager.get_status()["slowest_connections"][0]["frames"] == 1
+
+
+class TestRoomHistory:
+
+    def test_ring_is_bounded(self):
+        history = RoomHistory(capacity=3)
+        for i in range(5):
+            assert history.append({"text": i}, size=10) == i
+
+        assert history.first_offset == 2
+        assert history.bytes == 30
+        assert history.since(-1) == [{"text": 2}, {"text": 3}, {"text": 4}]
+        assert history.since(3) == [{"text": 4}]
+        assert history.since(4) == []
+
+    def test_spill_file_survives_restart_and_serves_old_offsets(self, tmp_path):
+        store = HistoryStore(capacity=2, spill_dir=str(tmp_path))
+        for i in range(5):
+            store.append("python", {"text": i})
+        store.close()
+
+        restarted = HistoryStore(capacity=2, spill_dir=str(tmp_path))
+        assert [message["offset"] for message in restarted.since("python", 2)] == [3, 4]
+        # Older than the ring: read back from the spill file.
+        assert [message["text"] for message in restarted.since("python", 0)] == [1, 2, 3, 4]
+        assert restarted.append("python", {"text": 5})["offset"] == 5
+        restarted.close()
+
+    def test_workers_sharing_a_spill_dir_keep_their_own_files(self, tmp_path):
+        first = HistoryStore(capacity=2, spill_dir=str(tmp_path), node_id="first")
+        second = HistoryStore(capacity=2, spill_dir=str(tmp_path), node_id="second")
+        for i in range(3):
+            envelope = first.append("python", {"text": i})
+            second.append("python", envelope)
+        first.close()
+        second.close()
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["first", "second"]
+
+        restarted = HistoryStore(capacity=2, spill_dir=str(tmp_path))
+        assert [message["text"] for message in restarted.since("python", -1)] == [0, 1, 2]
+        assert restarted.append("python", {"text": 3})["offset"] == 3
+        restarted.close()
+
+    def test_join_replays_missed_messages(self):
+        async def scenario():
+            manager = ConnectionManager(history=HistoryStore(capacity=10))
+            for i in range(3):
+                await manager.send_to_room("python", {"text": f"message {i}"})
+            websocket = FakeWebSocket()
+            await manager.connect(websocket, None)
+            manager.join(websocket, "python", since=0)
+            await asyncio.sleep(0.01)
+            return websocket
+
+        websocket = asyncio.run(scenario())
+        assert websocket.received == [[{"text": "message 1", "offset": 1}, {"text": "message 2", "offset": 2}]]
+
+
+class TestHeartbeat:
+
+    def test_timer_wheel(self):
+        wheel = TimerWheel(tick=1, slots=4)
+        wheel.schedule("a", 1)
+        wheel.schedule("b", 3)
+        wheel.schedule("c", 10)     # More than one turn of the wheel
+        wheel.schedule("d", 2)
+        wheel.cancel("d")
+
+        assert wheel.advance(0.5) == []
+        assert wheel.advance(1) == ["a"]
+        assert wheel.advance(3) == ["b"]
+        assert wheel.advance(9) == []
+        assert wheel.advance(10) == ["c"]
+        assert len(wheel) == 0
+
+    @staticmethod
+    async def run_manager(scenario, **options):
+        manager = ConnectionManager(heartbeat_tick=0.01, **options)
+        await manager.start()
+        try:
+            return await scenario(manager)
+        finally:
+            await manager.stop()
+
+    def test_missed_pong_is_evicted(self):
+        async def scenario(manager):
+            silent, responsive = FakeWebSocket(), FakeWebSocket()
+            await manager.connect(silent, None)
+            await manager.connect(responsive, None)
+            for _ in range(10):
+                await asyncio.sleep(0.02)
+                if any(message["type"] == "ping" for message in responsive.received):
+                    manager.touch(responsive, active=False)
+            return silent, responsive, manager
+
+        silent, responsive, manager = asyncio.run(
+            self.run_manager(scenario, ping_interval=0.03, pong_timeout=0.05)
+        )
+        assert silent.received[0]["type"] == "ping"
+        assert silent.closed_with == (1001, "Heartbeat timeout.")
+        assert list(manager.active_connections) == [responsive]
+        assert manager.get_status()["evictions"] == {"Heartbeat timeout.": 1}
+
+    def test_idle_connection_is_evicted(self):
+        async def scenario(manager):
+            idle = FakeWebSocket()
+            await manager.connect(idle, None)
+            for _ in range(10):
+                await asyncio.sleep(0.02)
+                manager.touch(idle, active=False)
+            return idle
+
+        idle = asyncio.run(self.run_manager(scenario, ping_interval=1, idle_timeout=0.1))
+        assert idle.closed_with == (1000, "Idle timeout.")
+
+    def test_expired_token_closes_socket(self):
+        async def scenario(manager):
+            websocket = FakeWebSocket()
+            await manager.connect(websocket, None)
+            manager.bind_user(websocket, 1, expires_at=time() + 0.05)
+            await asyncio.sleep(0.1)
+            return websocket, manager
+
+        websocket, manager = asyncio.run(self.run_manager(scenario))
+        assert websocket.closed_with == (3000, "Token expired.")
+        assert manager.users == {}
+
+
+class TestBackplane:
+
+    @staticmethod
+    async def broadcast_between_nodes(first_backplane, second_backplane):
+        first, second = ConnectionManager(backplane=first_backplane), ConnectionManager(backplane=second_backplane)
+        await first.start()
+        await second.start()
+        local, remote = FakeWebSocket(), FakeWebSocket()
+        await first.connect(local, None)
+        await second.connect(remote, None)
+
+        for i in range(3):
+            await first.broadcast_message(f"message {i}")
+        for _ in range(50):
+            await asyncio.sleep(0.01)
+            if len(remote.received) == 3:
+                break
+
+        await first.stop()
+        await second.stop()
+        return local.received, remote.received, first_backplane.get_status(), second_backplane.get_status()
+
+    def test_in_memory_backplane_reaches_other_nodes_once(self):
+        hub = []
+        local, remote, sender, receiver = asyncio.run(
+            self.broadcast_between_nodes(InMemoryBackplane(hub), InMemoryBackplane(hub))
+        )
+        expected = ["message 0", "message 1", "message 2"]
+        assert local == expected
+        assert remote == expected
+        assert sender["batches"] == 1
+        assert sender["skipped_own"] == 3
+        assert receiver["received"] == 3
+
+    def test_backplane_without_send_cannot_be_created(self):
+        class Incomplete(Backplane):
+            pass
+
+        with pytest.raises(TypeError, match="_send"):
+            Incomplete()
+
+    def test_single_node_does_not_publish(self):
+        async def scenario():
+            manager = ConnectionManager()
+            await manager.start()
+            await manager.broadcast_message("hello")
+            status = manager.get_status()["backplane"]
+            await manager.stop()
+            return status
+
+        assert asyncio.run(scenario())["published"] == 0
+
+    @staticmethod
+    async def room_messages_between_nodes(first_backplane, second_backplane):
+        first = ConnectionManager(backplane=first_backplane, history=HistoryStore(capacity=10))
+        second = ConnectionManager(backplane=second_backplane, history=HistoryStore(capacity=10))
+        await first.start()
+        await second.start()
+        for i in range(4):
+            await (first if i % 2 else second).send_to_room("python", {"text": f"message {i}"})
+        for _ in range(50):
+            await asyncio.sleep(0.01)
+            if first.history.next_offset("python") == second.history.next_offset("python") == 4:
+                break
+        await first.stop()
+        await second.stop()
+        return first.history.since("python", -1), second.history.since("python", 0)
+
+    def test_room_offsets_are_the_same_on_every_node(self):
+        hub = []
+        first, second = asyncio.run(self.room_messages_between_nodes(InMemoryBackplane(hub), InMemoryBackplane(hub)))
+        assert [(message["offset"], message["text"]) for message in first] == [
+            (0, "message 0"), (1, "message 1"), (2, "message 2"), (3, "message 3")
+        ]
+        # Resuming on the other node after offset 0 picks up exactly where the client left off.
+        assert second == first[1:]
+
+    def test_redis_backplane_batches_and_skips_own_messages(self):
+        server = fakeredis.FakeServer()
+
+        def backplane():
+            return RedisBackplane(client=fakeredis.FakeAsyncRedis(server=server, decode_responses=True))
+
+        local, remote, sender, receiver = asyncio.run(self.broadcast_between_nodes(backplane(), backplane()))
+        expected = ["message 0", "message 1", "message 2"]
+        assert local == expected
+        assert remote == expected
+        assert sender["batches"] == 1
+        assert sender["skipped_own"] == 3
+        assert receiver["received"] == 3
+
+    def test_redis_backplane_shares_room_offsets(self):
+        server = fakeredis.FakeServer()
+
+        def backplane():
+            return RedisBackplane(client=fakeredis.FakeAsyncRedis(server=server, decode_responses=True))
+
+        first, second = asyncio.run(self.room_messages_between_nodes(backplane(), backplane()))
+        assert [message["offset"] for message in first] == [0, 1, 2, 3]
+        assert second == first[1:]
@@ -7,18 +7,49 @@ from passlib.context import CryptContext
 
 from config.config import settings
 from logger.logger import logger
+from monitoring.timing import phase
+from src.api.v1.utils.hash_pool import password_hash_pool
+from src.api.v1.utils.jwt_keys import jwt_key_set
+
+
+def build_password_context(
+    schemes: list[str] = None,
+    bcrypt_rounds: int = None,
+    argon2_time_cost: int = None,
+    argon2_memory_cost: int = None,
+    argon2_parallelism: int = None,
+) -> CryptContext:
+    """
+    Hashes with the first scheme; hashes from any other scheme, or made with
+    different cost parameters, are reported as needing an update.
+    """
+    return CryptContext(
+        schemes=schemes or settings.PASSWORD_HASH_SCHEMES,
+        deprecated="auto",
+        bcrypt__rounds=bcrypt_rounds or settings.BCRYPT_ROUNDS,
+        argon2__type="ID",
+        argon2__time_cost=argon2_time_cost or settings.ARGON2_TIME_COST,
+        argon2__memory_cost=argon2_memory_cost or settings.ARGON2_MEMORY_COST,
+        argon2__parallelism=argon2_parallelism or settings.ARGON2_PARALLELISM,
+    )
+
 
-pwd_context = CryptContext(schemes=["bcrypt"])
+pwd_context = build_password_context()
 
 url_safe_timed_serializer = URLSafeTimedSerializer(secret_key=settings.SECRET_KEY)
 
 
-def get_hashed_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def get_hashed_password(password: str) -> str:
+    return await password_hash_pool.run(pwd_context.hash, password)
+
 
+async def verify_password(plain_password: str, hashed_password: str):
+    return await password_hash_pool.run(pwd_context.verify, plain_password, hashed_password)
 
-def verify_password(plain_password: str, hashed_password: str):
-    return pwd_context.verify(plain_password, hashed_password)
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """Returns `(verified, new_hash)`; `new_hash` is set when the stored hash is outdated."""
+    return await password_hash_pool.run(pwd_context.verify_and_update, plain_password, hashed_password)
 
 
 def create_access_token(email: str, expiry: timedelta = None, refresh: bool = False):
@@ -33,16 +64,29 @@ def create_access_token(email: str, expiry: timedelta = None, refresh: bool = Fa
         "jti": str(uuid.uuid4()),
         "refresh": refresh,
     }
-    encoded_jwt = jwt.encode(
-        to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
-    )
+    with phase("token"):
+        kid, key = jwt_key_set.signing_key()
+        encoded_jwt = jwt.encode(
+            to_encode, key, algorithm=settings.ALGORITHM, headers={"kid": kid} if kid else None
+        )
     return encoded_jwt
 
 
+def create_refresh_token(email: str):
+    return create_access_token(
+        email=email,
+        refresh=True,
+        expiry=timedelta(days=settings.REFRESH_TOKEN_EXPIRE_LIMIT),
+    )
+
+
 def decode_token(token: str):
     try:
+        key = jwt_key_set.verification_key(jwt.get_unverified_header(token).get("kid"))
+        if key is None:
+            raise jwt.InvalidKeyError("Unknown signing key id.")
         return jwt.decode(
-            jwt=token, key=settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+            jwt=token, key=key, algorithms=[settings.ALGORITHM]
         )
     except jwt.PyJWTError as e:
         logger.error(f"Exception while decode token for '{token}': {str(e)}")
@@ -57,7 +101,7 @@ def decode_url_safe_token(token: str):
     try:
         return url_safe_timed_serializer.loads(token, max_age=3600)
     except Exception as e:
-        logger.exception(
+        logger.error(
             f"Exception while decode url safe token for '{token}': {str(e)}"
         )
         return None
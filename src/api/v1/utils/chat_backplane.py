@@ -0,0 +1,201 @@
+import asyncio
+import json
+import uuid
+from abc import ABC, abstractmethod
+
+from config.config import settings
+from logger.logger import logger
+
+
+class Backplane(ABC):
+    """
+    Carries chat broadcasts between workers.
+
+    `ConnectionManager` fans a message out to its own sockets first and then
+    hands it to `publish`, which only appends to a buffer. A flusher task
+    sends the buffer as one batch after `batch_interval` seconds (or as soon
+    as `batch_size` messages are waiting), so a burst of messages costs one
+    round trip instead of one per message. Every batch carries the node id of
+    the sender, and a node drops batches it published itself, so local
+    clients never receive a message twice.
+
+    Room history offsets come from `next_offset`, so that every node records
+    a message under the same offset. A single node counts on its own.
+    """
+
+    def __init__(self, batch_size: int = 100, batch_interval: float = 0.005):
+        self.node_id = uuid.uuid4().hex
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.published = 0
+        self.batches = 0
+        self.received = 0
+        self.skipped_own = 0
+        self._pending: list = []
+        self._ready: asyncio.Event | None = None
+        self._on_message = None
+        self._flusher: asyncio.Task | None = None
+
+    async def next_offset(self, room: str, floor: int) -> int:
+        """The offset for the next message in `room`; `floor` is this node's own next offset."""
+        return floor
+
+    def publish(self, message):
+        if self._flusher is None:
+            # Not started: a single process, nothing to share with.
+            return
+        self._pending.append(message)
+        self.published += 1
+        self._ready.set()
+
+    async def _flush_forever(self):
+        while True:
+            await self._ready.wait()
+            if len(self._pending) < self.batch_size:
+                await asyncio.sleep(self.batch_interval)
+            self._ready.clear()
+            await self.flush()
+
+    async def flush(self):
+        while self._pending:
+            batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            try:
+                await self._send(batch)
+                self.batches += 1
+            except Exception as e:
+                logger.error(f"Chat backplane publish failed, dropped {len(batch)} message(s): {str(e)}")
+
+    def _deliver(self, origin: str, messages: list):
+        if origin == self.node_id:
+            self.skipped_own += len(messages)
+            return
+        self.received += len(messages)
+        for message in messages:
+            self._on_message(message)
+
+    @abstractmethod
+    async def _send(self, batch: list):
+        """Delivers one batch to every node, this one included."""
+
+    async def start(self, on_message):
+        self._on_message = on_message
+        self._ready = asyncio.Event()
+        self._flusher = asyncio.create_task(self._flush_forever())
+
+    async def stop(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+            await self.flush()
+
+    def get_status(self) -> dict:
+        return {
+            "backend": type(self).__name__,
+            "node_id": self.node_id,
+            "pending": len(self._pending),
+            "published": self.published,
+            "batches": self.batches,
+            "received": self.received,
+            "skipped_own": self.skipped_own,
+        }
+
+
+class InMemoryBackplane(Backplane):
+    """
+    Delivers batches to every backplane attached to the same `hub`. Each
+    process gets its own hub by default, which is the single-worker setup;
+    sharing one hub lets tests run several "nodes" in one event loop.
+    """
+
+    def __init__(self, hub: list = None, **kwargs):
+        super().__init__(**kwargs)
+        self.hub = hub if hub is not None else []
+        self._next_offsets: dict[str, int] = {}
+
+    async def next_offset(self, room: str, floor: int) -> int:
+        offset = max([floor] + [node._next_offsets.get(room, 0) for node in self.hub])
+        self._next_offsets[room] = offset + 1
+        return offset
+
+    def publish(self, message):
+        if len(self.hub) > 1:
+            super().publish(message)
+
+    async def _send(self, batch: list):
+        for backplane in self.hub:
+            backplane._deliver(self.node_id, batch)
+
+    async def start(self, on_message):
+        await super().start(on_message)
+        self.hub.append(self)
+
+    async def stop(self):
+        await super().stop()
+        if self in self.hub:
+            self.hub.remove(self)
+
+
+class RedisBackplane(Backplane):
+    """
+    Batches travel as one JSON `PUBLISH` on `channel` of a Redis-compatible
+    server. Room offsets are `INCR`s of `<channel>:offset:<room>`; if the
+    server has no counter for a room yet, it starts after this node's own
+    history.
+    """
+
+    def __init__(self, url: str = None, client=None, channel: str = "chat", **kwargs):
+        super().__init__(**kwargs)
+        if client is None:
+            from redis.asyncio import Redis
+            client = Redis.from_url(url, decode_responses=True)
+        self.client = client
+        self.channel = channel
+        self._pubsub = None
+        self._reader: asyncio.Task | None = None
+        self._seeded_rooms: set[str] = set()
+
+    async def next_offset(self, room: str, floor: int) -> int:
+        key = f"{self.channel}:offset:{room}"
+        if room not in self._seeded_rooms:
+            self._seeded_rooms.add(room)
+            await self.client.set(key, floor - 1, nx=True)
+        return await self.client.incr(key)
+
+    async def _send(self, batch: list):
+        await self.client.publish(self.channel, json.dumps({"origin": self.node_id, "messages": batch}))
+
+    async def _read_forever(self):
+        while True:
+            try:
+                async for event in self._pubsub.listen():
+                    if event["type"] == "message":
+                        payload = json.loads(event["data"])
+                        self._deliver(payload["origin"], payload["messages"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Chat backplane subscription failed: {str(e)}")
+                await asyncio.sleep(1)
+
+    async def start(self, on_message):
+        self._pubsub = self.client.pubsub()
+        await self._pubsub.subscribe(self.channel)
+        await super().start(on_message)
+        self._reader = asyncio.create_task(self._read_forever())
+
+    async def stop(self):
+        await super().stop()
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        await self.client.aclose()
+
+
+def create_backplane():
+    options = {"batch_size": settings.WS_BACKPLANE_BATCH_SIZE, "batch_interval": settings.WS_BACKPLANE_BATCH_INTERVAL}
+    if settings.WS_BACKPLANE == "redis":
+        return RedisBackplane(url=settings.WS_BACKPLANE_REDIS_URL, channel=settings.WS_BACKPLANE_CHANNEL, **options)
+    return InMemoryBackplane(**options)
@@ -0,0 +1,34 @@
+import json
+from time import time
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "json"
+MSGPACK = "msgpack"
+
+
+def available_encodings() -> set[str]:
+    return {JSON, MSGPACK} if msgpack is not None else {JSON}
+
+
+def make_envelope(type: str, **fields) -> dict:
+    """Every frame sent to chat clients is one of these, or a list of them when coalesced."""
+    return {"type": type, "ts": round(time(), 3), **fields}
+
+
+def encode(envelope, encoding: str) -> str | bytes:
+    """JSON goes out as a text frame, msgpack as a binary frame."""
+    if encoding == MSGPACK:
+        return msgpack.packb(envelope)
+    return json.dumps(envelope, separators=(",", ":"))
+
+
+def encode_batch(frames: list, encoding: str) -> str | bytes:
+    """Joins already encoded envelopes into one array frame without re-serializing them."""
+    if encoding == MSGPACK:
+        header = msgpack.Packer().pack_array_header(len(frames))
+        return header + b"".join(frames)
+    return "[" + ",".join(frames) + "]"
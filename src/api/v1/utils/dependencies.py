@@ -1,25 +1,27 @@
-from fastapi import Depends, HTTPException, status
-from sqlalchemy.orm import Session
+import hmac
 
-from database.db_connection import get_db
-from src.api.v1.models.user_models.user import User
-from src.api.v1.utils.jwt_bearer import JWTAccessTokenValidate
-from src.api.v1.utils.user_service import UserService
+from fastapi import Depends, Header, HTTPException, Request, status
 
+from config.config import settings
+from monitoring.profiler import profiler
+from src.api.v1.utils.jwt_bearer import access_token_validator
+from src.api.v1.utils.token_cache import Principal, UserPrincipal
 
-def get_current_user(
-    token_data: dict = Depends(JWTAccessTokenValidate()), db: Session = Depends(get_db)
-):
-    user_email = token_data.get("email")
-    user = UserService().get_user_by_email(user_email, db)
-    return user
+
+def get_principal(request: Request, token_data: dict = Depends(access_token_validator)) -> Principal:
+    # Set by the JWT dependency, which resolves the user at most once per request.
+    return request.state.principal
+
+
+def get_current_user(principal: Principal = Depends(get_principal)) -> UserPrincipal:
+    return principal.user
 
 
 class ActiveUserCheck:
     def __init__(self):
         pass
 
-    def __call__(self, current_user: User = Depends(get_current_user)):
+    def __call__(self, current_user: UserPrincipal = Depends(get_current_user)):
         if not current_user.is_active:
             raise HTTPException(
                 detail="Account is not activated.",
@@ -27,3 +29,16 @@ class ActiveUserCheck:
             )
 
         return True
+
+
+def require_profiler_token(x_profile_token: str | None = Header(default=None)):
+    # The profiler does not exist as far as anyone without the token can tell.
+    if not profiler.authorized(x_profile_token):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+
+
+def require_operator_token(x_operator_token: str | None = Header(default=None)):
+    # Status endpoints expose internals, so they stay hidden from anyone without the token.
+    token = settings.SYSTEM_STATUS_TOKEN
+    if not token or x_operator_token is None or not hmac.compare_digest(x_operator_token.encode(), token.encode()):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
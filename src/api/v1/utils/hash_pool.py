@@ -0,0 +1,94 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from fastapi import HTTPException, status
+
+from config.config import settings
+from monitoring.stats import TimingStats
+from monitoring.timing import phase
+from src.api.v1.constants.messages import SERVICE_BUSY
+
+
+class PasswordHashPool:
+    """
+    Runs password hashing/verification on a dedicated thread pool so bcrypt
+    never blocks the event loop. Once `max_workers + max_queue` jobs are in
+    flight, new jobs are rejected with 503 instead of queueing without bound.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, retry_after: int = 1):
+        self.max_workers = max_workers
+        self.max_pending = max_workers + max_queue
+        self.retry_after = retry_after
+        self.pending = 0
+        self.rejected = 0
+        self.queue_wait = TimingStats()
+        self.hash_time = TimingStats()
+        self._executor: ThreadPoolExecutor | None = None
+
+    async def run(self, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                detail=SERVICE_BUSY,
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(self.retry_after)},
+            )
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="password-hash")
+
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        submitted = perf_counter()
+        job = self._executor.submit(self._timed_call, func, args)
+        # Released when the job itself is done, not when the caller stops waiting:
+        # a cancelled request leaves its hash running in the executor.
+        job.add_done_callback(lambda _: self._call_in_loop(loop, self._release))
+        with phase("hash"):
+            started, finished, result = await asyncio.wrap_future(job)
+
+        # Stats are only touched from the event loop thread.
+        self.queue_wait.observe(started - submitted)
+        self.hash_time.observe(finished - started)
+        return result
+
+    def _release(self):
+        self.pending -= 1
+
+    @staticmethod
+    def _call_in_loop(loop: asyncio.AbstractEventLoop, callback):
+        try:
+            loop.call_soon_threadsafe(callback)
+        except RuntimeError:
+            # The loop is closed; nothing is left to admit jobs.
+            pass
+
+    @staticmethod
+    def _timed_call(func, args):
+        started = perf_counter()
+        result = func(*args)
+        return started, perf_counter(), result
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def get_status(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "rejected": self.rejected,
+            "queue_wait": self.queue_wait.as_dict(),
+            "hash_time": self.hash_time.as_dict(),
+        }
+
+
+password_hash_pool = PasswordHashPool(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_QUEUE_LIMIT,
+    retry_after=settings.PASSWORD_HASH_RETRY_AFTER,
+)
@@ -4,10 +4,14 @@ from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jwt import InvalidTokenError
 from pydantic import ValidationError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database.db_connection import get_db
+from database.db_connection import get_async_db
+from monitoring.timing import phase
+from src.api.v1.constants.messages import TOKEN_REVOKED
 from src.api.v1.utils.auth import decode_token
+from src.api.v1.utils.token_cache import UserPrincipal, verified_token_cache
+from src.api.v1.utils.token_revocation import token_revocation_store
 from src.api.v1.utils.user_service import UserService
 
 
@@ -21,7 +25,11 @@ class JWTBearer(HTTPBearer):
     def __init__(self, auto_error: bool = True):
         super().__init__(auto_error=auto_error)
 
-    async def __call__(self, request: Request, db: Session = Depends(get_db)):
+    async def __call__(self, request: Request, db: AsyncSession = Depends(get_async_db)):
+        with phase("auth"):
+            return await self.authenticate(request, db)
+
+    async def authenticate(self, request: Request, db: AsyncSession):
         credentials: HTTPAuthorizationCredentials = await super().__call__(request)
         if credentials:
             if credentials.scheme != "Bearer":
@@ -31,17 +39,38 @@ class JWTBearer(HTTPBearer):
                 )
 
             token = credentials.credentials
-            token_data = decode_token(token)
-            if token_data is None:
-                raise self.credentials_exception
+            principal = verified_token_cache.get(token)
+            if principal is None:
+                token_data = decode_token(token)
+                if token_data is None:
+                    raise self.credentials_exception
+
+                self.validate_token_type(token_data)
+                self.validate_not_revoked(token_data)
+                user = await self.validate_token_data(token_data, db)
+                principal = verified_token_cache.set(token, token_data, UserPrincipal.from_user(user))
+            else:
+                self.validate_token_type(principal.claims)
+                self.validate_not_revoked(principal.claims)
 
-            self.validate_token_data(token_data, db)
-            return token_data
+            request.state.principal = principal
+            return principal.claims
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Invalid authorization code."
         )
 
-    def validate_token_data(self, token_data: dict, db: Session = Depends(get_db)):
+    def validate_token_type(self, token_data: dict):
+        pass
+
+    def validate_not_revoked(self, token_data: dict):
+        if token_revocation_store.is_revoked(token_data.get("jti", "")):
+            raise HTTPException(
+                detail=TOKEN_REVOKED,
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+
+    async def validate_token_data(self, token_data: dict, db: AsyncSession = Depends(get_async_db)):
         try:
             email = token_data.get("email")
             expiration = datetime.fromtimestamp(token_data.get("exp"))
@@ -55,26 +84,32 @@ class JWTBearer(HTTPBearer):
         except (InvalidTokenError, ValidationError):
             raise self.credentials_exception
 
-        if not UserService().get_user_by_email(email, db):
+        user = await UserService().get_user_by_email(email, db)
+        if not user:
             raise self.credentials_exception
+        return user
 
 
 class JWTAccessTokenValidate(JWTBearer):
-    def validate_token_data(self, token_data, db: Session = Depends(get_db)):
+    def validate_token_type(self, token_data: dict):
         if token_data and token_data.get("refresh"):
             raise HTTPException(
                 detail="Access token required in header",
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        return super().validate_token_data(token_data, db)
 
 
 class JWTRefreshTokenValidate(JWTBearer):
-    def validate_token_data(self, token_data, db: Session = Depends(get_db)):
+    def validate_token_type(self, token_data: dict):
         if token_data and not token_data.get("refresh"):
             raise HTTPException(
                 detail="Refresh token required in header",
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 headers={"WWW-Authenticate": "Bearer"},
             )
+
+
+# Shared instances, so FastAPI resolves each of them at most once per request.
+access_token_validator = JWTAccessTokenValidate()
+refresh_token_validator = JWTRefreshTokenValidate()
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from time import monotonic
+
+from cryptography.hazmat.primitives import serialization
+from jwt.algorithms import OKPAlgorithm, RSAAlgorithm
+
+from config.config import settings
+from logger.logger import logger
+
+SYMMETRIC_ALGORITHMS = {"HS256", "HS384", "HS512"}
+
+
+@dataclass(frozen=True)
+class JWTKey:
+    kid: str
+    private_key: object | None      # None for verify-only (retired) keys
+    public_key: object
+
+
+class JWTKeySet:
+    """
+    Parsed signing/verification keys, cached in process.
+
+    For HS* algorithms the shared secret is used and no `kid` is emitted. For
+    RS*/EdDSA every `<kid>.pem` private key in `keys_dir` is loaded once into
+    a key object, so PyJWT never re-parses PEM per token. `<kid>.pub.pem`
+    files are verify-only, which lets a retired key keep validating tokens
+    until they expire. The active signing key is `active_kid`, or the last
+    private key by name. The directory is re-checked at most every
+    `reload_interval` seconds, so rotated keys are picked up without a
+    restart. An unknown `kid` forces a re-check, but at most once every
+    `unknown_kid_interval` seconds; in between such tokens are rejected, so
+    forged `kid`s cannot make every request hit the disk.
+    """
+
+    def __init__(self, algorithm: str, keys_dir: str, active_kid: str = None,
+                 secret: str = None, reload_interval: int = 60, unknown_kid_interval: float = 5):
+        self.algorithm = algorithm
+        self.keys_dir = keys_dir
+        self.active_kid = active_kid
+        self.secret = secret
+        self.reload_interval = reload_interval
+        self.unknown_kid_interval = unknown_kid_interval
+        self._keys: dict[str, JWTKey] = {}
+        self._signing_key: JWTKey | None = None
+        self._jwks: dict = {"keys": []}
+        self._jwks_etag = ""
+        self._loaded_mtime: float | None = None
+        self._next_check = 0.0
+        self._next_forced_check = 0.0
+
+    @property
+    def is_symmetric(self) -> bool:
+        return self.algorithm in SYMMETRIC_ALGORITHMS
+
+    def signing_key(self) -> tuple[str | None, object]:
+        if self.is_symmetric:
+            return None, self.secret
+
+        self._maybe_reload()
+        if self._signing_key is None:
+            raise RuntimeError(f"No private key found in '{self.keys_dir}' to sign {self.algorithm} tokens.")
+        return self._signing_key.kid, self._signing_key.private_key
+
+    def verification_key(self, kid: str | None):
+        if self.is_symmetric:
+            return self.secret
+
+        self._maybe_reload()
+        if kid not in self._keys and (now := monotonic()) >= self._next_forced_check:
+            self._next_forced_check = now + self.unknown_kid_interval
+            self._maybe_reload(force=True)
+        key = self._keys.get(kid)
+        return key.public_key if key else None
+
+    def jwks(self) -> tuple[dict, str]:
+        if not self.is_symmetric:
+            self._maybe_reload()
+        return self._jwks, self._jwks_etag
+
+    def _maybe_reload(self, force: bool = False):
+        now = monotonic()
+        if not force and now < self._next_check:
+            return
+
+        self._next_check = now + self.reload_interval
+        try:
+            mtime = os.stat(self.keys_dir).st_mtime
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._loaded_mtime:
+            self.load()
+            self._loaded_mtime = mtime
+
+    def load(self):
+        keys: dict[str, JWTKey] = {}
+        if os.path.isdir(self.keys_dir):
+            for file_name in sorted(os.listdir(self.keys_dir)):
+                path = os.path.join(self.keys_dir, file_name)
+                with open(path, "rb") as key_file:
+                    data = key_file.read()
+                if file_name.endswith(".pub.pem"):
+                    public_key = serialization.load_pem_public_key(data)
+                    keys[file_name[:-len(".pub.pem")]] = JWTKey(file_name[:-len(".pub.pem")], None, public_key)
+                elif file_name.endswith(".pem"):
+                    private_key = serialization.load_pem_private_key(data, password=None)
+                    keys[file_name[:-len(".pem")]] = JWTKey(file_name[:-len(".pem")], private_key, private_key.public_key())
+
+        signing_keys = [key for key in keys.values() if key.private_key is not None]
+        if self.active_kid:
+            signing_key = keys.get(self.active_kid)
+        else:
+            signing_key = signing_keys[-1] if signing_keys else None
+
+        self._keys = keys
+        self._signing_key = signing_key
+        self._jwks = {"keys": [self._to_jwk(key) for key in keys.values()]}
+        self._jwks_etag = hashlib.sha256(json.dumps(self._jwks, sort_keys=True).encode()).hexdigest()[:32]
+        logger.info(f"Loaded {len(keys)} JWT key(s), signing with kid '{signing_key.kid if signing_key else None}'.")
+
+    def _to_jwk(self, key: JWTKey) -> dict:
+        algorithm = OKPAlgorithm if self.algorithm == "EdDSA" else RSAAlgorithm
+        jwk = algorithm.to_jwk(key.public_key, as_dict=True)
+        jwk.update({"kid": key.kid, "alg": self.algorithm, "use": "sig"})
+        return jwk
+
+
+jwt_key_set = JWTKeySet(
+    algorithm=settings.ALGORITHM,
+    keys_dir=settings.JWT_KEYS_DIR,
+    active_kid=settings.JWT_ACTIVE_KID,
+    secret=settings.SECRET_KEY,
+    reload_interval=settings.JWT_KEYS_RELOAD_INTERVAL,
+    unknown_kid_interval=settings.JWT_KEYS_UNKNOWN_KID_INTERVAL,
+)
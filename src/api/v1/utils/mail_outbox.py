@@ -0,0 +1,269 @@
+import asyncio
+from datetime import datetime, timedelta
+from email.header import Header
+from email.message import Message
+from email.mime.text import MIMEText
+from email.utils import formataddr
+from time import perf_counter
+from typing import Awaitable, Callable
+
+import aiosmtplib
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config.config import settings
+from logger.logger import logger
+from monitoring.metrics import metrics
+from src.api.v1.models.mail_models.outbox import OutboxMail
+from src.api.v1.utils.mail_templates import mail_templates
+
+
+def enqueue_mail(db: AsyncSession, recipient: str, subject: str, template_name: str, template_body: dict):
+    """Stores the mail for the outbox worker; it is sent once this session commits."""
+    mail = OutboxMail(
+        recipient=recipient, subject=subject, template_name=template_name, template_body=template_body
+    )
+    db.add(mail)
+    return mail
+
+
+def build_message(recipient: str, subject: str | Header, html: str, sender: str = None) -> Message:
+    # MIMEText with the compat32 policy builds a message many times faster than EmailMessage.
+    message = MIMEText(html, "html", "utf-8")
+    message["From"] = sender or formataddr((settings.MAIL_FROM_NAME, settings.MAIL_FROM))
+    message["To"] = recipient
+    message["Subject"] = subject
+    return message
+
+
+def render_messages(template_name: str, subject: str, recipients: list[tuple[str, dict]]) -> list[Message]:
+    """One message per `(recipient, context)`, all rendered from the same compiled template."""
+    htmls = mail_templates.render_many(template_name, [context for _, context in recipients])
+    sender = formataddr((settings.MAIL_FROM_NAME, settings.MAIL_FROM))
+    if not subject.isascii():
+        subject = Header(subject, "utf-8")
+    return [build_message(recipient, subject, html, sender) for (recipient, _), html in zip(recipients, htmls)]
+
+
+def render_batch(mails: list[OutboxMail]) -> dict[int, Message | Exception]:
+    """Renders a batch per template and subject; a group that fails is retried mail by mail."""
+    groups: dict[tuple[str, str], list[OutboxMail]] = {}
+    for mail in mails:
+        groups.setdefault((mail.template_name, mail.subject), []).append(mail)
+
+    rendered = {}
+    for (template_name, subject), group in groups.items():
+        try:
+            messages = render_messages(
+                template_name, subject, [(mail.recipient, mail.template_body) for mail in group]
+            )
+            rendered.update(zip((mail.id for mail in group), messages))
+        except Exception:
+            for mail in group:
+                try:
+                    rendered[mail.id] = render_messages(
+                        template_name, subject, [(mail.recipient, mail.template_body)]
+                    )[0]
+                except Exception as e:
+                    rendered[mail.id] = e
+    return rendered
+
+
+async def connect_smtp() -> aiosmtplib.SMTP:
+    smtp = aiosmtplib.SMTP(
+        hostname=settings.MAIL_SERVER,
+        port=settings.MAIL_PORT,
+        use_tls=settings.MAIL_SSL_TLS,
+        start_tls=settings.MAIL_STARTTLS,
+        timeout=settings.MAIL_SMTP_TIMEOUT,
+    )
+    await smtp.connect()
+    if settings.MAIL_USE_CREDENTIALS:
+        await smtp.login(settings.MAIL_USERNAME, settings.MAIL_PASSWORD)
+    return smtp
+
+
+def _rejection_code(error: Exception) -> int | None:
+    """The SMTP reply code if the server turned the mail down, None if the session itself failed."""
+    if isinstance(error, aiosmtplib.SMTPResponseException):
+        return error.code
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused) and error.recipients:
+        return min(refused.code for refused in error.recipients)
+    return None
+
+
+class SMTPConnectionPool:
+    """
+    Up to `size` connected and authenticated SMTP sessions, reused across
+    mails and batches, so STARTTLS and AUTH are paid once per connection
+    instead of once per mail. A connection that failed mid-send is closed
+    instead of returned.
+    """
+
+    def __init__(self, size: int, connect: Callable[[], Awaitable] = connect_smtp):
+        self.size = size
+        self.connect = connect
+        self.opened = 0
+        self._idle: list = []
+        self._slots = asyncio.Semaphore(size)
+
+    async def acquire(self):
+        await self._slots.acquire()
+        while self._idle:
+            connection = self._idle.pop()
+            if connection.is_connected:
+                return connection
+        try:
+            connection = await self.connect()
+        except BaseException:
+            self._slots.release()
+            raise
+        self.opened += 1
+        return connection
+
+    def release(self, connection, reusable: bool = True):
+        if reusable and connection.is_connected:
+            self._idle.append(connection)
+        else:
+            connection.close()
+        self._slots.release()
+
+    async def close(self):
+        while self._idle:
+            connection = self._idle.pop()
+            try:
+                await connection.quit()
+            except aiosmtplib.SMTPException:
+                connection.close()
+
+
+class MailOutboxWorker:
+    """
+    Drains `mail_outbox` in batches of `batch_size` due mails, sending them
+    concurrently over the connection pool. A failed mail is retried after
+    `retry_base * 2 ** (attempts - 1)` seconds, capped at `retry_max`, and
+    marked failed after `max_attempts` or on a permanent (5xx) rejection.
+
+    A batch is claimed in a short transaction of its own: the rows are
+    locked with `FOR UPDATE SKIP LOCKED`, their attempt is counted and
+    `next_attempt_at` is pushed `claim_timeout` seconds out, then the
+    transaction commits before any SMTP traffic. Several workers can drain
+    the same table without sending a mail twice, and the mails of a worker
+    that dies mid-batch are picked up again once the claim runs out.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        pool: SMTPConnectionPool,
+        batch_size: int = settings.MAIL_OUTBOX_BATCH_SIZE,
+        poll_interval: float = settings.MAIL_OUTBOX_POLL_INTERVAL,
+        max_attempts: int = settings.MAIL_OUTBOX_MAX_ATTEMPTS,
+        retry_base: float = settings.MAIL_OUTBOX_RETRY_BASE,
+        retry_max: float = settings.MAIL_OUTBOX_RETRY_MAX,
+        claim_timeout: float = settings.MAIL_OUTBOX_CLAIM_TIMEOUT,
+    ):
+        self.session_factory = session_factory
+        self.pool = pool
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.claim_timeout = claim_timeout
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    async def run(self, stop: asyncio.Event):
+        while not stop.is_set():
+            try:
+                processed = await self.run_once()
+            except Exception as e:
+                logger.error(f"Mail outbox batch failed: {str(e)}")
+                processed = 0
+            if processed < self.batch_size:
+                try:
+                    await asyncio.wait_for(stop.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        await self.pool.close()
+
+    async def run_once(self) -> int:
+        """Sends one batch; returns how many mails it picked up."""
+        mails = await self._claim()
+        if not mails:
+            return 0
+
+        messages = render_batch(mails)
+        await asyncio.gather(*(self._deliver(mail, messages[mail.id]) for mail in mails))
+        async with self.session_factory() as db:
+            db.add_all(mails)
+            await db.commit()
+        return len(mails)
+
+    async def _claim(self) -> list[OutboxMail]:
+        """Due mails, claimed and committed; they come back detached, to be sent without a transaction open."""
+        async with self.session_factory() as db:
+            result = await db.scalars(
+                select(OutboxMail)
+                .where(OutboxMail.status == OutboxMail.PENDING, OutboxMail.next_attempt_at <= datetime.now())
+                .order_by(OutboxMail.next_attempt_at, OutboxMail.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            mails = result.all()
+            claimed_until = datetime.now() + timedelta(seconds=self.claim_timeout)
+            for mail in mails:
+                mail.attempts += 1
+                mail.next_attempt_at = claimed_until
+            await db.flush()
+            db.expunge_all()
+            await db.commit()
+        return mails
+
+    async def _deliver(self, mail: OutboxMail, message: Message | Exception):
+        start = perf_counter()
+        try:
+            if isinstance(message, Exception):
+                raise message
+            connection = await self.pool.acquire()
+        except Exception as e:
+            self._record_failure(mail, e, perf_counter() - start)
+            return
+
+        reusable = True
+        try:
+            await connection.send_message(message)
+        except Exception as e:
+            # A rejected mail leaves the session usable; anything else may have broken it.
+            reusable = _rejection_code(e) is not None
+            self._record_failure(mail, e, perf_counter() - start)
+        else:
+            mail.status = OutboxMail.SENT
+            mail.sent_at = datetime.now()
+            self.sent += 1
+            metrics.observe_mail(mail.template_name, perf_counter() - start, failed=False)
+        finally:
+            self.pool.release(connection, reusable)
+
+    def _record_failure(self, mail: OutboxMail, error: Exception, seconds: float):
+        mail.last_error = f"{type(error).__name__}: {error}"[:1000]
+        permanent = (_rejection_code(error) or 0) >= 500
+        if permanent or mail.attempts >= self.max_attempts:
+            mail.status = OutboxMail.FAILED
+            self.failed += 1
+            logger.error(f"Giving up on mail {mail.id} to '{mail.recipient}': {mail.last_error}")
+        else:
+            delay = min(self.retry_max, self.retry_base * 2 ** (mail.attempts - 1))
+            mail.next_attempt_at = datetime.now() + timedelta(seconds=delay)
+            self.retried += 1
+        metrics.observe_mail(mail.template_name, seconds, failed=True)
+
+    def get_status(self) -> dict:
+        return {
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "smtp_connections_opened": self.pool.opened,
+        }
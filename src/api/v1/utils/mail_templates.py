@@ -0,0 +1,158 @@
+import re
+from typing import Callable
+
+from jinja2 import Environment, FileSystemLoader, nodes, select_autoescape
+from markupsafe import escape
+
+from config.config import settings
+
+_STYLE_BLOCK = re.compile(r"<style[^>]*>(.*?)</style>\s*", re.S | re.I)
+_AT_RULE = re.compile(r"@[^{]+\{(?:[^{}]*\{[^{}]*\})*[^{}]*\}")
+_RULE = re.compile(r"([^{}]+)\{([^{}]*)\}")
+_SIMPLE_SELECTOR = re.compile(r"^(?:([a-zA-Z][\w-]*)?(?:\.([\w-]+))?|#([\w-]+))$")
+_START_TAG = re.compile(r"<([a-zA-Z][\w-]*)(\s[^<>]*?)?(/?)>")
+_ATTRIBUTE = re.compile(r"""\s([\w-]+)\s*=\s*("[^"]*"|'[^']*')""")
+
+
+def inline_css(html: str) -> str:
+    """
+    Moves `<style>` rules with simple selectors (`tag`, `.class`, `tag.class`,
+    `#id`) into the `style` attribute of the elements they match, since many
+    mail clients ignore `<style>`. Existing inline styles win; at-rules and
+    other selectors stay in a `<style>` block.
+    """
+    rules, leftover, at_rules = [], [], []
+    for block in _STYLE_BLOCK.findall(html):
+        at_rules.extend(_AT_RULE.findall(block))
+        for selectors, declarations in _RULE.findall(_AT_RULE.sub("", block)):
+            declarations = declarations.strip().rstrip(";").strip()
+            for selector in (selector.strip() for selector in selectors.split(",")):
+                match = _SIMPLE_SELECTOR.match(selector)
+                if selector and match:
+                    tag, css_class, element_id = match.groups()
+                    specificity = 100 if element_id else (10 if css_class else 0) + (1 if tag else 0)
+                    rules.append((specificity, tag, css_class, element_id, declarations))
+                else:
+                    leftover.append(f"{selector} {{ {declarations} }}")
+    if not rules and not leftover and not at_rules:
+        return html
+    # At-rules such as @media override the base rules, so they stay last.
+    leftover.extend(at_rules)
+    rules.sort(key=lambda rule: rule[0])
+
+    def apply(match: re.Match) -> str:
+        tag, attributes, closing = match.group(1), match.group(2) or "", match.group(3)
+        values = {name.lower(): value[1:-1] for name, value in _ATTRIBUTE.findall(attributes)}
+        classes = values.get("class", "").split()
+        declarations = [
+            declarations for _, rule_tag, css_class, element_id, declarations in rules
+            if (element_id and values.get("id") == element_id)
+            or (not element_id and (not rule_tag or rule_tag == tag.lower()) and (not css_class or css_class in classes))
+        ]
+        if not declarations:
+            return match.group(0)
+        if "style" in values:
+            declarations.append(values["style"].strip().rstrip(";"))
+            attributes = _ATTRIBUTE.sub(lambda m: "" if m.group(1).lower() == "style" else m.group(0), attributes)
+        return f'<{tag}{attributes} style="{"; ".join(declarations)}"{closing}>'
+
+    html = _STYLE_BLOCK.sub("", html)
+    html = _START_TAG.sub(apply, html)
+    if leftover:
+        style = f"<style>{' '.join(leftover)}</style>"
+        html = html.replace("<head>", f"<head>{style}", 1) if "<head>" in html else style + html
+    return html
+
+
+class InlineCSSLoader(FileSystemLoader):
+
+    def get_source(self, environment: Environment, template: str):
+        source, filename, uptodate = super().get_source(environment, template)
+        return inline_css(source), filename, uptodate
+
+
+class PrerenderedTemplate:
+    """
+    A template that only substitutes plain `{{ name }}` values. The static
+    text between them is kept as ready strings, so rendering is a list copy,
+    one escape per value and a join, without going through Jinja's runtime.
+    """
+
+    def __init__(self, chunks: list[str], slots: list[tuple[int, str]], autoescape: bool = True):
+        self.chunks = chunks
+        self.slots = slots
+        self.autoescape = autoescape
+
+    @classmethod
+    def from_ast(cls, tree: nodes.Template, autoescape: bool = True):
+        """None unless the template is nothing but text and plain variables."""
+        chunks, slots = [], []
+        for node in tree.body:
+            if not isinstance(node, nodes.Output):
+                return None
+            for child in node.nodes:
+                if isinstance(child, nodes.TemplateData):
+                    chunks.append(child.data)
+                elif isinstance(child, nodes.Name):
+                    slots.append((len(chunks), child.name))
+                    chunks.append("")
+                else:
+                    return None
+        return cls(chunks, slots, autoescape)
+
+    def render(self, context: dict) -> str:
+        output = self.chunks.copy()
+        convert = escape if self.autoescape else str
+        for index, name in self.slots:
+            output[index] = convert(context.get(name, ""))
+        return "".join(output)
+
+
+class MailTemplates:
+    """
+    Mail templates compiled once and cached by name. Templates that only
+    substitute values are served as `PrerenderedTemplate`s, the rest by
+    their compiled Jinja template. With `inline_styles`, `<style>` rules are
+    inlined into the source before compiling, so it costs nothing per mail.
+    """
+
+    def __init__(self, directory: str, inline_styles: bool = True):
+        loader = InlineCSSLoader(directory) if inline_styles else FileSystemLoader(directory)
+        self.environment = Environment(
+            loader=loader, autoescape=select_autoescape(), auto_reload=False, cache_size=-1
+        )
+        self._renderers: dict[str, Callable[[dict], str]] = {}
+        self._kinds: dict[str, str] = {}
+
+    def load_all(self) -> list[str]:
+        """Compiles every template up front; call at startup."""
+        names = self.environment.list_templates(extensions=["html"])
+        for name in names:
+            self.get(name)
+        return names
+
+    def get(self, name: str) -> Callable[[dict], str]:
+        if (renderer := self._renderers.get(name)) is None:
+            source, _, _ = self.environment.loader.get_source(self.environment, name)
+            prerendered = PrerenderedTemplate.from_ast(
+                self.environment.parse(source), autoescape=self.environment.autoescape(name)
+            )
+            if prerendered is not None:
+                renderer, self._kinds[name] = prerendered.render, "prerendered"
+            else:
+                renderer, self._kinds[name] = self.environment.get_template(name).render, "jinja"
+            self._renderers[name] = renderer
+        return renderer
+
+    def render(self, name: str, context: dict) -> str:
+        return self.get(name)(context)
+
+    def render_many(self, name: str, contexts: list[dict]) -> list[str]:
+        renderer = self.get(name)
+        return [renderer(context) for context in contexts]
+
+    def get_status(self) -> dict:
+        return {"templates": dict(self._kinds)}
+
+
+mail_templates = MailTemplates(settings.MAIL_TEMPLATE_DIR, settings.MAIL_TEMPLATE_INLINE_CSS)
@@ -0,0 +1,197 @@
+import math
+from dataclasses import dataclass
+from time import time
+
+from fastapi import HTTPException, Request, status
+from starlette.datastructures import MutableHeaders
+
+from config.config import settings
+from src.api.v1.constants.messages import TOO_MANY_REQUESTS
+
+
+@dataclass(slots=True)
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset: int      # Seconds until the current window ends
+
+    def headers(self) -> dict:
+        return {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(self.reset),
+        }
+
+
+def _sliding_window(now: float, window: int, previous: int, current: int):
+    """Weights the previous fixed window by how much of it still overlaps the sliding one."""
+    window_start = now - now % window
+    elapsed = now - window_start
+    estimated = previous * (1 - elapsed / window) + current
+    return estimated, max(1, math.ceil(window - elapsed))
+
+
+class InMemoryRateLimitBackend:
+    """
+    Sliding-window counters kept in process, one small list per key:
+    `[window, window_start, previous_count, current_count]`. A decision is a
+    dict lookup and some arithmetic; stale keys are swept once a minute.
+    """
+
+    sweep_interval = 60
+
+    def __init__(self):
+        self._counters: dict[str, list] = {}
+        self._next_sweep = 0.0
+
+    async def hit(self, key: str, limit: int, window: int) -> RateLimitResult:
+        return self.hit_nowait(key, limit, window)
+
+    def hit_nowait(self, key: str, limit: int, window: int) -> RateLimitResult:
+        now = time()
+        if now >= self._next_sweep:
+            self._sweep(now)
+
+        window_start = now - now % window
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters[key] = [window, window_start, 0, 0]
+        elif counter[1] != window_start:
+            counter[2] = counter[3] if window_start - counter[1] == window else 0
+            counter[3] = 0
+            counter[1] = window_start
+
+        estimated, reset = _sliding_window(now, window, counter[2], counter[3])
+        if estimated >= limit:
+            return RateLimitResult(False, limit, 0, reset)
+
+        counter[3] += 1
+        return RateLimitResult(True, limit, max(0, int(limit - estimated - 1)), reset)
+
+    def _sweep(self, now: float):
+        self._next_sweep = now + self.sweep_interval
+        stale = [key for key, counter in self._counters.items() if now - counter[1] >= 2 * counter[0]]
+        for key in stale:
+            del self._counters[key]
+
+    def clear(self):
+        self._counters.clear()
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class RedisRateLimitBackend:
+    """Same sliding-window estimate, with the per-window counters shared through Redis."""
+
+    def __init__(self, url: str = None, client=None):
+        if client is None:
+            from redis.asyncio import Redis
+            client = Redis.from_url(url, decode_responses=True)
+        self.client = client
+
+    async def hit(self, key: str, limit: int, window: int) -> RateLimitResult:
+        now = time()
+        window_start = int(now - now % window)
+        current_key = f"ratelimit:{key}:{window_start}"
+        async with self.client.pipeline(transaction=True) as pipeline:
+            pipeline.incr(current_key)
+            pipeline.expire(current_key, 2 * window)
+            pipeline.get(f"ratelimit:{key}:{window_start - window}")
+            current, _, previous = await pipeline.execute()
+
+        estimated, reset = _sliding_window(now, window, int(previous or 0), current - 1)
+        if estimated >= limit:
+            # Rejected attempts do not consume the window, same as the in-memory backend.
+            await self.client.decr(current_key)
+            return RateLimitResult(False, limit, 0, reset)
+        return RateLimitResult(True, limit, max(0, int(limit - estimated - 1)), reset)
+
+    def clear(self):
+        pass
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        await self.client.aclose()
+
+
+def create_rate_limit_backend():
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisRateLimitBackend(url=settings.RATE_LIMIT_REDIS_URL)
+    return InMemoryRateLimitBackend()
+
+
+rate_limit_backend = create_rate_limit_backend()
+
+
+class RateLimiter:
+    """
+    Dependency limiting an endpoint per client IP and, optionally, per account
+    (the `email` of the JSON body). Answers 429 with `Retry-After` once a
+    limit is reached; `RateLimitHeadersMiddleware` adds the `RateLimit-*`
+    headers to every other response, including errors raised by the endpoint.
+    """
+
+    def __init__(self, scope: str, per_ip: int, per_account: int = 0, window: int = None):
+        self.scope = scope
+        self.per_ip = per_ip
+        self.per_account = per_account
+        self.window = window or settings.RATE_LIMIT_WINDOW
+
+    async def __call__(self, request: Request):
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+
+        checks = []
+        if self.per_ip:
+            checks.append((f"{self.scope}:ip:{request.client.host if request.client else ''}", self.per_ip))
+        if self.per_account and (email := await self._get_account(request)):
+            checks.append((f"{self.scope}:account:{email}", self.per_account))
+
+        results = [await rate_limit_backend.hit(key, limit, self.window) for key, limit in checks]
+        if not results:
+            return
+
+        for result in results:
+            if not result.allowed:
+                raise HTTPException(
+                    detail=TOO_MANY_REQUESTS,
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    headers={**result.headers(), "Retry-After": str(result.reset)},
+                )
+        request.state.rate_limit_headers = min(results, key=lambda result: result.remaining).headers()
+
+    @staticmethod
+    async def _get_account(request: Request) -> str | None:
+        try:
+            body = await request.json()
+        except ValueError:
+            return None
+        email = body.get("email") if isinstance(body, dict) else None
+        return email.lower() if isinstance(email, str) else None
+
+
+class RateLimitHeadersMiddleware:
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                if rate_limit_headers := scope.get("state", {}).get("rate_limit_headers"):
+                    headers = MutableHeaders(scope=message)
+                    for key, value in rate_limit_headers.items():
+                        headers.setdefault(key, value)
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
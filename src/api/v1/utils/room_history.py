@@ -0,0 +1,139 @@
+import glob
+import json
+import os
+import uuid
+from collections import deque
+
+
+class RoomHistory:
+    """
+    Fixed-size ring of a room's most recent messages. Slots are allocated up
+    front and overwritten in place; message `n` lives in slot `n % capacity`,
+    so appending and reading a range never shift or grow anything. Offsets
+    assigned elsewhere may arrive out of order or with gaps; a slot only
+    answers for the offset it was written with.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.next_offset = 0
+        self.bytes = 0
+        self._slots: list[tuple[int, dict, int] | None] = [None] * capacity
+
+    @property
+    def first_offset(self) -> int:
+        return max(0, self.next_offset - self.capacity)
+
+    def append(self, envelope: dict, size: int, offset: int = None) -> int:
+        """Records the message at `offset`, by default the next one; too old to fit is ignored."""
+        if offset is None:
+            offset = self.next_offset
+        if offset < self.first_offset:
+            return offset
+        slot = offset % self.capacity
+        if (evicted := self._slots[slot]) is not None:
+            self.bytes -= evicted[2]
+        self._slots[slot] = (offset, envelope, size)
+        self.bytes += size
+        self.next_offset = max(self.next_offset, offset + 1)
+        return offset
+
+    def since(self, offset: int) -> list[dict]:
+        """Messages after `offset`, as far back as the ring still reaches."""
+        start = max(offset + 1, self.first_offset)
+        return [
+            entry[1] for i in range(start, self.next_offset)
+            if (entry := self._slots[i % self.capacity]) is not None and entry[0] == i
+        ]
+
+
+class HistoryStore:
+    """
+    Per-room `RoomHistory` rings. Offsets grow monotonically per room and are
+    stamped into each envelope, so a reconnecting client resumes with the
+    last offset it saw. An envelope that already carries an offset, stamped
+    by the worker it was sent from, is recorded under that offset, so every
+    worker holds the same message at the same offset.
+
+    With `spill_dir`, every message is also appended as a JSON line to
+    `<spill_dir>/<node_id>/<room>.jsonl`, one directory per worker so workers
+    sharing the directory never write to the same file. The files of all
+    nodes seed the ring and its offsets after a restart and serve resumes
+    older than the ring, limited to the most recent `replay_limit` messages.
+    """
+
+    def __init__(self, capacity: int, spill_dir: str = None, replay_limit: int = 1000, node_id: str = None):
+        self.capacity = capacity
+        self.spill_dir = spill_dir
+        self.replay_limit = replay_limit
+        self.node_id = node_id or uuid.uuid4().hex
+        self.rooms: dict[str, RoomHistory] = {}
+        self._spill_files: dict = {}
+
+    def next_offset(self, room: str) -> int:
+        return self._get(room).next_offset
+
+    def append(self, room: str, envelope: dict) -> dict:
+        """Returns the envelope stamped with its offset."""
+        history = self._get(room)
+        if "offset" not in envelope:
+            envelope = {**envelope, "offset": history.next_offset}
+        line = json.dumps(envelope, separators=(",", ":"))
+        history.append(envelope, len(line), envelope["offset"])
+        if self.spill_dir:
+            self._spill_file(room).write(line + "\n")
+        return envelope
+
+    def since(self, room: str, offset: int) -> list[dict]:
+        history = self._get(room)
+        if offset + 1 >= history.first_offset or not self.spill_dir:
+            return history.since(offset)
+        return self._read_spill(room, offset, self.replay_limit)
+
+    def _get(self, room: str) -> RoomHistory:
+        if (history := self.rooms.get(room)) is None:
+            history = self.rooms[room] = RoomHistory(self.capacity)
+            if self.spill_dir:
+                for envelope in self._read_spill(room, -1, self.capacity):
+                    history.append(envelope, len(json.dumps(envelope, separators=(",", ":"))), envelope["offset"])
+        return history
+
+    def _spill_file(self, room: str):
+        if (spill_file := self._spill_files.get(room)) is None:
+            directory = os.path.join(self.spill_dir, self.node_id)
+            os.makedirs(directory, exist_ok=True)
+            spill_file = self._spill_files[room] = open(
+                os.path.join(directory, f"{room}.jsonl"), "a", encoding="utf-8"
+            )
+        return spill_file
+
+    def _read_spill(self, room: str, offset: int, limit: int) -> list[dict]:
+        if spill_file := self._spill_files.get(room):
+            spill_file.flush()
+        envelopes = {}
+        for path in glob.glob(os.path.join(glob.escape(self.spill_dir), "*", f"{glob.escape(room)}.jsonl")):
+            with open(path, encoding="utf-8") as lines:
+                for line in deque(lines, maxlen=limit):
+                    envelope = json.loads(line)
+                    envelopes[envelope["offset"]] = envelope
+        recent = sorted(envelopes)[-limit:]
+        return [envelopes[i] for i in recent if i > offset]
+
+    def close(self):
+        for spill_file in self._spill_files.values():
+            spill_file.close()
+        self._spill_files.clear()
+
+    def get_status(self, largest: int = 10) -> dict:
+        rooms = sorted(self.rooms.items(), key=lambda item: item[1].bytes, reverse=True)
+        return {
+            "rooms": len(self.rooms),
+            "capacity": self.capacity,
+            "bytes": sum(history.bytes for history in self.rooms.values()),
+            "spill_dir": self.spill_dir,
+            "largest_rooms": [
+                {"room": room, "messages": history.next_offset - history.first_offset, "bytes": history.bytes,
+                 "next_offset": history.next_offset}
+                for room, history in rooms[:largest]
+            ],
+        }
@@ -1,26 +1,382 @@
+import asyncio
+from collections import deque
+from enum import Enum
+from time import monotonic, perf_counter, time
+
 from fastapi.websockets import WebSocket
 
+from config.config import settings
+from logger.logger import logger
+from monitoring.metrics import metrics
+from monitoring.stats import TimingStats
+from src.api.v1.utils.chat_backplane import Backplane, InMemoryBackplane, create_backplane
+from src.api.v1.utils.chat_envelope import JSON, encode, encode_batch, make_envelope
+from src.api.v1.utils.room_history import HistoryStore
+from src.api.v1.utils.timer_wheel import TimerWheel
+
+class OverflowPolicy(str, Enum):
+    DROP_OLDEST = "drop_oldest"
+    DISCONNECT = "disconnect"
+
+
+class ClientConnection:
+    """
+    One connected socket with its own bounded outbound queue and writer task,
+    so a broadcast only appends to each queue and a slow client never delays
+    the others. The queue holds frames already encoded for this connection's
+    `encoding`. With a `coalesce_window`, the writer waits that long after
+    the first queued frame and sends everything queued by then (up to
+    `coalesce_max`) as one array frame.
+    """
+
+    def __init__(self, websocket: WebSocket, max_queue: int, overflow_policy: OverflowPolicy,
+                 encoding: str = JSON, coalesce_window: float = 0, coalesce_max: int = 64):
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.overflow_policy = overflow_policy
+        self.encoding = encoding
+        self.coalesce_window = coalesce_window
+        self.coalesce_max = coalesce_max
+        self.queue: deque[tuple[float, str | bytes]] = deque()
+        self.sent = 0
+        self.frames = 0
+        self.dropped = 0
+        self.lag = TimingStats()    # Time from enqueue until the frame was written
+        self.closed = False
+        self.user_id: int | None = None
+        self.rooms: set[str] = set()
+        self.expires_at: float | None = None        # Access token `exp`, wall clock
+        self.last_seen = self.last_active = monotonic()
+        self.ping_sent_at: float | None = None
+        self._ready = asyncio.Event()
+        self._writer: asyncio.Task | None = None
+
+    def start(self, on_error):
+        self._writer = asyncio.create_task(self._write_loop(on_error))
+
+    def enqueue(self, frame: str | bytes) -> bool:
+        """Returns False when the queue is full and the policy is to disconnect."""
+        if self.closed:
+            return True
+
+        if len(self.queue) >= self.max_queue:
+            if self.overflow_policy == OverflowPolicy.DISCONNECT:
+                return False
+            self.queue.popleft()
+            self.dropped += 1
+
+        self.queue.append((perf_counter(), frame))
+        self._ready.set()
+        return True
+
+    async def _write_loop(self, on_error):
+        try:
+            while True:
+                while not self.queue:
+                    self._ready.clear()
+                    await self._ready.wait()
+
+                if self.coalesce_window:
+                    if len(self.queue) < self.coalesce_max:
+                        await asyncio.sleep(self.coalesce_window)
+                    batch = [self.queue.popleft() for _ in range(min(len(self.queue), self.coalesce_max))]
+                else:
+                    batch = [self.queue.popleft()]
+                if not batch:
+                    continue    # Stopped while coalescing
+
+                if len(batch) == 1:
+                    frame = batch[0][1]
+                else:
+                    frame = encode_batch([frame for _, frame in batch], self.encoding)
+                if isinstance(frame, bytes):
+                    await self.websocket.send_bytes(frame)
+                else:
+                    await self.websocket.send_text(frame)
+
+                self.sent += len(batch)
+                self.frames += 1
+                now = perf_counter()
+                for enqueued_at, _ in batch:
+                    self.lag.observe(now - enqueued_at)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"Dropping websocket after failed send: {str(e)}")
+            await on_error(self)
+
+    def stop(self):
+        self.closed = True
+        self.queue.clear()
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+
+    def get_status(self) -> dict:
+        return {
+            "encoding": self.encoding,
+            "queued": len(self.queue),
+            "sent": self.sent,
+            "frames": self.frames,
+            "dropped": self.dropped,
+            "lag": self.lag.as_dict(),
+        }
+
 
 class ConnectionManager:
+    """
+    Sockets connected to this worker, indexed by room and by user id so a
+    message only touches its subscribers. Every delivery is made locally and
+    handed to the backplane, which forwards it to the other workers.
+
+    Messages are envelopes (see `chat_envelope`), serialized once per
+    delivery and encoding; every recipient's queue shares the same frame.
+    Room messages get their history offset from the backplane before they
+    are delivered, so it is the same on every worker, and are recorded in
+    `history` by every worker that fans them out.
 
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
+    Each connection also has one timer in a shared `TimerWheel`, driven by a
+    single ticker task: when it fires the connection is pinged, or closed if
+    it missed the previous pong, stayed idle too long or its access token
+    expired, and the timer is re-armed for the next deadline.
+    """
 
-    async def connect(self, websocket: WebSocket, protocol: str | None):
+    def __init__(self, max_queue: int = 256, overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+                 backplane: Backplane = None, ping_interval: float = 25, pong_timeout: float = 10,
+                 idle_timeout: float = 0, heartbeat_tick: float = 1.0, coalesce_window: float = 0,
+                 coalesce_max: int = 64, history: HistoryStore = None):
+        self.max_queue = max_queue
+        self.overflow_policy = OverflowPolicy(overflow_policy)
+        self.coalesce_window = coalesce_window
+        self.coalesce_max = coalesce_max
+        self.backplane = backplane or InMemoryBackplane()
+        self.history = history
+        self.ping_interval = ping_interval
+        self.pong_timeout = pong_timeout
+        self.idle_timeout = idle_timeout
+        self.heartbeats = TimerWheel(tick=heartbeat_tick, now=monotonic())
+        self.active_connections: dict[WebSocket, ClientConnection] = {}
+        self.rooms: dict[str, set[ClientConnection]] = {}
+        self.users: dict[int, set[ClientConnection]] = {}
+        self.slow_consumer_disconnects = 0
+        self.evictions: dict[str, int] = {}
+        self.fan_out = TimingStats()
+        self._ticker: asyncio.Task | None = None
+        # The loop only keeps weak references to tasks, so pending closes are held here.
+        self._tasks: set[asyncio.Task] = set()
+
+    async def connect(self, websocket: WebSocket, protocol: str | None, encoding: str = JSON):
         await websocket.accept(protocol)
-        self.active_connections.append(websocket)
+        connection = ClientConnection(
+            websocket, self.max_queue, self.overflow_policy, encoding, self.coalesce_window, self.coalesce_max
+        )
+        self.active_connections[websocket] = connection
+        metrics.websocket_connected(1)
+        connection.start(on_error=self._drop_connection)
+        self._schedule_heartbeat(connection)
+        return connection
 
-    async def disconnect(self, websocket: WebSocket, code: int = 1000, reason: str = ""):
-        await websocket.close(code, reason)
-        self.active_connections.remove(websocket)
+    def bind_user(self, websocket: WebSocket, user_id: int, expires_at: float = None):
+        if connection := self.active_connections.get(websocket):
+            connection.user_id = user_id
+            connection.expires_at = expires_at
+            self.users.setdefault(user_id, set()).add(connection)
+            self._schedule_heartbeat(connection)
+
+    def touch(self, websocket: WebSocket, active: bool = True):
+        """Record a frame from the client; pongs keep it alive without counting as activity."""
+        if connection := self.active_connections.get(websocket):
+            connection.last_seen = monotonic()
+            connection.ping_sent_at = None
+            if active:
+                connection.last_active = connection.last_seen
+
+    def join(self, websocket: WebSocket, room: str, since: int = None):
+        """With `since`, first replays the room's messages after that offset as one array frame."""
+        if connection := self.active_connections.get(websocket):
+            connection.rooms.add(room)
+            self.rooms.setdefault(room, set()).add(connection)
+            if since is not None and self.history is not None:
+                if missed := self.history.since(room, since):
+                    frames = [encode(envelope, connection.encoding) for envelope in missed]
+                    self._enqueue(connection, encode_batch(frames, connection.encoding))
+
+    def leave(self, websocket: WebSocket, room: str):
+        if connection := self.active_connections.get(websocket):
+            connection.rooms.discard(room)
+            self._discard(self.rooms, room, connection)
+
+    def is_member(self, websocket: WebSocket, room: str) -> bool:
+        connection = self.active_connections.get(websocket)
+        return connection is not None and room in connection.rooms
+
+    def remove(self, websocket: WebSocket):
+        """Idempotent: safe to call again for a socket that is already gone."""
+        if connection := self.active_connections.pop(websocket, None):
+            metrics.websocket_connected(-1)
+            self.heartbeats.cancel(connection)
+            for room in connection.rooms:
+                self._discard(self.rooms, room, connection)
+            if connection.user_id is not None:
+                self._discard(self.users, connection.user_id, connection)
+            connection.stop()
 
     @staticmethod
-    async def send_message(message: str, websocket: WebSocket):
-        await websocket.send_text(message)
+    def _discard(index: dict, key, connection: ClientConnection):
+        if subscribers := index.get(key):
+            subscribers.discard(connection)
+            if not subscribers:
+                del index[key]
+
+    async def disconnect(self, websocket: WebSocket, code: int = 1000, reason: str = ""):
+        self.remove(websocket)
+        try:
+            await websocket.close(code, reason)
+        except RuntimeError:
+            # Already closed by the client.
+            pass
+
+    async def send_message(self, message: dict, websocket: WebSocket):
+        if connection := self.active_connections.get(websocket):
+            self._enqueue(connection, encode(message, connection.encoding))
+
+    async def broadcast_message(self, message: dict):
+        await self._publish({"message": message})
+
+    async def send_to_room(self, room: str, message: dict):
+        await self._publish({"room": room, "message": message})
+
+    async def send_to_user(self, user_id: int, message: dict):
+        await self._publish({"user": user_id, "message": message})
+
+    async def _publish(self, event: dict):
+        if "room" in event and self.history is not None:
+            room = event["room"]
+            offset = await self.backplane.next_offset(room, self.history.next_offset(room))
+            event = {**event, "message": {**event["message"], "offset": offset}}
+        self._fan_out_local(event)
+        self.backplane.publish(event)
+
+    def _fan_out_local(self, event: dict):
+        start = perf_counter()
+        if "room" in event:
+            subscribers = self.rooms.get(event["room"], ())
+        elif "user" in event:
+            subscribers = self.users.get(event["user"], ())
+        else:
+            subscribers = self.active_connections.values()
+
+        message = event["message"]
+        if "room" in event and self.history is not None:
+            message = self.history.append(event["room"], message)
+
+        frames = {}
+        recipients = list(subscribers)
+        for connection in recipients:
+            if (frame := frames.get(connection.encoding)) is None:
+                frame = frames[connection.encoding] = encode(message, connection.encoding)
+            self._enqueue(connection, frame)
+        elapsed = perf_counter() - start
+        self.fan_out.observe(elapsed)
+        metrics.observe_fan_out(elapsed, len(recipients))
+
+    def _enqueue(self, connection: ClientConnection, frame: str | bytes):
+        if not connection.enqueue(frame):
+            self.slow_consumer_disconnects += 1
+            self.remove(connection.websocket)
+            self._close_later(connection.websocket, code=1008, reason="Slow consumer.")
+
+    async def _drop_connection(self, connection: ClientConnection):
+        self.remove(connection.websocket)
+
+    def _evict(self, connection: ClientConnection, code: int, reason: str):
+        self.evictions[reason] = self.evictions.get(reason, 0) + 1
+        self.remove(connection.websocket)
+        self._close_later(connection.websocket, code=code, reason=reason)
+
+    def _close_later(self, websocket: WebSocket, code: int, reason: str):
+        task = asyncio.create_task(self.disconnect(websocket, code=code, reason=reason))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _schedule_heartbeat(self, connection: ClientConnection):
+        now = monotonic()
+        if connection.ping_sent_at is not None:
+            due = connection.ping_sent_at + self.pong_timeout
+        else:
+            due = connection.last_seen + self.ping_interval
+        if self.idle_timeout:
+            due = min(due, connection.last_active + self.idle_timeout)
+        if connection.expires_at is not None:
+            due = min(due, now + connection.expires_at - time())
+        self.heartbeats.schedule(connection, due - now)
+
+    def _check_heartbeat(self, connection: ClientConnection):
+        now = monotonic()
+        if connection.expires_at is not None and connection.expires_at <= time():
+            return self._evict(connection, 3000, "Token expired.")
+        if connection.ping_sent_at is not None and now - connection.ping_sent_at >= self.pong_timeout:
+            return self._evict(connection, 1001, "Heartbeat timeout.")
+        if self.idle_timeout and now - connection.last_active >= self.idle_timeout:
+            return self._evict(connection, 1000, "Idle timeout.")
+
+        if connection.ping_sent_at is None and now - connection.last_seen >= self.ping_interval:
+            connection.ping_sent_at = now
+            self._enqueue(connection, encode(make_envelope("ping"), connection.encoding))
+        if not connection.closed:
+            self._schedule_heartbeat(connection)
+
+    async def _tick_forever(self):
+        while True:
+            await asyncio.sleep(self.heartbeats.tick)
+            for connection in self.heartbeats.advance(monotonic()):
+                self._check_heartbeat(connection)
+
+    async def start(self):
+        await self.backplane.start(on_message=self._fan_out_local)
+        self._ticker = asyncio.create_task(self._tick_forever())
+
+    async def stop(self):
+        if self._ticker is not None:
+            self._ticker.cancel()
+            self._ticker = None
+        for task in list(self._tasks):
+            task.cancel()
+        await self.backplane.stop()
+        if self.history is not None:
+            self.history.close()
 
-    async def broadcast_message(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
+    def get_status(self, slowest: int = 10) -> dict:
+        connections = list(self.active_connections.values())
+        lagging = sorted(connections, key=lambda connection: len(connection.queue), reverse=True)[:slowest]
+        return {
+            "connections": len(connections),
+            "rooms": len(self.rooms),
+            "users": len(self.users),
+            "queued": sum(len(connection.queue) for connection in connections),
+            "dropped": sum(connection.dropped for connection in connections),
+            "slow_consumer_disconnects": self.slow_consumer_disconnects,
+            "heartbeat_timers": len(self.heartbeats),
+            "evictions": self.evictions,
+            "fan_out": self.fan_out.as_dict(),
+            "slowest_connections": [connection.get_status() for connection in lagging],
+            "backplane": self.backplane.get_status(),
+            "history": self.history.get_status() if self.history is not None else None,
+        }
 
 
-connection_manager = ConnectionManager()
\ No newline at end of file
+connection_manager = ConnectionManager(
+    max_queue=settings.WS_SEND_QUEUE_SIZE,
+    overflow_policy=settings.WS_OVERFLOW_POLICY,
+    backplane=create_backplane(),
+    ping_interval=settings.WS_PING_INTERVAL,
+    pong_timeout=settings.WS_PONG_TIMEOUT,
+    idle_timeout=settings.WS_IDLE_TIMEOUT,
+    heartbeat_tick=settings.WS_HEARTBEAT_TICK,
+    coalesce_window=settings.WS_COALESCE_WINDOW,
+    coalesce_max=settings.WS_COALESCE_MAX,
+    history=HistoryStore(
+        settings.WS_HISTORY_SIZE,
+        spill_dir=settings.WS_HISTORY_SPILL_DIR or None,
+        replay_limit=settings.WS_HISTORY_REPLAY_LIMIT,
+    ) if settings.WS_HISTORY_SIZE else None,
+)
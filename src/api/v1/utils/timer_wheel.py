@@ -0,0 +1,51 @@
+import math
+
+
+class TimerWheel:
+    """
+    Hashed timing wheel: `slots` buckets of `tick` seconds each. Scheduling
+    and cancelling are O(1), and `advance` only visits the buckets whose time
+    has come, so one ticker task can drive any number of timers. A delay
+    longer than one turn of the wheel is stored with the number of full turns
+    still to wait.
+    """
+
+    def __init__(self, tick: float = 1.0, slots: int = 512, now: float = 0.0):
+        self.tick = tick
+        self.slots: list[dict] = [{} for _ in range(slots)]
+        self._cursor = 0
+        self._next_tick_at = now + tick
+        self._slot_of: dict = {}
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    def schedule(self, key, delay: float):
+        """(Re)schedule `key` to fire after `delay` seconds, rounded up to the next tick."""
+        self.cancel(key)
+        ticks = max(1, math.ceil(delay / self.tick))
+        rounds, offset = divmod(ticks - 1, len(self.slots))
+        slot = (self._cursor + offset) % len(self.slots)
+        self.slots[slot][key] = rounds
+        self._slot_of[key] = slot
+
+    def cancel(self, key):
+        slot = self._slot_of.pop(key, None)
+        if slot is not None:
+            del self.slots[slot][key]
+
+    def advance(self, now: float) -> list:
+        """Returns the keys whose timers expired up to `now`."""
+        expired = []
+        while self._next_tick_at <= now:
+            bucket = self.slots[self._cursor]
+            for key, rounds in list(bucket.items()):
+                if rounds:
+                    bucket[key] = rounds - 1
+                else:
+                    del bucket[key]
+                    del self._slot_of[key]
+                    expired.append(key)
+            self._cursor = (self._cursor + 1) % len(self.slots)
+            self._next_tick_at += self.tick
+        return expired
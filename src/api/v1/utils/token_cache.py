@@ -0,0 +1,130 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from time import time
+
+from config.config import settings
+
+
+@dataclass(frozen=True, slots=True)
+class UserPrincipal:
+    """Immutable snapshot of the user a token resolved to, safe to share across requests."""
+
+    id: int
+    full_name: str
+    email: str
+    is_active: bool
+    created_at: datetime | None
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(
+            id=user.id,
+            full_name=user.full_name,
+            email=user.email,
+            is_active=user.is_active,
+            created_at=user.created_at,
+        )
+
+
+@dataclass(slots=True)
+class Principal:
+    """Verified claims plus the user they resolve to; shared by every dependency of a request."""
+
+    claims: dict
+    user: UserPrincipal
+    expires_at: float
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of tokens whose signature and user have already been checked.
+
+    Entries are keyed by the raw token string, not by the unverified `jti`,
+    so a forged token can never select another token's entry. An entry lives
+    for at most `ttl` seconds and never past the token's own `exp`.
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries: OrderedDict[str, Principal] = OrderedDict()
+        self._tokens_by_jti: dict[str, str] = {}
+        self._tokens_by_email: dict[str, set[str]] = {}
+
+    def get(self, token: str) -> Principal | None:
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if entry.expires_at <= time():
+            self._remove(token)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return entry
+
+    def set(self, token: str, claims: dict, user: UserPrincipal) -> Principal:
+        entry = Principal(claims=claims, user=user, expires_at=min(time() + self.ttl, claims["exp"]))
+        if token in self._entries:
+            self._remove(token)
+
+        self._entries[token] = entry
+        if jti := claims.get("jti"):
+            self._tokens_by_jti[jti] = token
+        self._tokens_by_email.setdefault(user.email, set()).add(token)
+
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+        return entry
+
+    def invalidate_jti(self, jti: str):
+        if token := self._tokens_by_jti.get(jti):
+            self._remove(token)
+            self.invalidations += 1
+
+    def invalidate_user(self, email: str):
+        for token in list(self._tokens_by_email.get(email, ())):
+            self._remove(token)
+            self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._tokens_by_jti.clear()
+        self._tokens_by_email.clear()
+
+    def _remove(self, token: str):
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+
+        self._tokens_by_jti.pop(entry.claims.get("jti"), None)
+        tokens = self._tokens_by_email.get(entry.user.email)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_email[entry.user.email]
+
+    def get_status(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+verified_token_cache = VerifiedTokenCache(
+    max_size=settings.TOKEN_CACHE_SIZE, ttl=settings.TOKEN_CACHE_TTL
+)
@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import heapq
+import math
+from time import time
+
+from config.config import settings
+from logger.logger import logger
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over one blake2b digest."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class InMemoryRevocationStore:
+    """
+    Revoked token ids held in process. `is_revoked` is synchronous and only
+    touches the exact set when the Bloom filter reports a possible match, so
+    the auth hot path pays a couple of hash lookups and no I/O.
+    Entries are dropped once the token's `exp` has passed.
+    """
+
+    def __init__(self, bloom_capacity: int):
+        self.bloom_capacity = bloom_capacity
+        self._bloom = BloomFilter(bloom_capacity)
+        self._revoked: dict[str, float] = {}
+        self._expiry_heap: list[tuple[float, str]] = []
+        self._pruned_since_rebuild = 0
+
+    def is_revoked(self, jti: str) -> bool:
+        if self._expiry_heap and self._expiry_heap[0][0] <= time():
+            self.prune()
+        if jti not in self._bloom:
+            return False
+        return jti in self._revoked
+
+    async def revoke(self, jti: str, exp: float) -> bool:
+        """Returns False if the token id was already revoked."""
+        return self.add(jti, exp)
+
+    def add(self, jti: str, exp: float) -> bool:
+        if exp <= time() or jti in self._revoked:
+            return False
+
+        self._revoked[jti] = exp
+        self._bloom.add(jti)
+        heapq.heappush(self._expiry_heap, (exp, jti))
+        return True
+
+    def prune(self):
+        now = time()
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            _, jti = heapq.heappop(self._expiry_heap)
+            if self._revoked.pop(jti, None) is not None:
+                self._pruned_since_rebuild += 1
+
+        # Bloom filters cannot delete, so rebuild once enough entries have expired
+        # or the live set has outgrown the filter's capacity.
+        if self._pruned_since_rebuild > len(self._revoked) or len(self._revoked) > self.bloom_capacity:
+            self._rebuild_bloom()
+
+    def _rebuild_bloom(self):
+        self.bloom_capacity = max(self.bloom_capacity, len(self._revoked) * 2)
+        self._bloom = BloomFilter(self.bloom_capacity)
+        for jti in self._revoked:
+            self._bloom.add(jti)
+        self._pruned_since_rebuild = 0
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def get_status(self) -> dict:
+        return {"revoked": len(self._revoked), "bloom_capacity": self.bloom_capacity}
+
+
+class RedisRevocationStore(InMemoryRevocationStore):
+    """
+    Shares revocations between workers through a Redis-compatible server.
+
+    The sorted set `revoked_tokens` (score = exp) is the source of truth and
+    makes `revoke` atomic across workers; new revocations are also appended
+    to a stream that every worker tails into its local in-memory mirror, so
+    `is_revoked` still never leaves the process. Expired members are
+    removed from the sorted set every `prune_interval` seconds by whichever
+    worker gets there; the removal is idempotent.
+    """
+
+    revoked_key = "revoked_tokens"
+    stream_key = "revoked_tokens:stream"
+
+    def __init__(self, bloom_capacity: int, url: str = None, client=None, sync_interval: float = 1.0,
+                 prune_interval: float = 60):
+        super().__init__(bloom_capacity)
+        if client is None:
+            from redis.asyncio import Redis
+            client = Redis.from_url(url, decode_responses=True)
+        self.client = client
+        self.sync_interval = sync_interval
+        self.prune_interval = prune_interval
+        self._next_prune = 0.0
+        self._last_stream_id = "0-0"
+        self._sync_task: asyncio.Task | None = None
+
+    async def revoke(self, jti: str, exp: float) -> bool:
+        if exp <= time():
+            return False
+
+        if not await self.client.zadd(self.revoked_key, {jti: exp}, nx=True):
+            return False
+
+        await self.client.xadd(self.stream_key, {"jti": jti, "exp": exp}, maxlen=self.bloom_capacity, approximate=True)
+        self.add(jti, exp)
+        return True
+
+    async def load(self):
+        """Seed the local mirror from the sorted set, then tail the stream from its current end."""
+        if last := await self.client.xrevrange(self.stream_key, count=1):
+            self._last_stream_id = last[0][0]
+
+        now = time()
+        await self.prune_shared()
+        for jti, exp in await self.client.zrangebyscore(self.revoked_key, now, "+inf", withscores=True):
+            self.add(jti, exp)
+
+    async def prune_shared(self):
+        """Drops expired token ids from the shared sorted set."""
+        now = time()
+        self._next_prune = now + self.prune_interval
+        await self.client.zremrangebyscore(self.revoked_key, "-inf", now)
+
+    async def sync(self, block_ms: int = None):
+        response = await self.client.xread({self.stream_key: self._last_stream_id}, block=block_ms)
+        for _, entries in response or ():
+            for stream_id, fields in entries:
+                self.add(fields["jti"], float(fields["exp"]))
+                self._last_stream_id = stream_id
+
+    async def _sync_forever(self):
+        while True:
+            try:
+                await self.sync(block_ms=int(self.sync_interval * 1000))
+                if time() >= self._next_prune:
+                    await self.prune_shared()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Token revocation sync failed: {str(e)}")
+                await asyncio.sleep(self.sync_interval)
+
+    async def start(self):
+        await self.load()
+        self._sync_task = asyncio.create_task(self._sync_forever())
+
+    async def stop(self):
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            self._sync_task = None
+        await self.client.aclose()
+
+
+def create_revocation_store():
+    if settings.TOKEN_REVOCATION_BACKEND == "redis":
+        return RedisRevocationStore(
+            settings.TOKEN_REVOCATION_BLOOM_CAPACITY,
+            url=settings.TOKEN_REVOCATION_REDIS_URL,
+            sync_interval=settings.TOKEN_REVOCATION_SYNC_INTERVAL,
+            prune_interval=settings.TOKEN_REVOCATION_PRUNE_INTERVAL,
+        )
+    return InMemoryRevocationStore(settings.TOKEN_REVOCATION_BLOOM_CAPACITY)
+
+
+token_revocation_store = create_revocation_store()
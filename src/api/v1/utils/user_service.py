@@ -1,42 +1,52 @@
 from typing import Annotated
 
 from fastapi import Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database.db_connection import get_db
+from database.db_connection import get_async_db
 from src.api.v1.models.user_models.user import User
 from src.api.v1.schemas.user import UserCreate
 from src.api.v1.utils.auth import get_hashed_password
+from src.api.v1.utils.token_cache import verified_token_cache
 
-CommonDB = Annotated[Session, Depends(get_db)]
+CommonDB = Annotated[AsyncSession, Depends(get_async_db)]
 
 
 class UserService:
 
     @staticmethod
-    def get_user_by_email(email: str, db: CommonDB):
-        user = db.query(User).filter(User.email.ilike(f"%{email}%")).first()
-        return user
+    async def get_user_by_email(email: str, db: CommonDB):
+        result = await db.execute(select(User).filter(func.lower(User.email) == email.lower()))
+        return result.scalars().first()
 
-    def is_user_exists(self, email: str, db: CommonDB):
-        user = self.get_user_by_email(email, db)
+    async def is_user_exists(self, email: str, db: CommonDB):
+        user = await self.get_user_by_email(email, db)
         return True if user is not None else False
 
     @staticmethod
-    def create_user(user_data: UserCreate, db: CommonDB):
+    async def create_user(user_data: UserCreate, db: CommonDB, commit: bool = True):
+        """With `commit=False` the user is only flushed, to be committed by the caller."""
         user_data_dict = user_data.model_dump()
-        user_data_dict["password"] = get_hashed_password(user_data_dict.get("password"))
+        user_data_dict["password"] = await get_hashed_password(user_data_dict.get("password"))
         user = User(**user_data_dict)
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        if not commit:
+            await db.flush()
+            return user
+        await db.commit()
+        await db.refresh(user)
         return user
 
     @staticmethod
-    def update_user(user: User, user_data: dict, db: CommonDB):
+    async def update_user(user: User, user_data: dict, db: CommonDB):
+        previous_email = user.email
         for key, val in user_data.items():
             setattr(user, key, val)
 
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
+        # Cached principals carry a snapshot of the user, drop them once it changes.
+        verified_token_cache.invalidate_user(previous_email)
+        verified_token_cache.invalidate_user(user.email)
         return user
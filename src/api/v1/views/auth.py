@@ -1,52 +1,74 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Annotated
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from config.config import settings
-from database.db_connection import get_db
+from database.db_connection import get_async_db
+from monitoring.timing import TimedRoute
 from src.api.v1.constants.messages import (INCORRECT_EMAIL_OR_PASSWORD,
                                            USER_EMAIL_ALREADY_EXISTS,
-                                           USER_NOT_FOUND, EMAIL_VERIFICATION_SUCCESS, EMAIL_NOT_VERIFIED)
-from src.api.v1.models.user_models.user import User
-from src.api.v1.schemas.user import UserBase, UserCreate, UserResponse
+                                           USER_NOT_FOUND, EMAIL_VERIFICATION_SUCCESS, EMAIL_NOT_VERIFIED,
+                                           LOGOUT_SUCCESS, TOKEN_REVOKED)
+from src.api.v1.schemas.user import LogoutRequest, UserBase, UserCreate, UserResponse
 from src.api.v1.utils import auth as auth_utils
-from src.api.v1.utils.auth import (create_access_token, create_url_safe_token,
-                                   decode_url_safe_token)
-from src.api.v1.utils.jwt_bearer import JWTRefreshTokenValidate
+from src.api.v1.utils.auth import (create_access_token, create_refresh_token, create_url_safe_token,
+                                   decode_token, decode_url_safe_token)
+from src.api.v1.utils.dependencies import get_principal
+from src.api.v1.utils.jwt_bearer import refresh_token_validator
+from src.api.v1.utils.rate_limit import RateLimiter
+from src.api.v1.utils.token_cache import Principal, verified_token_cache
+from src.api.v1.utils.token_revocation import token_revocation_store
 from src.api.v1.utils.user_service import UserService
 from src.api.v1.utils.tasks import send_account_activation_mail
 
-router = APIRouter(prefix="/auth")
+router = APIRouter(prefix="/auth", route_class=TimedRoute)
 
-CommonDB = Annotated[Session, Depends(get_db)]
+registration_rate_limit = Depends(RateLimiter("registration", per_ip=settings.RATE_LIMIT_REGISTRATION_PER_IP))
+login_rate_limit = Depends(RateLimiter(
+    "login", per_ip=settings.RATE_LIMIT_LOGIN_PER_IP, per_account=settings.RATE_LIMIT_LOGIN_PER_ACCOUNT
+))
+refresh_rate_limit = Depends(RateLimiter("refresh", per_ip=settings.RATE_LIMIT_REFRESH_PER_IP))
 
+CommonDB = Annotated[AsyncSession, Depends(get_async_db)]
 
-@router.post("/registration", response_model=UserResponse)
+
+@router.post("/registration", response_model=UserResponse, dependencies=[registration_rate_limit])
 async def user_registration(
-        user_data: UserCreate, background_tasks: BackgroundTasks, db: CommonDB
+        user_data: UserCreate, db: CommonDB
 ):
-    if db.query(User).filter(User.email.ilike(f"%{user_data.email}%")).first():
+    if await UserService().is_user_exists(user_data.email, db):
         raise HTTPException(
             detail=USER_EMAIL_ALREADY_EXISTS, status_code=status.HTTP_400_BAD_REQUEST
         )
 
-    user = UserService().create_user(user_data, db)
-    token = create_url_safe_token({"email": user.email})
-    verify_email_link = f"{settings.BACKEND_DOMAIN}/api/v1/auth/verify-email/{token}"
-    send_account_activation_mail(
-        background_tasks,
-        email=user.email,
-        data={"verify_email_link": verify_email_link, "email": user.email},
-    )
+    try:
+        # The user and its activation mail are committed together or not at all.
+        user = await UserService().create_user(user_data, db, commit=False)
+        token = create_url_safe_token({"email": user.email})
+        verify_email_link = f"{settings.BACKEND_DOMAIN}/api/v1/auth/verify-email/{token}"
+        await send_account_activation_mail(
+            db,
+            email=user.email,
+            data={"verify_email_link": verify_email_link, "email": user.email},
+        )
+        await db.commit()
+    except IntegrityError:
+        # A concurrent registration won the race for the unique email index.
+        await db.rollback()
+        raise HTTPException(
+            detail=USER_EMAIL_ALREADY_EXISTS, status_code=status.HTTP_400_BAD_REQUEST
+        )
+    await db.refresh(user)
     return user
 
 
-@router.post("/login")
+@router.post("/login", dependencies=[login_rate_limit])
 async def user_login(data: UserBase, db: CommonDB):
-    user = UserService().get_user_by_email(data.email, db)
+    user = await UserService().get_user_by_email(data.email, db)
     if not user:
         raise HTTPException(
             detail=USER_NOT_FOUND, status_code=status.HTTP_404_NOT_FOUND
@@ -57,17 +79,17 @@ async def user_login(data: UserBase, db: CommonDB):
             detail=EMAIL_NOT_VERIFIED, status_code=status.HTTP_400_BAD_REQUEST
         )
 
-    if not auth_utils.verify_password(data.password, user.password):
+    verified, new_hash = await auth_utils.verify_and_update_password(data.password, user.password)
+    if not verified:
         raise HTTPException(
             detail=INCORRECT_EMAIL_OR_PASSWORD, status_code=status.HTTP_400_BAD_REQUEST
         )
 
+    if new_hash:
+        await UserService().update_user(user, {"password": new_hash}, db)
+
     access_token = auth_utils.create_access_token(user.email)
-    refresh_token = auth_utils.create_access_token(
-        email=user.email,
-        refresh=True,
-        expiry=timedelta(days=settings.REFRESH_TOKEN_EXPIRE_LIMIT),
-    )
+    refresh_token = auth_utils.create_refresh_token(user.email)
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
@@ -81,13 +103,13 @@ async def user_email_verify(token: str, db: CommonDB):
     token_data = decode_url_safe_token(token)
     user_email = token_data.get("email")
     if user_email:
-        user = UserService().get_user_by_email(user_email, db)
+        user = await UserService().get_user_by_email(user_email, db)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail=USER_NOT_FOUND
             )
 
-        UserService().update_user(user, {"is_active": True}, db)
+        await UserService().update_user(user, {"is_active": True}, db)
         return {"message": EMAIL_VERIFICATION_SUCCESS}
 
     raise HTTPException(
@@ -95,14 +117,36 @@ async def user_email_verify(token: str, db: CommonDB):
     )
 
 
-@router.get("/refresh_token", response_class=JSONResponse)
-async def get_new_access_token(token_details: dict = Depends(JWTRefreshTokenValidate())):
+@router.get("/refresh_token", response_class=JSONResponse, dependencies=[refresh_rate_limit])
+async def get_new_access_token(token_details: dict = Depends(refresh_token_validator)):
     expiry_timestamp = token_details["exp"]
 
     if datetime.fromtimestamp(expiry_timestamp) > datetime.now():
+        # Refresh tokens rotate: each one can be exchanged exactly once.
+        if not await token_revocation_store.revoke(token_details["jti"], expiry_timestamp):
+            raise HTTPException(
+                detail=TOKEN_REVOKED, status_code=status.HTTP_401_UNAUTHORIZED
+            )
+        verified_token_cache.invalidate_jti(token_details["jti"])
+
         new_access_token = create_access_token(email=token_details["email"])
-        return JSONResponse(content={"access_token": new_access_token})
+        new_refresh_token = create_refresh_token(email=token_details["email"])
+        return {"access_token": new_access_token, "refresh_token": new_refresh_token}
 
     raise HTTPException(
         detail="Invalid Token.", status_code=status.HTTP_401_UNAUTHORIZED
     )
+
+
+@router.post("/logout", response_class=JSONResponse)
+async def user_logout(data: LogoutRequest = None, principal: Principal = Depends(get_principal)):
+    await token_revocation_store.revoke(principal.claims["jti"], principal.claims["exp"])
+    verified_token_cache.invalidate_jti(principal.claims["jti"])
+
+    if data and data.refresh_token:
+        refresh_data = decode_token(data.refresh_token)
+        if refresh_data and refresh_data.get("refresh") and refresh_data.get("email") == principal.user.email:
+            await token_revocation_store.revoke(refresh_data["jti"], refresh_data["exp"])
+            verified_token_cache.invalidate_jti(refresh_data["jti"])
+
+    return {"message": LOGOUT_SUCCESS}
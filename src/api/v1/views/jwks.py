@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Request, Response
+from fastapi.responses import JSONResponse
+
+from config.config import settings
+from monitoring.timing import TimedRoute
+from src.api.v1.utils.jwt_keys import jwt_key_set
+
+jwks_router = APIRouter(tags=["Auth"], route_class=TimedRoute)
+
+
+@jwks_router.get("/.well-known/jwks.json", response_class=JSONResponse)
+async def get_jwks(request: Request):
+    jwks, etag = jwt_key_set.jwks()
+    headers = {
+        "Cache-Control": f"public, max-age={settings.JWKS_CACHE_MAX_AGE}",
+        "ETag": f'"{etag}"',
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=jwks, headers=headers)
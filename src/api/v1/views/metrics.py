@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Response
+
+from monitoring.metrics import metrics
+
+metrics_router = APIRouter(tags=["System"])
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
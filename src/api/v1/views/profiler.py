@@ -0,0 +1,45 @@
+import asyncio
+import json
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+
+from monitoring.profiler import profiler
+from src.api.v1.constants.messages import PROFILE_NOT_FOUND, PROFILER_BUSY
+from src.api.v1.utils.dependencies import require_profiler_token
+
+router = APIRouter(prefix="/system/profile", dependencies=[Depends(require_profiler_token)])
+
+
+@router.get("")
+async def get_profiler_status():
+    return profiler.get_status()
+
+
+@router.post("/session")
+async def run_profiling_session(seconds: float = Query(10, gt=0)):
+    """Samples the whole process for `seconds`, capped at PROFILER_MAX_SECONDS."""
+    sampler = profiler.start()
+    if sampler is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=PROFILER_BUSY)
+    try:
+        await asyncio.sleep(min(seconds, profiler.max_seconds))
+    finally:
+        profile_id = profiler.finish(sampler, f"session {seconds:g}s")
+    return {"id": profile_id, "samples": sampler.samples, "duration_ms": round(sampler.duration * 1000, 3)}
+
+
+@router.get("/{profile_id}")
+async def download_profile(profile_id: str, format: Literal["speedscope", "collapsed"] = "speedscope"):
+    profile = profiler.render(profile_id, format)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=PROFILE_NOT_FOUND)
+    if format == "collapsed":
+        return Response(
+            content=profile, media_type="text/plain",
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.folded"'},
+        )
+    return Response(
+        content=json.dumps(profile), media_type="application/json",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.speedscope.json"'},
+    )
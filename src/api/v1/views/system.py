@@ -0,0 +1,55 @@
+from fastapi import APIRouter, Depends
+
+from database import db_connection
+from database.pool import get_pool_status
+from logger.logger import logging_pipeline
+from monitoring.queries import query_monitor
+from monitoring.timing import TimedRoute, request_timings
+from src.api.v1.utils.dependencies import require_operator_token
+from src.api.v1.utils.hash_pool import password_hash_pool
+from src.api.v1.utils.socket_manager import connection_manager
+from src.api.v1.utils.token_cache import verified_token_cache
+from src.api.v1.utils.token_revocation import token_revocation_store
+
+router = APIRouter(prefix="/system", route_class=TimedRoute, dependencies=[Depends(require_operator_token)])
+
+
+@router.get("/db-pool")
+async def get_db_pool_status():
+    async_engine = db_connection.init_async_engine()
+    return get_pool_status(async_engine.pool)
+
+
+@router.get("/password-hash-pool")
+async def get_password_hash_pool_status():
+    return password_hash_pool.get_status()
+
+
+@router.get("/token-cache")
+async def get_token_cache_status():
+    return verified_token_cache.get_status()
+
+
+@router.get("/token-revocation")
+async def get_token_revocation_status():
+    return token_revocation_store.get_status()
+
+
+@router.get("/timing")
+async def get_request_timing_status():
+    return request_timings.get_status()
+
+
+@router.get("/logging")
+async def get_logging_status():
+    return logging_pipeline.get_status()
+
+
+@router.get("/queries")
+async def get_query_monitor_status():
+    return query_monitor.get_status()
+
+
+@router.get("/websocket")
+async def get_websocket_status():
+    return connection_manager.get_status()
@@ -1,23 +1,27 @@
 from typing import List
 
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database.db_connection import get_db
+from database.db_connection import get_async_db
+from monitoring.timing import TimedRoute
 from src.api.v1.models.user_models.user import User
 from src.api.v1.schemas.user import UserResponse
 from src.api.v1.utils.dependencies import ActiveUserCheck, get_current_user
+from src.api.v1.utils.token_cache import UserPrincipal
 
-router = APIRouter(prefix="/user")
+router = APIRouter(prefix="/user", route_class=TimedRoute)
 
 active_user_check = Depends(ActiveUserCheck)
 
 
 @router.get("/user-list", response_model=List[UserResponse])
-async def get_user_list(db: Session = Depends(get_db), limit: int = 10):
-    return db.query(User).limit(limit).all()
+async def get_user_list(db: AsyncSession = Depends(get_async_db), limit: int = 10):
+    result = await db.scalars(select(User).limit(limit))
+    return result.all()
 
 
 @router.get("/me", response_model=UserResponse, dependencies=[active_user_check])
-async def get_user_profile(current_user: User = Depends(get_current_user)):
+async def get_user_profile(current_user: UserPrincipal = Depends(get_current_user)):
     return current_user
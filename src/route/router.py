@@ -1,8 +1,10 @@
 from fastapi import APIRouter
 
-from src.api.v1.views import user, auth
+from src.api.v1.views import user, auth, system, profiler
 
 v1_router = APIRouter(prefix="/api/v1")
 
 v1_router.include_router(auth.router, tags=["Auth"])
 v1_router.include_router(user.router, tags=["User"])
+v1_router.include_router(system.router, tags=["System"])
+v1_router.include_router(profiler.router, tags=["System"], include_in_schema=False)